@@ -0,0 +1,101 @@
+import concurrent.futures
+import importlib
+import logging
+import multiprocessing
+import pathlib
+from typing import Dict, Iterable, Optional, Union
+
+import pandas as pd
+
+import climate_dash_tools.logging_config
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_DIRECTORY = pathlib.Path('Data/Backfill')
+
+# raw data and summarize function of the pipeline being backfilled, per worker process
+_worker_state = {}
+
+
+def _init_worker(module_name, data, log_queue):
+    climate_dash_tools.logging_config.setup_logging_for_worker(log_queue)
+    climate_dash_tools.logging_config.setup_logging_for_pipeline(module_name.rsplit('.', 1)[-1])
+
+    _worker_state['summarize'] = importlib.import_module(module_name).summarize
+    _worker_state['data'] = data
+
+
+def _summarize_as_of(as_of):
+    return _worker_state['summarize'](_worker_state['data'], as_of)
+
+
+def _combine(summaries: Dict[pd.Timestamp, pd.DataFrame]) -> pd.DataFrame:
+    return pd.concat(summaries, names=['as_of_date'])
+
+
+def backfill(
+    module_name: str,
+    as_of_dates: Iterable,
+    max_workers: Optional[int] = None
+) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Recompute a pipeline's outputs as they would have been on each of a range of past dates.
+
+    The pipeline's raw data is fetched once, with its `extract()`, and its
+    `summarize(data, as_of)` is evaluated for every date in parallel worker processes.
+
+    Parameters
+    ----------
+    module_name : str
+        pipeline module defining `extract()` and `summarize(data, as_of)`, e.g. 'pipelines.extract.diversion_rate'
+
+    as_of_dates : iterable of str or pd.Timestamp
+
+    max_workers : int, optional
+        number of worker processes; defaults to the number of CPUs
+
+    Returns
+    -------
+    pd.DataFrame or dict of pd.DataFrame
+        the summary (or each summary, if `summarize` returns a dict of them) for all dates,
+        with an `as_of_date` index level prepended
+    """
+    pipeline = importlib.import_module(module_name)
+
+    as_of_dates = [pd.Timestamp(as_of) for as_of in as_of_dates]
+
+    data = pipeline.extract().data
+
+    logger.info('backfilling %s as of %s dates from %s raw rows', module_name, len(as_of_dates), len(data))
+
+    # spawned rather than forked, since this process already runs logging threads;
+    # workers log through the parent's handlers
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(module_name, data, climate_dash_tools.logging_config.get_worker_log_queue())
+    ) as executor:
+        summaries = dict(zip(as_of_dates, executor.map(_summarize_as_of, as_of_dates)))
+
+    first = next(iter(summaries.values()), None)
+
+    if isinstance(first, dict):
+        return {
+            name: _combine({as_of: summary[name] for as_of, summary in summaries.items()})
+            for name in first
+        }
+
+    return _combine(summaries)
+
+
+def save_backfill(pipeline_name: str, result, backfill_directory=BACKFILL_DIRECTORY):
+    """Write a backfill result to `<backfill_directory>/<pipeline_name>.csv`, or one file per summary"""
+    backfill_directory = pathlib.Path(backfill_directory)
+    backfill_directory.mkdir(exist_ok=True, parents=True)
+
+    if isinstance(result, dict):
+        for name, summary in result.items():
+            summary.to_csv(backfill_directory / f'{pipeline_name}_{name}.csv')
+    else:
+        result.to_csv(backfill_directory / f'{pipeline_name}.csv')
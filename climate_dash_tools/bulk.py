@@ -0,0 +1,278 @@
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+from typing import Dict, NamedTuple, Union
+
+import pandas as pd
+
+import climate_dash_tools.cache
+import climate_dash_tools.extract
+import climate_dash_tools.schema
+import climate_dash_tools.soql
+from climate_dash_tools.extract import Dataset, OpenDataCollection
+
+logger = logging.getLogger(__name__)
+
+# queries expected to return at least this many rows, and at least this share of the table,
+# are answered from a bulk export of the whole table rather than by the API
+BULK_MIN_ROWS = 250_000
+BULK_MIN_TABLE_SHARE = 0.5
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# rows of the export loaded into the local database at a time
+LOAD_CHUNK_ROWS = 100_000
+
+# timestamps in CSV exports, e.g. `03/15/2024 12:00:00 AM`
+EXPORT_TIMESTAMP_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+AGGREGATE_FUNCTIONS = {'count', 'sum', 'min', 'max', 'avg'}
+
+# table of the local database holding the SoQL type of each column of `data`
+TYPES_TABLE = 'column_types'
+
+
+class ExportTable(NamedTuple):
+    table_id:str
+    database:str
+    column_types:Dict[str, str]
+    version:str
+
+
+def _export_url(table_id, open_data_collection):
+    return climate_dash_tools.extract.OPEN_DATA_BASE_URLS[open_data_collection] + f'api/views/{table_id}/rows.csv'
+
+
+def _export_dir(table_id, open_data_collection):
+    return climate_dash_tools.cache.get_cache_dir('bulk', open_data_collection, table_id)
+
+
+def _version(data_updated_at) -> str:
+    return hashlib.sha256(str(data_updated_at).encode()).hexdigest()[:16]
+
+
+def _remove_other_versions(directory, version):
+    for path in directory.iterdir():
+        if not path.name.startswith(version):
+            path.unlink()
+
+
+def download_table(table_id: str, open_data_collection: OpenDataCollection = 'city'):
+    """
+    Download the bulk CSV export of a whole table to a gzipped local file, once per `dataUpdatedAt`.
+    Returns the path of the file.
+    """
+    data_updated_at = climate_dash_tools.extract.get_metadata(table_id, open_data_collection).get('dataUpdatedAt')
+    version = _version(data_updated_at)
+
+    directory = _export_dir(table_id, open_data_collection)
+    path = directory / f'{version}.csv.gz'
+
+    if path.exists():
+        return path
+
+    logger.info('downloading bulk export of %s as of %s', table_id, data_updated_at)
+
+    url = _export_url(table_id, open_data_collection)
+
+    r = climate_dash_tools.extract._timed_get(
+        url,
+        climate_dash_tools.extract._latency_key(url, table_id, 'export'),
+        climate_dash_tools.extract.DATA_TIMEOUT_SECONDS,
+        headers={'X-App-Token': climate_dash_tools.extract._load_token()},
+        params={'accessType': 'DOWNLOAD'},
+        stream=True
+    )
+    r.raise_for_status()
+
+    # streamed straight to disk, and compressed only lightly, since it is read back once
+    temporary_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    size = 0
+    try:
+        with gzip.open(temporary_path, 'wb', compresslevel=1) as f:
+            for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+    finally:
+        r.close()
+
+    os.replace(temporary_path, path)
+    _remove_other_versions(directory, version)
+
+    logger.info('downloaded %s bytes of %s', size, table_id)
+
+    return path
+
+
+def _convert_chunk(chunk: pd.DataFrame, column_types) -> pd.DataFrame:
+    """Values of an export chunk stored as `climate_dash_tools.soql.run_sqlite_query` expects, so they compare like in SoQL"""
+    for column, soda_type in column_types.items():
+        if soda_type in ('floating_timestamp', 'fixed_timestamp'):
+            timestamps = pd.to_datetime(chunk[column], format=EXPORT_TIMESTAMP_FORMAT, errors='coerce')
+            other_format = timestamps.isna() & chunk[column].notna()
+            if other_format.any():
+                timestamps[other_format] = pd.to_datetime(chunk.loc[other_format, column], errors='coerce')
+            chunk[column] = timestamps.dt.strftime(climate_dash_tools.soql.TIMESTAMP_FORMAT)
+        elif soda_type == 'number':
+            chunk[column] = pd.to_numeric(chunk[column].str.replace(',', '', regex=False), errors='coerce')
+    return chunk
+
+
+def load_table(table_id: str, open_data_collection: OpenDataCollection = 'city') -> ExportTable:
+    """
+    The bulk export of a table, loaded into a local SQLite database (once per export),
+    with columns renamed from display names to field names and typed from the table's schema.
+    The types are stored in the database too, so a database is never without them.
+    """
+    path = download_table(table_id, open_data_collection)
+    version = path.name.split('.')[0]
+    database = path.with_name(f'{version}.sqlite')
+
+    if not database.exists():
+        logger.info('loading bulk export of %s', table_id)
+
+        schema = climate_dash_tools.schema.get_schema(table_id, open_data_collection)
+        field_names = schema.field_names
+        types = schema.types
+
+        temporary_database = database.with_name(database.name + f'.{os.getpid()}.tmp')
+        temporary_database.unlink(missing_ok=True)
+
+        column_types = None
+        rows = 0
+
+        with sqlite3.connect(temporary_database) as connection:
+            for chunk in pd.read_csv(path, dtype=str, chunksize=LOAD_CHUNK_ROWS):
+                chunk = chunk.rename(columns=field_names)
+                if column_types is None:
+                    column_types = {column: types.get(column, 'text') for column in chunk.columns}
+                    unknown = [column for column in chunk.columns if column not in types]
+                    if unknown:
+                        logger.warning('columns of %s export not in its schema: %s', table_id, unknown)
+
+                _convert_chunk(chunk, column_types).to_sql('data', connection, if_exists='append', index=False)
+                rows += len(chunk)
+
+            connection.execute(f'CREATE TABLE {TYPES_TABLE} (name TEXT, type TEXT)')
+            connection.executemany(f'INSERT INTO {TYPES_TABLE} VALUES (?, ?)', (column_types or {}).items())
+        connection.close()
+
+        os.replace(temporary_database, database)
+
+        logger.info('loaded %s rows of %s', rows, table_id)
+
+    with sqlite3.connect(database) as connection:
+        column_types = dict(connection.execute(f'SELECT name, type FROM {TYPES_TABLE} ORDER BY rowid'))
+    connection.close()
+
+    return ExportTable(table_id, str(database), column_types, version)
+
+
+def _is_downloaded(table_id, open_data_collection) -> bool:
+    data_updated_at = climate_dash_tools.extract.get_metadata(table_id, open_data_collection).get('dataUpdatedAt')
+    return (_export_dir(table_id, open_data_collection) / f'{_version(data_updated_at)}.csv.gz').exists()
+
+
+def _count(table_id, open_data_collection, where=None):
+    """Rows of the table, and rows matching `where`, in one request"""
+    if where is None:
+        query = 'SELECT COUNT(*) AS `row_count`'
+    else:
+        query = f'SELECT COUNT(*) AS `row_count`, SUM(CASE WHEN {where} THEN 1 ELSE 0 END) AS `matching_rows`'
+    records = climate_dash_tools.extract.from_open_data(table_id, query, open_data_collection=open_data_collection, parse=False)
+    total_rows = int(records[0].get('row_count', 0)) if records else 0
+    rows = int(records[0].get('matching_rows', 0)) if records and where is not None else total_rows
+    return total_rows, rows
+
+
+def use_bulk_export(
+    table_id: str,
+    query: Union[str, climate_dash_tools.soql.Query],
+    open_data_collection: OpenDataCollection = 'city'
+) -> bool:
+    """
+    Whether a query is better answered from the table's bulk export than by the API:
+    if it returns rows (rather than aggregates) and is expected to return most of a large table,
+    or the export of the table's current version was already downloaded.
+    Queries that can't be parsed locally are left to the API.
+
+    Costs at most one COUNT request, for callers choosing between `from_bulk_export`
+    and `climate_dash_tools.extract.from_open_data`.
+    """
+    try:
+        clauses = climate_dash_tools.soql.split_clauses(climate_dash_tools.soql.tokenize(str(query)))
+    except ValueError as e:
+        logger.info('not using bulk export for %s: %s', query, e)
+        return False
+
+    if 'GROUP' in clauses or 'SEARCH' in clauses:
+        return False
+
+    select = clauses.get('SELECT', [])
+    if any(
+        token.lower() in AGGREGATE_FUNCTIONS and next_token == '('
+        for token, next_token in zip(select, select[1:])
+    ):
+        return False
+
+    # `:id` and other system fields aren't in exports
+    if any(token.startswith(':') for tokens in clauses.values() for token in tokens):
+        return False
+
+    if _is_downloaded(table_id, open_data_collection):
+        return True
+
+    where = climate_dash_tools.soql.render_tokens(clauses['WHERE']) if 'WHERE' in clauses else None
+    total_rows, rows = _count(table_id, open_data_collection, where)
+    if 'LIMIT' in clauses:
+        rows = min(rows, int(clauses['LIMIT'][0]))
+
+    logger.info('%s expected to return %s of %s rows of %s', query, rows, total_rows, table_id)
+
+    return rows >= BULK_MIN_ROWS and rows >= BULK_MIN_TABLE_SHARE * total_rows
+
+
+def from_bulk_export(
+    table_id: str,
+    query: Union[str, climate_dash_tools.soql.Query] = 'SELECT * LIMIT 1000000',
+    open_data_collection: OpenDataCollection = 'city',
+    parse: bool = True,
+    include_metadata: bool = False,
+    optimize_memory: bool = False
+):
+    """
+    Like `climate_dash_tools.extract.from_open_data` (with the default backend), but download the whole
+    table with the portal's bulk CSV export and run the query on it locally.
+
+    The export is kept, and reused until the table's `dataUpdatedAt` changes, so further queries of the
+    same table cost one metadata request. Queries can use the SoQL supported by
+    `climate_dash_tools.soql.to_sqlite`, without system fields such as `:id`. Location columns
+    are returned as in the export (as text), rather than as objects.
+    """
+    table = load_table(table_id, open_data_collection)
+
+    fields, types, rows = climate_dash_tools.soql.run_sqlite_query(table.database, table.column_types, str(query))
+
+    if parse:
+        data = pd.DataFrame.from_records(rows, columns=fields)
+        for field, soda_type in zip(fields, types):
+            if soda_type in ('floating_timestamp', 'fixed_timestamp'):
+                data[field] = pd.to_datetime(data[field], errors='coerce', utc=True)
+            elif soda_type == 'number':
+                data[field] = pd.to_numeric(data[field], errors='coerce')
+        if optimize_memory and not data.empty:
+            data = climate_dash_tools.extract._optimize_memory(data)
+    else:
+        # as returned by the API: strings, with nulls left out
+        data = [
+            {field: climate_dash_tools.soql.format_value(value) for field, value in zip(fields, row) if value is not None}
+            for row in rows
+        ]
+
+    if include_metadata:
+        return Dataset(data, climate_dash_tools.extract.get_metadata(table_id, open_data_collection))
+
+    return data
+
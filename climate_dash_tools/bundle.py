@@ -0,0 +1,169 @@
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import math
+import pathlib
+from typing import Dict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_DIRECTORY = pathlib.Path('Data/Summary Data')
+BUNDLE_DIRECTORY = pathlib.Path('Data/Bundle')
+
+# bumped when the layout of the bundle changes, so the client can tell which decoder to use
+BUNDLE_FORMAT_VERSION = 2
+
+INDEX_FILE_NAME = 'index.json'
+
+
+def _json_value(value):
+    """A value read from a CSV as a JSON value: missing and non-finite numbers are null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (str, bool, int, float)) or value is None:
+        return value
+    raise TypeError(f'cannot bundle {type(value).__name__} value {value!r}')
+
+
+def _encode_table(path: pathlib.Path):
+    data = pd.read_csv(path)
+
+    # unnamed index columns are blank in the CSV header, so keep them blank; names
+    # can repeat, so columns are listed in order rather than keyed by name
+    columns = ['' if str(column).startswith('Unnamed: ') else column for column in data.columns]
+
+    # `tolist` converts numpy scalars to Python ones
+    values = [[_json_value(value) for value in data.iloc[:, position].tolist()] for position in range(data.shape[1])]
+
+    return (
+        {'columns': columns, 'values': values},
+        {'kind': 'table', 'rows': len(data), 'columns': columns}
+    )
+
+
+def _encode_geojson(path: pathlib.Path):
+    feature_collection = json.loads(path.read_text())
+
+    return (
+        feature_collection,
+        {'kind': 'geojson', 'rows': len(feature_collection.get('features', []))}
+    )
+
+
+ENCODERS = {
+    '.csv': _encode_table,
+    '.geojson': _encode_geojson,
+}
+
+
+def build_bundle(summary_directory=SUMMARY_DIRECTORY) -> Dict:
+    """
+    All summary outputs as one JSON-serializable object.
+
+    Tables are columnar (`{'columns': [names], 'values': [[values of each column]]}`), GeoJSON is kept as is, and
+    `index` lists each dataset (by file name without extension) with its kind and shape.
+    """
+    datasets = {}
+    index = {}
+
+    for path in sorted(pathlib.Path(summary_directory).glob('*')):
+        encoder = ENCODERS.get(path.suffix)
+
+        if encoder is None or not path.is_file():
+            continue
+
+        datasets[path.stem], index[path.stem] = encoder(path)
+
+    return {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'index': index,
+        'datasets': datasets,
+    }
+
+
+def export_bundle(summary_directory=SUMMARY_DIRECTORY, bundle_directory=BUNDLE_DIRECTORY) -> pathlib.Path:
+    """
+    Write all summary outputs to one gzipped JSON bundle, so the dashboard can load them in one request.
+
+    The bundle's file name contains a hash of its content (`dashboard.<hash>.json.gz`),
+    so it can be cached indefinitely. `index.json`, next to it, names the current bundle
+    and lists the datasets in it with their shapes.
+
+    Returns
+    -------
+    pathlib.Path
+        path of the bundle
+    """
+    bundle_directory = pathlib.Path(bundle_directory)
+    bundle_directory.mkdir(exist_ok=True, parents=True)
+
+    bundle = build_bundle(summary_directory)
+
+    encoded = json.dumps(bundle, separators=(',', ':'), ensure_ascii=False, allow_nan=False).encode()
+    version = hashlib.sha256(encoded).hexdigest()[:16]
+
+    bundle_path = bundle_directory / f'dashboard.{version}.json.gz'
+
+    if not bundle_path.exists():
+        # mtime=0 so that identical content compresses to identical bytes
+        bundle_path.write_bytes(gzip.compress(encoded, compresslevel=9, mtime=0))
+
+    index = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'version': version,
+        'bundle': bundle_path.name,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'datasets': bundle['index'],
+    }
+
+    (bundle_directory / INDEX_FILE_NAME).write_text(json.dumps(index, indent=1))
+
+    # bundles other than the current one are no longer referenced
+    for path in bundle_directory.glob('dashboard.*.json.gz'):
+        if path != bundle_path:
+            path.unlink()
+
+    logger.info(
+        'bundled %s datasets into %s (%s bytes, %s uncompressed)',
+        len(bundle['index']),
+        bundle_path,
+        bundle_path.stat().st_size,
+        len(encoded)
+    )
+
+    return bundle_path
+
+
+def read_bundle(bundle_directory=BUNDLE_DIRECTORY) -> Dict[str, pd.DataFrame]:
+    """The tables in the current bundle, as DataFrames by dataset name (GeoJSON datasets are skipped)"""
+    bundle_directory = pathlib.Path(bundle_directory)
+
+    index = json.loads((bundle_directory / INDEX_FILE_NAME).read_text())
+    bundle = json.loads(gzip.decompress((bundle_directory / index['bundle']).read_bytes()))
+
+    return {
+        name: pd.DataFrame(
+            dict(enumerate(bundle['datasets'][name]['values'])),
+            index=pd.RangeIndex(entry['rows'])
+        ).set_axis(entry['columns'], axis='columns')
+        for name, entry in bundle['index'].items()
+        if entry['kind'] == 'table'
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Pack summary outputs into one compressed bundle for the dashboard')
+    parser.add_argument('--summary-directory', default=SUMMARY_DIRECTORY)
+    parser.add_argument('--bundle-directory', default=BUNDLE_DIRECTORY)
+    args = parser.parse_args(args)
+
+    print(export_bundle(args.summary_directory, args.bundle_directory))
+
+
+if __name__ == '__main__':
+    main()
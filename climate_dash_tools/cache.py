@@ -0,0 +1,11 @@
+import pathlib
+
+# local caches (schemas, spools, snapshots, ...); safe to delete
+CACHE_DIRECTORY = pathlib.Path('Cache')
+
+
+def get_cache_dir(*parts: str) -> pathlib.Path:
+    """Subdirectory of the local cache directory, created if needed"""
+    path = CACHE_DIRECTORY.joinpath(*parts)
+    path.mkdir(exist_ok=True, parents=True)
+    return path
@@ -0,0 +1,181 @@
+import datetime
+import gzip
+import importlib
+import io
+import json
+import logging
+import pathlib
+import tempfile
+import zipfile
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+import climate_dash_tools.extract
+import climate_dash_tools.outputs
+from climate_dash_tools.jobqueue import JobQueue
+from climate_dash_tools.soql import Query
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIRECTORY = climate_dash_tools.outputs.SUMMARY_DIRECTORY
+
+PIPELINE_JOB = 'pipeline'
+EXTRACT_PAGE_JOB = 'extract_page'
+
+
+def new_batch_id() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+
+
+def enqueue_pipelines(queue: JobQueue, module_names: Iterable[str], batch: Optional[str] = None) -> str:
+    """Enqueue one job per pipeline module. Returns the batch id"""
+    batch = batch or new_batch_id()
+    for module_name in module_names:
+        queue.enqueue(PIPELINE_JOB, {'module': module_name}, batch)
+    return batch
+
+
+def enqueue_paged_extract(
+    queue: JobQueue,
+    table_id: str,
+    query: Query,
+    page_size: int = 100_000,
+    open_data_collection: climate_dash_tools.extract.OpenDataCollection = 'city',
+    total_rows: Optional[int] = None,
+    batch: Optional[str] = None
+) -> str:
+    """
+    Split a large extract into pages and enqueue one job per page. Returns the batch id.
+
+    The number of rows is counted with one request unless `total_rows` is given
+    (which is required for grouped queries).
+    """
+    batch = batch or new_batch_id()
+
+    if total_rows is None:
+        total_rows = int(
+            climate_dash_tools.extract.from_open_data(
+                table_id,
+                query.count(),
+                open_data_collection=open_data_collection,
+                parse=False
+            )[0]['count']
+        )
+
+    for offset in range(0, total_rows, page_size):
+        queue.enqueue(
+            EXTRACT_PAGE_JOB,
+            {
+                'table_id': table_id,
+                'open_data_collection': open_data_collection,
+                'query': str(query.paged(page_size, offset)),
+                'offset': offset,
+            },
+            batch
+        )
+
+    logger.info('enqueued %s rows of %s as %s pages', total_rows, table_id, -(-total_rows // page_size))
+
+    return batch
+
+
+def run_pipeline_job(payload) -> bytes:
+    """Run a pipeline and return the outputs it wrote, as a zip archive"""
+    pipeline = importlib.import_module(payload['module'])
+
+    # each job writes to its own directory, so only its own outputs are collected
+    with tempfile.TemporaryDirectory(prefix='job-') as output_directory:
+        with climate_dash_tools.outputs.redirect_outputs(output_directory):
+            result = pipeline.run()
+
+        if result is None:
+            raise RuntimeError(f"{payload['module']} did not produce valid data")
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for path in sorted(pathlib.Path(output_directory).glob('*')):
+                if path.is_file():
+                    archive.write(path, path.name)
+
+    return buffer.getvalue()
+
+
+def run_extract_page_job(payload) -> bytes:
+    """Fetch one page of an extract and return its raw records, gzipped JSON"""
+    records = climate_dash_tools.extract.from_open_data(
+        payload['table_id'],
+        payload['query'],
+        open_data_collection=payload['open_data_collection'],
+        parse=False
+    )
+    return gzip.compress(json.dumps(records).encode())
+
+
+HANDLERS = {
+    PIPELINE_JOB: run_pipeline_job,
+    EXTRACT_PAGE_JOB: run_extract_page_job,
+}
+
+
+def gather_outputs(queue: JobQueue, batch: str, output_directory=OUTPUT_DIRECTORY) -> Dict[str, str]:
+    """
+    Write the outputs of a batch's finished pipeline jobs into `output_directory`.
+
+    Returns
+    -------
+    dict
+        job status (`done`, `failed`, `pending`, `running`) by pipeline module
+    """
+    output_directory = pathlib.Path(output_directory)
+    output_directory.mkdir(exist_ok=True, parents=True)
+
+    statuses = {}
+
+    for job_result in queue.results(batch):
+        if job_result.job.kind != PIPELINE_JOB:
+            continue
+
+        module_name = job_result.job.payload['module']
+        statuses[module_name] = job_result.status
+
+        if job_result.status == 'done':
+            with zipfile.ZipFile(io.BytesIO(job_result.result)) as archive:
+                archive.extractall(output_directory)
+                logger.info('✔ %s: %s', module_name, ', '.join(archive.namelist()))
+        elif job_result.status == 'failed':
+            logger.error('✖ %s failed after %s attempts: %s', module_name, job_result.job.attempts, job_result.error)
+        else:
+            logger.warning('%s is still %s', module_name, job_result.status)
+
+    return statuses
+
+
+def gather_extract(queue: JobQueue, batch: str) -> pd.DataFrame:
+    """Combine a batch's extract pages, in order, into one DataFrame"""
+    pages = sorted(
+        (
+            job_result for job_result in queue.results(batch)
+            if job_result.job.kind == EXTRACT_PAGE_JOB
+        ),
+        key=lambda job_result: job_result.job.payload['offset']
+    )
+
+    unfinished = [job_result.job.id for job_result in pages if job_result.status != 'done']
+    if unfinished:
+        raise RuntimeError(f'{len(unfinished)} pages of batch {batch} are not done: {unfinished}')
+
+    if not pages:
+        return pd.DataFrame()
+
+    records = []
+    for job_result in pages:
+        records.extend(json.loads(gzip.decompress(job_result.result)))
+
+    payload = pages[0].job.payload
+
+    return climate_dash_tools.extract.parse_records(
+        records,
+        table_id=payload['table_id'],
+        open_data_collection=payload['open_data_collection']
+    )
@@ -0,0 +1,373 @@
+import argparse
+import csv
+import email.utils
+import gzip
+import io
+import json
+import logging
+import os
+import pathlib
+import random
+import re
+import sqlite3
+import string
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+import climate_dash_tools.cache
+import climate_dash_tools.extract
+import climate_dash_tools.soql
+from climate_dash_tools.soql import TIMESTAMP_FORMAT, format_value
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_SUFFIXES = ('.parquet', '.csv')
+
+# view `dataTypeName` of SoQL types that are named differently there, for `/api/views/{id}.json`
+SODA_TYPE_TO_VIEW_TYPE = {
+    'floating_timestamp': 'calendar_date',
+}
+
+
+def _soda_type(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return 'checkbox'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'number'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'floating_timestamp'
+    return 'text'
+
+
+class FixtureTable(NamedTuple):
+    table_id:str
+    database:str
+    column_types:Dict[str, str]
+    updated_at:str
+
+
+def load_fixture(path, database_directory=None) -> FixtureTable:
+    """
+    Load a fixture file into a SQLite database (once; it is reloaded when the fixture is newer)
+    """
+    path = pathlib.Path(path)
+    database_directory = pathlib.Path(database_directory or climate_dash_tools.cache.get_cache_dir('emulator'))
+    database = database_directory / f'{path.stem}.sqlite'
+    types_path = database_directory / f'{path.stem}.types.json'
+
+    if not database.exists() or database.stat().st_mtime < path.stat().st_mtime:
+        logger.info('loading fixture %s', path)
+
+        data = pd.read_parquet(path) if path.suffix == '.parquet' else pd.read_csv(path)
+
+        column_types = {column: _soda_type(data[column]) for column in data.columns}
+
+        for column, soda_type in column_types.items():
+            if soda_type == 'floating_timestamp':
+                data[column] = data[column].dt.strftime(TIMESTAMP_FORMAT)
+
+        temporary_database = database.with_name(database.name + f'.{os.getpid()}.tmp')
+        temporary_database.unlink(missing_ok=True)
+        with sqlite3.connect(temporary_database) as connection:
+            data.to_sql('data', connection, index=False, chunksize=100_000)
+        connection.close()
+        os.replace(temporary_database, database)
+
+        types_path.write_text(json.dumps(column_types))
+
+        logger.info('loaded %s rows of %s', len(data), path.stem)
+
+    updated_at = pd.Timestamp(path.stat().st_mtime, unit='s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+    return FixtureTable(path.stem, str(database), json.loads(types_path.read_text()), updated_at)
+
+
+def run_query(table: FixtureTable, query: str) -> Tuple[List[str], List[str], List[tuple]]:
+    """Run a SoQL query on a fixture table. Returns field names, SoQL types and rows"""
+    return climate_dash_tools.soql.run_sqlite_query(table.database, table.column_types, query)
+
+
+class SodaEmulator:
+    """
+    Local HTTP server answering like the Socrata (SODA) API from fixture files, for load testing the extractor.
+
+    Serves `/resource/{id}.json`, `/resource/{id}.csv` (with `X-SODA2-Fields` / `X-SODA2-Types`
+    headers), `/api/views/metadata/v1/{id}` and `/api/views/{id}.json`, for both collections.
+
+    Parameters
+    ----------
+    fixtures_directory : path
+        directory of `<table_id>.parquet` (or `.csv`) fixtures
+
+    latency : float
+        seconds to wait before answering each request
+
+    latency_jitter : float
+        up to this many more seconds, uniformly at random
+
+    failure_rate : float
+        share of requests answered with a 503 error, at random
+
+    seed : int, optional
+        seed for latency jitter and failures
+
+    Example
+    -------
+    >>> with SodaEmulator('fixtures', latency=0.05, failure_rate=0.01) as emulator:
+    ...     with point_extractor_at(emulator.base_url):
+    ...         climate_dash_tools.extract.from_open_data('w4pv-hbkt', 'SELECT COUNT(*)')
+    """
+
+    def __init__(self, fixtures_directory, latency: float = 0, latency_jitter: float = 0, failure_rate: float = 0, seed: Optional[int] = None):
+        self.fixtures_directory = pathlib.Path(fixtures_directory)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.failure_count = 0
+        self._tables: Dict[str, FixtureTable] = {}
+        self._lock = threading.Lock()
+        self.server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def get_table(self, table_id: str) -> FixtureTable:
+        with self._lock:
+            if table_id not in self._tables:
+                path = next(
+                    (self.fixtures_directory / f'{table_id}{suffix}' for suffix in FIXTURE_SUFFIXES
+                     if (self.fixtures_directory / f'{table_id}{suffix}').exists()),
+                    None
+                )
+                if path is None:
+                    raise KeyError(table_id)
+                self._tables[table_id] = load_fixture(path)
+            return self._tables[table_id]
+
+    def _delay_or_fail(self) -> bool:
+        """Inject latency, and return True if this request should fail"""
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+            fail = self.random.random() < self.failure_rate
+            if fail:
+                self.failure_count += 1
+        time.sleep(delay)
+        return fail
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> 'SodaEmulator':
+        emulator = self
+
+        class SodaHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def send_body(self, status, body: bytes, content_type, headers=None):
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, compresslevel=1)
+                    headers = {**(headers or {}), 'Content-Encoding': 'gzip'}
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for header, value in (headers or {}).items():
+                    self.send_header(header, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_error_json(self, status, message):
+                self.send_body(status, json.dumps({'error': True, 'message': message}).encode(), 'application/json')
+
+            def do_GET(self):
+                if emulator._delay_or_fail():
+                    return self.send_error_json(503, 'injected failure')
+
+                url = urllib.parse.urlsplit(self.path)
+                params = dict(urllib.parse.parse_qsl(url.query))
+
+                try:
+                    if match := re.match(r'^/resource/([\w-]+)\.(json|csv)$', url.path):
+                        self.serve_data(emulator.get_table(match.group(1)), match.group(2), params)
+                    elif match := re.match(r'^/api/views/metadata/v1/([\w-]+)$', url.path):
+                        table = emulator.get_table(match.group(1))
+                        self.send_body(200, json.dumps({
+                            'id': table.table_id,
+                            'name': table.table_id,
+                            'dataUpdatedAt': table.updated_at,
+                            'metadataUpdatedAt': table.updated_at,
+                        }).encode(), 'application/json')
+                    elif match := re.match(r'^/api/views/([\w-]+)\.json$', url.path):
+                        table = emulator.get_table(match.group(1))
+                        self.send_body(200, json.dumps({
+                            'id': table.table_id,
+                            'name': table.table_id,
+                            'columns': [
+                                {'fieldName': column, 'name': column, 'dataTypeName': SODA_TYPE_TO_VIEW_TYPE.get(soda_type, soda_type)}
+                                for column, soda_type in table.column_types.items()
+                            ],
+                        }).encode(), 'application/json')
+                    else:
+                        self.send_error_json(404, f'no route for {url.path}')
+                except KeyError as e:
+                    self.send_error_json(404, f'no fixture for table {e}')
+                except (ValueError, IndexError, sqlite3.Error) as e:
+                    self.send_error_json(400, f'query.soql.invalid: {e}')
+
+            def serve_data(self, table, data_format, params):
+                query = params.get('$query') or ' '.join(
+                    f'{clause} {params[param]}'
+                    for param, clause in (
+                        ('$select', 'SELECT'), ('$where', 'WHERE'), ('$group', 'GROUP BY'), ('$having', 'HAVING'),
+                        ('$order', 'ORDER BY'), ('$limit', 'LIMIT'), ('$offset', 'OFFSET'),
+                    )
+                    if param in params
+                )
+
+                fields, types, rows = run_query(table, query)
+
+                headers = {
+                    'X-SODA2-Fields': json.dumps(fields),
+                    'X-SODA2-Types': json.dumps(types),
+                    'Last-Modified': email.utils.formatdate(pd.Timestamp(table.updated_at).timestamp(), usegmt=True),
+                }
+
+                if data_format == 'json':
+                    # nulls are left out of records, as by the API
+                    body = json.dumps([
+                        {field: format_value(value) for field, value in zip(fields, row) if value is not None}
+                        for row in rows
+                    ]).encode()
+                    self.send_body(200, body, 'application/json;charset=utf-8', headers)
+                else:
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    writer.writerow(fields)
+                    writer.writerows(
+                        ['' if value is None else format_value(value) for value in row]
+                        for row in rows
+                    )
+                    self.send_body(200, buffer.getvalue().encode(), 'text/csv;charset=utf-8', headers)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        self.server = ThreadingHTTPServer((host, port), SodaHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        logger.info('SODA emulator serving %s at %s', self.fixtures_directory, self.base_url)
+
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self if self.server is not None else self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+@contextmanager
+def point_extractor_at(base_url: str, app_token: str = 'emulator'):
+    """Send all of `climate_dash_tools.extract`'s requests (both collections) to `base_url` while active"""
+    original_urls = dict(climate_dash_tools.extract.OPEN_DATA_BASE_URLS)
+    original_token = os.environ.get('OPEN_DATA_APP_TOKEN')
+
+    climate_dash_tools.extract.OPEN_DATA_BASE_URLS.update({collection: base_url for collection in original_urls})
+    os.environ['OPEN_DATA_APP_TOKEN'] = original_token or app_token
+
+    try:
+        yield
+    finally:
+        climate_dash_tools.extract.OPEN_DATA_BASE_URLS.update(original_urls)
+        if original_token is None:
+            os.environ.pop('OPEN_DATA_APP_TOKEN', None)
+
+
+def write_synthetic_fixture(path, rows: int, seed: int = 0):
+    """
+    Write a synthetic registrations-like fixture of `rows` rows (county, record_type, fuel_type,
+    vin, report_year, interconnection_date, estimated_pv_system_size), e.g. for 10M-row load tests
+    """
+    import numpy as np
+
+    generator = np.random.default_rng(seed)
+
+    vin_characters = np.frombuffer((string.digits + string.ascii_uppercase).encode(), dtype=np.uint8)
+    vins = (
+        generator.choice(vin_characters, size=(rows, 17))
+        .astype(np.uint8)
+        .view('S17')
+        .ravel()
+        .astype(str)
+    )
+
+    data = pd.DataFrame({
+        'county': generator.choice(['KINGS', 'NEW YORK', 'BRONX', 'RICHMOND', 'QUEENS', 'ALBANY', 'ERIE'], size=rows),
+        'record_type': generator.choice(['VEH', 'TRL', 'BOAT'], size=rows, p=[0.9, 0.07, 0.03]),
+        'fuel_type': generator.choice(['GAS', 'DIESEL', 'ELECTRIC', 'FLEX'], size=rows, p=[0.8, 0.1, 0.05, 0.05]),
+        'vin': vins,
+        'report_year': generator.integers(2015, 2025, size=rows),
+        'interconnection_date': pd.Timestamp('2000-01-01') + pd.to_timedelta(generator.integers(0, 25 * 365, size=rows), unit='D'),
+        'estimated_pv_system_size': generator.gamma(2, 5, size=rows).round(2),
+    })
+
+    path = pathlib.Path(path)
+    if path.suffix == '.parquet':
+        data.to_parquet(path, index=False)
+    else:
+        data.to_csv(path, index=False)
+
+    return path
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Serve fixture tables through a local stand-in for the Open Data (SODA) API')
+    parser.add_argument('fixtures', help='directory of <table_id>.parquet / .csv fixtures')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0, help='seconds to wait before each response')
+    parser.add_argument('--latency-jitter', type=float, default=0, help='up to this many more seconds, at random')
+    parser.add_argument('--failure-rate', type=float, default=0, help='share of requests answered with 503')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument(
+        '--synthetic',
+        nargs=2,
+        metavar=('TABLE_ID', 'ROWS'),
+        help='first write a synthetic fixture of ROWS rows as TABLE_ID'
+    )
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.synthetic:
+        table_id, rows = args.synthetic
+        pathlib.Path(args.fixtures).mkdir(exist_ok=True, parents=True)
+        write_synthetic_fixture(pathlib.Path(args.fixtures) / f'{table_id}.parquet', int(rows))
+
+    emulator = SodaEmulator(args.fixtures, args.latency, args.latency_jitter, args.failure_rate, args.seed)
+    emulator.start(args.host, args.port)
+
+    print(f'serving at {emulator.base_url}; point the extractor at it with climate_dash_tools.emulator.point_extractor_at')
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,32 @@
+import atexit
+import codecs
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import copy
+import io
 import json
 import logging
+import math
 from collections import namedtuple
 import os
-from typing import Union, Tuple, List, Dict, Any, Literal, NamedTuple
+import threading
+import time
+import urllib.parse
+from typing import Union, Tuple, List, Dict, Any, Literal, NamedTuple, Iterator, Callable
 import requests
+from urllib3.util.request import ACCEPT_ENCODING
 import pandas as pd
 
+import climate_dash_tools.cache
+import climate_dash_tools.soql
+
 # from climate_dash.config.settings import settings
 
 # Type aliases
 OpenDataCollection = Literal['city', 'state']
+Backend = Literal['pandas', 'arrow', 'arrow_dtype']
 RawData = List[Dict[str, Any]]
 Metadata = Dict[str, Any]
 
@@ -17,8 +34,283 @@ class Dataset(NamedTuple):
     data:pd.DataFrame
     metadata:Metadata
 
+class Page(NamedTuple):
+    records:RawData
+    # SoQL type by field, from the response headers; empty if they had none
+    column_types:Dict[str, str]
+
+class TransferStats(NamedTuple):
+    url:str
+    fingerprint:str
+    content_encoding:str
+    compressed_bytes:int
+    decompressed_bytes:int
+
+class MemoStats(NamedTuple):
+    hits:int
+    misses:int
+    evictions:int
+    expirations:int
+    entries:int
+    size_bytes:int
+
+class _MemoEntry(NamedTuple):
+    result:Any
+    size_bytes:int
+    expires_at:float
+
 logger = logging.getLogger(__name__)
 
+# size of the decompressed chunks fed to the JSON decoder
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# one entry per data request made by this process, for bandwidth accounting
+transfer_stats: List[TransferStats] = []
+
+# called as hook(table_id, open_data_collection, query, data_json) with the raw records of every
+# JSON data request, e.g. to record them in a HistoryStore
+raw_data_hooks: List[Callable[[str, OpenDataCollection, str, RawData], None]] = []
+
+# if set (e.g. to a `climate_dash_tools.journal.RunJournal`, by `run_extractors`), the result of
+# every data request is recorded with `record_result(key, result, data_updated_at)`, and requests it
+# returns a result for from `get_result(key, data_updated_at)` are served from it
+result_journal = None
+
+# portal of each collection; can be pointed elsewhere, e.g. at `climate_dash_tools.emulator`
+OPEN_DATA_BASE_URLS = {
+    'city':'https://data.cityofnewyork.us/',
+    'state':'https://data.ny.gov/'
+}
+
+# connections kept open per host, shared by all requests (and threads) in this process
+HTTP_POOL_SIZE = 32
+
+_session = None
+
+# Timeouts are derived from the latency (seconds until response headers) of recent requests
+# to the same endpoint, i.e. host, table and query fingerprint, and capped at these defaults
+DATA_TIMEOUT_SECONDS = 300
+METADATA_TIMEOUT_SECONDS = 500
+
+# latencies kept per endpoint, and needed before they are used
+LATENCY_HISTORY_SIZE = 200
+LATENCY_MIN_SAMPLES = 10
+
+# adaptive timeout = this multiple of an endpoint's p99 latency, at least MIN_TIMEOUT_SECONDS
+TIMEOUT_LATENCY_MULTIPLIER = 4
+MIN_TIMEOUT_SECONDS = 10
+
+# if on, a GET still waiting for its response after the endpoint's p95 latency is duplicated,
+# and whichever response comes first is used (all requests made this way are idempotent)
+HEDGE_REQUESTS = False
+HEDGE_PERCENTILE = 0.95
+
+# latency histories are kept across runs in the local cache, where it is kept (CI runs, which start
+# without one, use the default timeouts until they have samples). Each process adds the samples it
+# recorded to the file at exit, so concurrent processes don't overwrite each other's.
+LATENCY_FILE_NAME = 'latency.json'
+
+_latencies = None
+# samples recorded by this process, not yet added to the file, and the file they are added to
+_new_latencies = collections.defaultdict(list)
+_latency_path = None
+_latencies_lock = threading.Lock()
+_hedge_executor = None
+
+# string columns with at most this share of distinct values are stored as categoricals
+# when `optimize_memory` is on
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+class _Call:
+    """A request in flight, whose result is shared with identical concurrent requests"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+# in-flight requests by key, see `_single_flight`
+_in_flight: Dict[Any, _Call] = {}
+_in_flight_lock = threading.Lock()
+
+# opt-in in-memory cache of `from_open_data` results, least recently used first; see `enable_memo`
+_memo: Union[collections.OrderedDict, None] = None
+_memo_max_bytes = 0
+_memo_ttl_seconds = None
+_memo_size_bytes = 0
+_memo_counts = collections.Counter()
+_memo_lock = threading.Lock()
+
+# raw records sampled to estimate the size of a raw JSON result
+MEMO_SIZE_SAMPLE_RECORDS = 100
+
+def get_session() -> requests.Session:
+    """
+    Shared HTTP session, so repeated requests to the same host reuse pooled connections
+    instead of re-handshaking.
+    """
+    global _session
+    if _session is None:
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _session = session
+    return _session
+
+
+def _latency_key(url: str, table_id: str, fingerprint: str) -> str:
+    return f'{urllib.parse.urlsplit(url).netloc} {table_id} {fingerprint}'
+
+
+def _read_latency_file(path) -> Dict[str, List[float]]:
+    try:
+        return json.loads(path.read_text()) if path.exists() else {}
+    except json.JSONDecodeError as e:
+        logger.warning('ignoring unreadable latency history %s: %s', path, e)
+        return {}
+
+
+def _get_latencies() -> Dict[str, collections.deque]:
+    global _latencies, _latency_path
+    with _latencies_lock:
+        if _latencies is None:
+            _latency_path = (climate_dash_tools.cache.CACHE_DIRECTORY / LATENCY_FILE_NAME).absolute()
+            _latencies = collections.defaultdict(
+                lambda: collections.deque(maxlen=LATENCY_HISTORY_SIZE),
+                {
+                    key: collections.deque(values, maxlen=LATENCY_HISTORY_SIZE)
+                    for key, values in _read_latency_file(_latency_path).items()
+                }
+            )
+            atexit.register(_save_latencies)
+        return _latencies
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Exclusive lock on `path`'s lock file across processes (where `fcntl` is available)"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(path.with_name(path.name + '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_latencies():
+    """Add the samples recorded by this process to the latency history file"""
+    with _latencies_lock:
+        new_latencies = {key: values for key, values in _new_latencies.items() if values}
+        _new_latencies.clear()
+    if not new_latencies or _latency_path is None:
+        return
+
+    _latency_path.parent.mkdir(exist_ok=True, parents=True)
+    with _locked(_latency_path):
+        latencies = _read_latency_file(_latency_path)
+        for key, values in new_latencies.items():
+            latencies[key] = (latencies.get(key, []) + values)[-LATENCY_HISTORY_SIZE:]
+
+        temporary_path = _latency_path.with_name(_latency_path.name + f'.{os.getpid()}.tmp')
+        temporary_path.write_text(json.dumps(latencies))
+        os.replace(temporary_path, _latency_path)
+
+
+def _record_latency(key: str, seconds: float):
+    latencies = _get_latencies()
+    with _latencies_lock:
+        latencies[key].append(round(seconds, 3))
+        _new_latencies[key].append(round(seconds, 3))
+
+
+def _latency_percentile(key: str, percentile: float) -> Union[float, None]:
+    """Latency percentile of an endpoint, or None if it has too few samples"""
+    latencies = _get_latencies()
+    with _latencies_lock:
+        samples = sorted(latencies.get(key, ()))
+    if len(samples) < LATENCY_MIN_SAMPLES:
+        return None
+    return samples[max(math.ceil(percentile * len(samples)) - 1, 0)]
+
+
+def get_timeout(key: str, default: float) -> float:
+    """Read timeout for an endpoint: a multiple of its p99 latency, between MIN_TIMEOUT_SECONDS and `default`"""
+    p99 = _latency_percentile(key, 0.99)
+    if p99 is None:
+        return default
+    return min(max(p99 * TIMEOUT_LATENCY_MULTIPLIER, MIN_TIMEOUT_SECONDS), default)
+
+
+def _get_hedge_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _hedge_executor
+    with _latencies_lock:
+        if _hedge_executor is None:
+            _hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix='hedge')
+        return _hedge_executor
+
+
+def _close_response(future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _timed_get(url: str, key: str, default_timeout: float, **kwargs) -> requests.Response:
+    """
+    GET with a timeout adapted to the endpoint's latency history, recording the latency of this request.
+    With HEDGE_REQUESTS on, a request slower than the endpoint's p95 is duplicated, and the first response wins.
+    """
+    timeout = get_timeout(key, default_timeout)
+
+    def get():
+        try:
+            r = get_session().get(url, timeout=timeout, **kwargs)
+        except requests.Timeout:
+            # slow endpoints should get longer timeouts next time
+            _record_latency(key, timeout)
+            raise
+        _record_latency(key, r.elapsed.total_seconds())
+        return r
+
+    hedge_after = _latency_percentile(key, HEDGE_PERCENTILE) if HEDGE_REQUESTS else None
+
+    if hedge_after is None:
+        return get()
+
+    executor = _get_hedge_executor()
+    first = executor.submit(contextvars.copy_context().run, get)
+
+    done, _ = concurrent.futures.wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    logger.info('no response from %s after %.1f s (p95); sending hedged request', key, hedge_after)
+    second = executor.submit(contextvars.copy_context().run, get)
+
+    pending = {first, second}
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # the slower response is discarded when it arrives
+                for other in pending:
+                    other.add_done_callback(_close_response)
+                return future.result()
+
+    # both failed
+    return first.result()
+
+
 def _load_token() -> str:
     from dotenv import load_dotenv
     load_dotenv()
@@ -38,12 +330,7 @@ def _construct_open_data_urls(
     Creates urls for metadata and data requests.
     """
 
-    BASE_URLS = {
-        'city':'https://data.cityofnewyork.us/',
-        'state':'https://data.ny.gov/'
-    }
-
-    base_url = BASE_URLS[open_data_collection]
+    base_url = OPEN_DATA_BASE_URLS[open_data_collection]
 
     data_request_url = (
         base_url
@@ -52,18 +339,139 @@ def _construct_open_data_urls(
         + '.json'
     )
 
+    csv_request_url = (
+        base_url
+        + 'resource/'
+        + table_id
+        + '.csv'
+    )
+
     metadata_request_url = (
         base_url
         + 'api/views/metadata/v1/'
         + table_id
     )
 
+    view_request_url = (
+        base_url
+        + 'api/views/'
+        + table_id
+        + '.json'
+    )
+
     return {
         'data_request_url': data_request_url,
-        'metadata_request_url': metadata_request_url
+        'csv_request_url': csv_request_url,
+        'metadata_request_url': metadata_request_url,
+        'view_request_url': view_request_url
     }
 
 
+def _skip_separators(buffer: str, position: int) -> int:
+    while position < len(buffer) and buffer[position] in ' \t\n\r,':
+        position += 1
+    return position
+
+
+def _decode_json_stream(chunks: Iterator[bytes]) -> Any:
+    """
+    Decode a JSON document from a stream of byte chunks.
+
+    Records of a top-level array are decoded as soon as each one is complete,
+    so the response body is never held in memory as a whole, neither as bytes
+    nor as text. Any other document (e.g. an error object) is decoded at the end.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+
+    records = []
+    buffer = ''
+    position = 0
+    is_array = None
+
+    for chunk in chunks:
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+
+        if is_array is None:
+            stripped = buffer.lstrip()
+            if not stripped:
+                continue
+            is_array = stripped.startswith('[')
+            if is_array:
+                position = len(buffer) - len(stripped) + 1
+
+        if not is_array:
+            continue
+
+        while True:
+            position = _skip_separators(buffer, position)
+            if position == len(buffer) or buffer[position] == ']':
+                break
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # record is split across chunks
+                break
+            if end == len(buffer) or buffer[end] not in ' \t\n\r,]':
+                # a scalar may continue in the next chunk (e.g. `2` of `2.5`), so a record
+                # is only complete once followed by a separator
+                break
+            records.append(record)
+            position = end
+
+    buffer = buffer[position:] + text_decoder.decode(b'', final=True)
+
+    if not is_array:
+        return json.loads(buffer)
+
+    position = 0
+    while True:
+        position = _skip_separators(buffer, position)
+        if position == len(buffer) or buffer[position] == ']':
+            return records
+        record, position = decoder.raw_decode(buffer, position)
+        records.append(record)
+
+
+def _record_transfer(r: requests.Response, fingerprint: str, decompressed_bytes: int):
+    stats = TransferStats(
+        url=r.url,
+        fingerprint=fingerprint,
+        content_encoding=r.headers.get('Content-Encoding', 'identity'),
+        # bytes pulled over the wire, before decompression
+        compressed_bytes=r.raw.tell(),
+        decompressed_bytes=decompressed_bytes
+    )
+    transfer_stats.append(stats)
+
+    logger.info(
+        'Transferred %s bytes (%s) -> %s bytes decompressed for query %s',
+        stats.compressed_bytes,
+        stats.content_encoding,
+        stats.decompressed_bytes,
+        stats.fingerprint
+    )
+
+
+class _DecompressingStream(io.RawIOBase):
+    """Read-only file object over a streamed response body, decompressed, counting bytes read"""
+
+    def __init__(self, r: requests.Response):
+        self._raw = r.raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._raw.read(len(buffer), decode_content=True)
+        size = len(data)
+        buffer[:size] = data
+        self.bytes_read += size
+        return size
+
+
 def _request_data(
     table_id: str,
     open_data_collection: OpenDataCollection = 'city',
@@ -80,21 +488,38 @@ def _request_data(
         '$query': query
     }
 
+    # requests always sends `gzip, deflate`; urllib3's list adds br (and zstd), which compress
+    # better, when their decoders are installed
     headers = {
-        'X-App-Token': token
+        'X-App-Token': token,
+        'Accept-Encoding': ACCEPT_ENCODING
     }
 
-    r = requests.get(
+    fingerprint = climate_dash_tools.soql.fingerprint(query, table_id, open_data_collection)
+
+    r = _timed_get(
         request_urls.get('data_request_url'),
+        _latency_key(request_urls.get('data_request_url'), table_id, fingerprint),
+        DATA_TIMEOUT_SECONDS,
         headers=headers,
         params=params,
-        timeout=300
+        stream=True
     )
 
     try:
         r.raise_for_status()
 
-        data_json = r.json()
+        decompressed_bytes = 0
+
+        def counted_chunks():
+            nonlocal decompressed_bytes
+            for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                decompressed_bytes += len(chunk)
+                yield chunk
+
+        data_json = _decode_json_stream(counted_chunks())
+
+        _record_transfer(r, fingerprint, decompressed_bytes)
 
         if isinstance(data_json, list) and len(data_json) in (1000,1000000):
             logger.warning('Data was truncated at %s rows. Increase LIMIT in query to get full data.', len(data_json))
@@ -110,11 +535,201 @@ def _request_data(
             error_response = None
         logger.error('connection error. status code: %s, response: %s', r.status_code, error_response)
         raise
+    finally:
+        r.close()
+
+
+def _get_column_types(
+    response_headers: Dict[str, str],
+    table_id: str = None,
+    open_data_collection: OpenDataCollection = 'city'
+) -> Dict[str, str]:
+    """
+    SoQL data type by column, from the `X-SODA2-*` response headers,
+    or the table's (cached) schema when those are missing.
+    """
+    fields_raw = response_headers.get('X-SODA2-Fields') if response_headers is not None else None
+    types_raw = response_headers.get('X-Soda2-Types') if response_headers is not None else None
+
+    if fields_raw and types_raw:
+        return dict(zip(json.loads(fields_raw), json.loads(types_raw)))
+
+    if table_id is not None:
+        import climate_dash_tools.schema
+        try:
+            logger.info('No data types returned in response. Using table schema')
+            return climate_dash_tools.schema.get_schema(table_id, open_data_collection).types
+        except requests.RequestException as e:
+            logger.warning('Could not get schema of %s: %s', table_id, e)
+
+    return {}
+
+
+def _arrow_column_types(
+    response_headers: Dict[str, str],
+    table_id: str = None,
+    open_data_collection: OpenDataCollection = 'city'
+) -> Dict[str, Any]:
+    import pyarrow as pa
+
+    SODA_ARROW_TYPES = {
+        'number': pa.float64(),
+        'double': pa.float64(),
+        'money': pa.float64(),
+        'percent': pa.float64(),
+        'checkbox': pa.bool_(),
+        'floating_timestamp': pa.timestamp('ms'),
+        'fixed_timestamp': pa.timestamp('ms', tz='UTC'),
+        'calendar_date': pa.timestamp('ms'),
+    }
+
+    column_types = _get_column_types(response_headers, table_id, open_data_collection)
+
+    if not column_types:
+        logger.warning('No data types found. Inferring types')
+
+    return {
+        field: SODA_ARROW_TYPES.get(dtype, pa.string())
+        for field, dtype in column_types.items()
+    }
+
+
+def _request_arrow(
+    table_id: str,
+    open_data_collection: OpenDataCollection = 'city',
+    query: str = 'SELECT * LIMIT 1000000'
+):
+    """
+    Request data as CSV and parse the response stream straight into a pyarrow Table,
+    typed from the `X-SODA2-*` headers, without building Python objects per row.
+    """
+    try:
+        import pyarrow.csv
+    except ImportError as e:
+        raise ImportError("backend='arrow' requires pyarrow. Install it with `pip install pyarrow`") from e
+
+    request_urls = _construct_open_data_urls(
+        table_id=table_id,
+        open_data_collection=open_data_collection
+    )
+
+    token = _load_token()
+
+    params = {
+        '$query': query
+    }
+
+    # as for JSON, see `_request_data`
+    headers = {
+        'X-App-Token': token,
+        'Accept-Encoding': ACCEPT_ENCODING
+    }
+
+    fingerprint = climate_dash_tools.soql.fingerprint(query, table_id, open_data_collection)
+
+    r = _timed_get(
+        request_urls.get('csv_request_url'),
+        _latency_key(request_urls.get('csv_request_url'), table_id, fingerprint),
+        DATA_TIMEOUT_SECONDS,
+        headers=headers,
+        params=params,
+        stream=True
+    )
+
+    try:
+        r.raise_for_status()
+
+        stream = _DecompressingStream(r)
+
+        table = pyarrow.csv.read_csv(
+            stream,
+            read_options=pyarrow.csv.ReadOptions(block_size=STREAM_CHUNK_SIZE),
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=_arrow_column_types(r.headers, table_id, open_data_collection),
+                strings_can_be_null=True
+            )
+        )
+
+        _record_transfer(r, fingerprint, stream.bytes_read)
+
+        if table.num_rows in (1000,1000000):
+            logger.warning('Data was truncated at %s rows. Increase LIMIT in query to get full data.', table.num_rows)
+        else:
+            logger.info("Received %s rows", table.num_rows)
+
+        return table
+
+    except requests.HTTPError as e:
+        try:
+            error_response = r.json()
+        except json.JSONDecodeError as e:
+            error_response = None
+        logger.error('connection error. status code: %s, response: %s', r.status_code, error_response)
+        raise
+    finally:
+        r.close()
+
+
+def _optimize_column(col: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(col):
+        return col
+
+    if pd.api.types.is_integer_dtype(col):
+        return pd.to_numeric(col, downcast='integer')
+
+    if pd.api.types.is_float_dtype(col):
+        # only downcast to float32 when no precision is lost
+        downcast = pd.to_numeric(col, downcast='float')
+        if downcast.dtype != col.dtype and downcast.astype(col.dtype).equals(col):
+            return downcast
+        return col
+
+    # missing values (NaN or None) don't stop a column from being a string column
+    if pd.api.types.infer_dtype(col, skipna=True) == 'string':
+        if col.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(col):
+            return col.astype('category')
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return col
+        return col.astype('string[pyarrow]')
+
+    return col
+
+
+def _optimize_memory(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink a parsed DataFrame: repetitive string columns become categoricals,
+    other string columns Arrow-backed strings (if pyarrow is installed),
+    and numeric columns are downcast where that is lossless.
+    """
+    before = df.memory_usage(deep=True)
+
+    df = df.apply(_optimize_column)
+
+    after = df.memory_usage(deep=True)
+
+    logger.info(
+        'Memory usage: %.1f MB -> %.1f MB (%s)',
+        before.sum() / 1e6,
+        after.sum() / 1e6,
+        ', '.join(
+            f'{column}: {before[column] / 1e6:.1f} -> {after[column] / 1e6:.1f} MB'
+            for column in (before - after).sort_values(ascending=False).index
+            if column != 'Index'
+        )
+    )
+
+    return df
 
 
 def _parse_data(
     data_json: RawData, 
-    response_headers: Dict[str, str]
+    response_headers: Dict[str, str],
+    optimize_memory: bool = False,
+    table_id: str = None,
+    open_data_collection: OpenDataCollection = 'city',
+    column_types: Dict[str, str] = None
 ) -> pd.DataFrame:
     def convert_column(col, dtype):
         if dtype in ('floating_timestamp', 'fixed_timestamp'):
@@ -124,45 +739,247 @@ def _parse_data(
         else:
             return col
 
-    if response_headers is None:
-        logger.warning('No data types returned in response. Not converting types')
-        return pd.DataFrame(data_json)
-
-    fields_raw = response_headers.get('X-SODA2-Fields')
-    types_raw = response_headers.get('X-Soda2-Types')
-
-    if not fields_raw or not types_raw:
-        logger.warning('No data types returned in response. Not converting types')
-        return pd.DataFrame(data_json)
-
-    fields = json.loads(fields_raw)
-    dtypes = json.loads(types_raw)
-
-    dtype_dict = dict(zip(fields, dtypes))
-
     df = pd.DataFrame(data_json)
 
     if df.empty:
         logger.warning('No data.')
         return df
+
+    dtype_dict = column_types or _get_column_types(response_headers, table_id, open_data_collection)
+
+    if not dtype_dict:
+        logger.warning('No data types found. Not converting types')
     else:
         df = df.apply(
             lambda col: convert_column(col, dtype_dict.get(col.name, None))
         )
 
+    if optimize_memory and not df.empty:
+        df = _optimize_memory(df)
+
     return df
 
 
+def _copy_on_write() -> bool:
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+
+def _copy_result(result):
+    """A copy of a shared result that its receiver can modify without affecting anyone else's"""
+    if isinstance(result, Dataset):
+        return Dataset(_copy_result(result.data), copy.deepcopy(result.metadata))
+    if isinstance(result, pd.DataFrame):
+        # with copy-on-write, a shallow copy only copies data once either side modifies it
+        return result.copy(deep=not _copy_on_write())
+    if isinstance(result, (list, dict)):
+        return copy.deepcopy(result)
+    # e.g. pyarrow Tables, which are immutable
+    return result
+
+
+def _single_flight(key, function: Callable[[], Any]) -> Any:
+    """
+    Call `function`, unless a call with the same key is already in flight in this process,
+    in which case wait for that call and share its result (or exception).
+
+    When a result is shared, every caller gets its own copy of it.
+    """
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _in_flight[key] = _Call()
+        else:
+            call.waiters += 1
+
+    if not is_leader:
+        logger.debug('waiting for identical request in flight: %s', key)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return _copy_result(call.result)
+
+    try:
+        call.result = function()
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+            is_shared = call.waiters > 0
+        call.done.set()
+
+    if is_shared:
+        logger.info('shared result of %s with %s identical concurrent requests', key, call.waiters)
+        return _copy_result(call.result)
+
+    return call.result
+
+
+def _result_size(result) -> int:
+    """Approximate in-memory size of a result, in bytes"""
+    if isinstance(result, Dataset):
+        return _result_size(result.data) + len(json.dumps(result.metadata, default=str))
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True, deep=True).sum())
+    if isinstance(result, list):
+        if not result:
+            return 0
+        sample = result[:MEMO_SIZE_SAMPLE_RECORDS]
+        return len(json.dumps(sample, default=str)) * len(result) // len(sample)
+    # e.g. pyarrow Tables
+    return getattr(result, 'nbytes', 0)
+
+
+def enable_memo(max_bytes: int = 1024 ** 3, ttl_seconds: Union[float, None] = 3600):
+    """
+    Keep `from_open_data` results in memory, so repeating a call (e.g. re-running a notebook cell)
+    returns a copy of the earlier result instead of requesting it again.
+
+    Results are keyed by table, collection, normalized query and the other arguments, evicted
+    least recently used first once they take up more than `max_bytes`, and expire `ttl_seconds`
+    after they were fetched (never, if None). Calling again changes the limits and keeps the cache.
+    """
+    global _memo, _memo_max_bytes, _memo_ttl_seconds
+    with _memo_lock:
+        if _memo is None:
+            _memo = collections.OrderedDict()
+        _memo_max_bytes = max_bytes
+        _memo_ttl_seconds = ttl_seconds
+        _evict_memo()
+
+
+def disable_memo():
+    """Stop caching `from_open_data` results in memory, and drop the cache"""
+    global _memo, _memo_size_bytes
+    with _memo_lock:
+        _memo = None
+        _memo_size_bytes = 0
+
+
+def clear_memo():
+    """Drop every cached `from_open_data` result (and reset the stats), keeping the cache enabled"""
+    global _memo_size_bytes
+    with _memo_lock:
+        if _memo is not None:
+            _memo.clear()
+        _memo_size_bytes = 0
+        _memo_counts.clear()
+
+
+def memo_stats() -> MemoStats:
+    """Hits, misses, evictions and current size of the `from_open_data` memo"""
+    with _memo_lock:
+        return MemoStats(
+            hits=_memo_counts['hits'],
+            misses=_memo_counts['misses'],
+            evictions=_memo_counts['evictions'],
+            expirations=_memo_counts['expirations'],
+            entries=len(_memo) if _memo is not None else 0,
+            size_bytes=_memo_size_bytes
+        )
+
+
+def _evict_memo():
+    """Drop least recently used results until the memo fits; call with `_memo_lock` held"""
+    global _memo_size_bytes
+    while _memo and _memo_size_bytes > _memo_max_bytes:
+        _, entry = _memo.popitem(last=False)
+        _memo_size_bytes -= entry.size_bytes
+        _memo_counts['evictions'] += 1
+
+
+def _memo_get(key):
+    """The memoized result for key, or None; call only with the memo enabled"""
+    global _memo_size_bytes
+    with _memo_lock:
+        if _memo is None:
+            return None
+        entry = _memo.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            del _memo[key]
+            _memo_size_bytes -= entry.size_bytes
+            _memo_counts['expirations'] += 1
+            entry = None
+        if entry is None:
+            _memo_counts['misses'] += 1
+            return None
+        _memo.move_to_end(key)
+        _memo_counts['hits'] += 1
+    return entry.result
+
+
+def _memo_put(key, result):
+    global _memo_size_bytes
+    size_bytes = _result_size(result)
+    if size_bytes > _memo_max_bytes:
+        logger.debug('not memoizing %s: %s bytes is more than the memo size', key, size_bytes)
+        return
+    expires_at = time.monotonic() + _memo_ttl_seconds if _memo_ttl_seconds is not None else math.inf
+    with _memo_lock:
+        if _memo is None:
+            return
+        previous = _memo.pop(key, None)
+        if previous is not None:
+            _memo_size_bytes -= previous.size_bytes
+        _memo[key] = _MemoEntry(result, size_bytes, expires_at)
+        _memo_size_bytes += size_bytes
+        _evict_memo()
+
+
+def _request_view(
+    table_id: str,
+    open_data_collection: OpenDataCollection = 'city'
+) -> Metadata:
+    request_urls = _construct_open_data_urls(
+        table_id=table_id,
+        open_data_collection=open_data_collection
+    )
+    view_request_url = request_urls.get('view_request_url')
+    r = _timed_get(
+        view_request_url,
+        _latency_key(view_request_url, table_id, 'view'),
+        METADATA_TIMEOUT_SECONDS
+    )
+
+    try:
+        r.raise_for_status()
+        return r.json()
+
+    except requests.HTTPError as e:
+        try:
+            error_response = r.json()
+        except json.JSONDecodeError as e:
+            error_response = None
+        logger.error('connection error. status code: %s, response: %s', r.status_code, error_response)
+        raise
+
+
 def _request_metadata(
     table_id: str, 
     open_data_collection: OpenDataCollection = 'city'
+) -> Metadata:
+    return _single_flight(
+        ('metadata', table_id, open_data_collection),
+        lambda: _fetch_metadata(table_id, open_data_collection)
+    )
+
+
+def _fetch_metadata(
+    table_id: str,
+    open_data_collection: OpenDataCollection = 'city'
 ) -> Metadata:
     request_urls = _construct_open_data_urls(
         table_id=table_id,
         open_data_collection=open_data_collection
     )
     metadata_request_url = request_urls.get('metadata_request_url')
-    r = requests.get(metadata_request_url, timeout=500)
+    r = _timed_get(
+        metadata_request_url,
+        _latency_key(metadata_request_url, table_id, 'metadata'),
+        METADATA_TIMEOUT_SECONDS
+    )
 
     try:
         r.raise_for_status()
@@ -179,12 +996,76 @@ def _request_metadata(
 
 # public API
 
+def get_metadata(
+    table_id: str,
+    open_data_collection: OpenDataCollection = 'city'
+) -> Metadata:
+    """
+    Fetch table metadata (including `dataUpdatedAt`) from NYC Open Data or NYS Open Data.
+    """
+    return _request_metadata(table_id, open_data_collection)
+
+
+def get_view(
+    table_id: str,
+    open_data_collection: OpenDataCollection = 'city'
+) -> Metadata:
+    """
+    Fetch the full view definition of a table, including its `columns`.
+    """
+    return _request_view(table_id, open_data_collection)
+
+
+def parse_records(
+    data_json: RawData,
+    table_id: str = None,
+    open_data_collection: OpenDataCollection = 'city',
+    optimize_memory: bool = False,
+    column_types: Dict[str, str] = None
+) -> pd.DataFrame:
+    """
+    Parse raw records (e.g. from `parse=False`) into a DataFrame, typed by `column_types`
+    (e.g. from `fetch_page`) if given, otherwise from the table's cached schema.
+    """
+    return _parse_data(
+        data_json,
+        None,
+        optimize_memory=optimize_memory,
+        table_id=table_id,
+        open_data_collection=open_data_collection,
+        column_types=column_types
+    )
+
+
+def fetch_page(
+    table_id: str,
+    query: Union[str, climate_dash_tools.soql.Query],
+    open_data_collection: OpenDataCollection = 'city'
+) -> Page:
+    """
+    Make a single data request, e.g. for one page of a query fetched page by page
+    (see `climate_dash_tools.soql.Query.paged`).
+
+    Unlike `from_open_data`, the request is always made (it isn't shared, memoized or passed
+    to `raw_data_hooks`), and the raw records are returned with their column types, for
+    `parse_records` once all pages are in.
+    """
+    data_json, response_headers = _request_data(
+        table_id=table_id,
+        open_data_collection=open_data_collection,
+        query=str(query)
+    )
+    return Page(data_json, _get_column_types(response_headers))
+
+
 def from_open_data(
     table_id: str,
-    query: str = 'SELECT * LIMIT 1000000',
+    query: Union[str, climate_dash_tools.soql.Query] = 'SELECT * LIMIT 1000000',
     open_data_collection: OpenDataCollection = 'city',
     parse: bool = True,
-    include_metadata: bool = False
+    include_metadata: bool = False,
+    optimize_memory: bool = False,
+    backend: Backend = 'pandas'
 ) -> Union[pd.DataFrame, RawData, Tuple[Union[pd.DataFrame, RawData], Metadata]]:
     """
     Fetch data (and optionally metadata) from NYC Open Data or NYS Open Data.
@@ -195,7 +1076,7 @@ def from_open_data(
     table_id : str
         NYC OpenData table_id, e.g. `5e9h-x6ak`
 
-    query : str, optional
+    query : str or climate_dash_tools.soql.Query, optional
         SQL query to pass to OpenData. 
         This SQL flavor accepts date manipulations such as [`date_extract_y`](https://dev.socrata.com/docs/datatypes/floating_timestamp#,) and geographic filters such as [`within_box`](https://dev.socrata.com/docs/functions/within_box) 
 
@@ -208,25 +1089,126 @@ def from_open_data(
     include_metadata : bool, default False
         also return table metadata.
 
+    optimize_memory : bool, default False
+        if True (and parse=True), store repetitive string columns as categoricals, other strings
+        as Arrow strings, and downcast numeric columns where lossless. Logs memory usage before and after.
+
+    backend : {'pandas', 'arrow', 'arrow_dtype'}, default 'pandas'
+        'arrow' returns a pyarrow Table and 'arrow_dtype' a DataFrame with `pd.ArrowDtype` columns.
+        Both are read column-wise straight from a CSV response stream (requires pyarrow) and ignore `parse`.
+
+    Identical calls made concurrently in one process (e.g. from threads) share one request,
+    and each caller gets its own copy of the result. With `enable_memo`, results are also
+    kept in memory and repeated calls return copies of them.
+
     Returns
     -------
     Union[pd.DataFrame, RawData, Tuple[Union[pd.DataFrame, RawData], Metadata]]
         If include_metadata is False:
             - pd.DataFrame if parse=True
             - raw list JSON if parse=False
+            - pyarrow.Table if backend='arrow'
         If include_metadata is True:
             - Dataset named tuple with (`data`, `metadata`)
     """
-    data_json, response_headers = _request_data(
-        table_id=table_id,
-        open_data_collection=open_data_collection,
-        query=query
+    query = str(query)
+
+    # identical concurrent requests (e.g. from pipelines running in threads) share one HTTP call
+    key = (
+        'data',
+        climate_dash_tools.soql.fingerprint(query, table_id, open_data_collection),
+        parse,
+        include_metadata,
+        optimize_memory,
+        backend
     )
 
-    if parse:
-        data = _parse_data(data_json, response_headers)
+    if _memo is not None:
+        memoized = _memo_get(key)
+        if memoized is not None:
+            logger.info('using memoized result of %s', key)
+            return _copy_result(memoized)
+
+    # a run's journal serves results from an earlier failed run of the pipeline, while the table is unchanged
+    journal = result_journal
+    data_updated_at = None
+    if journal is not None and journal.current_pipeline is not None:
+        data_updated_at = journal.get_table_version(
+            table_id,
+            open_data_collection,
+            lambda: _journal_table_version(table_id, open_data_collection)
+        )
+    if data_updated_at is None:
+        journal = None
+
+    if journal is not None:
+        journaled = journal.get_result(key, data_updated_at)
+        if journaled is not None:
+            return journaled
+
+    result = _single_flight(
+        key,
+        lambda: _from_open_data(table_id, query, open_data_collection, parse, include_metadata, optimize_memory, backend)
+    )
+
+    if journal is not None:
+        # the journal keeps its own copy, in case the pipeline fails after modifying the caller's
+        journal.record_result(key, _copy_result(result), data_updated_at)
+
+    if _memo is not None:
+        # the memo keeps its own copy, so the caller can modify theirs
+        _memo_put(key, _copy_result(result))
+
+    return result
+
+
+def _journal_table_version(table_id: str, open_data_collection: OpenDataCollection) -> Union[str, None]:
+    try:
+        return get_metadata(table_id, open_data_collection).get('dataUpdatedAt')
+    except requests.RequestException as e:
+        # without it, a recorded result couldn't be told from a stale one, so nothing is journaled
+        logger.warning('could not get version of %s for the run journal: %s', table_id, e)
+        return None
+
+
+def _from_open_data(
+    table_id: str,
+    query: str,
+    open_data_collection: OpenDataCollection,
+    parse: bool,
+    include_metadata: bool,
+    optimize_memory: bool,
+    backend: Backend
+):
+    if backend in ('arrow', 'arrow_dtype'):
+        data = _request_arrow(
+            table_id=table_id,
+            open_data_collection=open_data_collection,
+            query=query
+        )
+        if backend == 'arrow_dtype':
+            data = data.to_pandas(types_mapper=pd.ArrowDtype)
+
     else:
-        data = data_json
+        data_json, response_headers = _request_data(
+            table_id=table_id,
+            open_data_collection=open_data_collection,
+            query=query
+        )
+
+        for hook in raw_data_hooks:
+            hook(table_id, open_data_collection, query, data_json)
+
+        if parse:
+            data = _parse_data(
+                data_json,
+                response_headers,
+                optimize_memory=optimize_memory,
+                table_id=table_id,
+                open_data_collection=open_data_collection
+            )
+        else:
+            data = data_json
 
     if include_metadata:
         metadata = _request_metadata(table_id, open_data_collection)
@@ -0,0 +1,113 @@
+import contextvars
+import json
+import logging
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import climate_dash_tools.extract
+
+logger = logging.getLogger(__name__)
+
+# Kept next to the outputs so it is committed (and restored) along with them
+STATE_FILE = pathlib.Path('Data') / 'run_state.json'
+
+# Source versions recorded for each pipeline's last successful run
+RunState = Dict[str, Dict[str, str]]
+
+
+def table_source(table_id: str, open_data_collection: climate_dash_tools.extract.OpenDataCollection = 'city') -> str:
+    """Source key for an Open Data table, e.g. `city:rbed-zzin`"""
+    return f'{open_data_collection}:{table_id}'
+
+
+def _get_source_version(source: str) -> Optional[str]:
+    if source.startswith(('http://', 'https://')):
+        r = climate_dash_tools.extract.get_session().head(source, allow_redirects=True, timeout=30)
+        r.raise_for_status()
+        return r.headers.get('ETag')
+
+    open_data_collection, table_id = source.split(':', 1)
+    metadata = climate_dash_tools.extract.get_metadata(table_id, open_data_collection)
+    return metadata.get('dataUpdatedAt')
+
+
+def get_source_versions(sources: Iterable[str], max_workers: int = 16) -> Dict[str, Optional[str]]:
+    """
+    Fetch the current version of each source concurrently.
+
+    Open Data tables (`city:xxxx-xxxx`) are versioned by their `dataUpdatedAt`
+    metadata, URLs by their ETag. Sources whose version can't be fetched map to None.
+    """
+    sources = sorted(set(sources))
+
+    def fetch(source):
+        try:
+            return _get_source_version(source)
+        except Exception as e:
+            logger.warning('could not get version of %s: %s', source, e)
+            return None
+
+    if not sources:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(sources))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, fetch, source) for source in sources]
+        return dict(zip(sources, (future.result() for future in futures)))
+
+
+def load_state() -> RunState:
+    if not STATE_FILE.exists():
+        return {}
+    return json.loads(STATE_FILE.read_text())
+
+
+def save_state(state: RunState):
+    STATE_FILE.parent.mkdir(exist_ok=True, parents=True)
+    STATE_FILE.write_text(json.dumps(state, indent=2, sort_keys=True) + '\n')
+
+
+def get_pipeline_source_versions(pipeline_sources: Dict[str, List[str]]) -> Dict[str, Dict[str, Optional[str]]]:
+    """Current version of each pipeline's sources, fetched once per source"""
+    versions = get_source_versions(
+        source for sources in pipeline_sources.values() for source in sources
+    )
+    return {
+        pipeline_name: {source: versions[source] for source in sources}
+        for pipeline_name, sources in pipeline_sources.items()
+    }
+
+
+def find_changed_pipelines(
+    pipeline_sources: Dict[str, List[str]],
+    state: RunState
+) -> Tuple[List[str], Dict[str, Dict[str, Optional[str]]]]:
+    """
+    Determine which pipelines have at least one source that advanced since their last successful run.
+
+    A pipeline is also considered changed if it has never succeeded, declares no
+    sources, or any of its source versions could not be fetched.
+
+    Returns
+    -------
+    Tuple of (changed pipeline names, current source versions by pipeline)
+    """
+    current_versions = get_pipeline_source_versions(pipeline_sources)
+
+    changed = []
+
+    for pipeline_name, sources in pipeline_sources.items():
+        current = current_versions[pipeline_name]
+        previous = state.get(pipeline_name)
+
+        if (
+            not sources
+            or previous is None
+            or any(version is None for version in current.values())
+            or any(previous.get(source) != version for source, version in current.items())
+        ):
+            changed.append(pipeline_name)
+        else:
+            logger.info('%s: sources unchanged since last successful run', pipeline_name)
+
+    return changed, current_versions
@@ -0,0 +1,194 @@
+import functools
+import json
+import logging
+import os
+import pathlib
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import requests
+import shapely
+
+import climate_dash_tools.cache
+import climate_dash_tools.extract
+
+logger = logging.getLogger(__name__)
+
+# community district boundaries, downloaded from Open Data to the local cache when missing (so
+# not committed with the data by scheduled runs, which download them again each time); functions
+# also take the path of any other GeoJSON of them, e.g. from the Department of City Planning
+COMMUNITY_DISTRICTS_FILE = climate_dash_tools.cache.CACHE_DIRECTORY / 'reference' / 'community_districts.geojson'
+
+# the Department of City Planning's "Community Districts" on NYC Open Data
+COMMUNITY_DISTRICTS_TABLE_ID = '5crt-au7u'
+
+# names of the district code column (e.g. 101 for Manhattan CD 1) in the common boundary files;
+# the code is the same as air quality `GeoID`s for `GeoType == 'CD'`
+COMMUNITY_DISTRICT_ID_COLUMNS = ('BoroCD', 'boro_cd', 'borocd', 'GeoID')
+
+CRS = 'EPSG:4326'
+
+class DistrictIndex(NamedTuple):
+    tree:shapely.STRtree
+    geo_ids:np.ndarray
+
+
+def _is_geometry(value) -> bool:
+    return isinstance(value, dict) and 'type' in value and 'coordinates' in value
+
+
+def download_community_districts(
+    path=COMMUNITY_DISTRICTS_FILE,
+    table_id: str = COMMUNITY_DISTRICTS_TABLE_ID,
+    open_data_collection: climate_dash_tools.extract.OpenDataCollection = 'city'
+):
+    """Download the community district boundaries from Open Data to a GeoJSON file at `path`"""
+    path = pathlib.Path(path)
+
+    records = climate_dash_tools.extract.from_open_data(
+        table_id,
+        'SELECT * LIMIT 1000',
+        open_data_collection=open_data_collection,
+        parse=False
+    )
+
+    features = []
+    for record in records:
+        # the geometry column (e.g. `the_geom`) comes as GeoJSON
+        geometry_column = next((column for column, value in record.items() if _is_geometry(value)), None)
+        if geometry_column is None:
+            continue
+        features.append({
+            'type': 'Feature',
+            'properties': {column: value for column, value in record.items() if column != geometry_column},
+            'geometry': record[geometry_column],
+        })
+
+    if not features:
+        raise ValueError(f'no district geometries in {table_id}')
+
+    path.parent.mkdir(exist_ok=True, parents=True)
+    temporary_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    temporary_path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    os.replace(temporary_path, path)
+
+    logger.info('downloaded %s community districts from %s to %s', len(features), table_id, path)
+
+
+def community_districts_available(path=COMMUNITY_DISTRICTS_FILE) -> bool:
+    """Whether the boundary file exists, downloading it first if it doesn't"""
+    path = pathlib.Path(path)
+
+    if not path.exists():
+        try:
+            download_community_districts(path)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning('could not download community district boundaries: %s', e)
+            return False
+
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def load_community_districts(path=COMMUNITY_DISTRICTS_FILE) -> gpd.GeoDataFrame:
+    """
+    Community district polygons, with their code as `GeoID`, in EPSG:4326.
+    Read from `path` once per process (and downloaded there first if missing).
+    """
+    path = pathlib.Path(path)
+
+    if not path.exists():
+        download_community_districts(path)
+
+    districts = gpd.read_file(path)
+
+    id_column = next((column for column in COMMUNITY_DISTRICT_ID_COLUMNS if column in districts.columns), None)
+    if id_column is None:
+        raise ValueError(f'{path} has none of the district code columns {COMMUNITY_DISTRICT_ID_COLUMNS}')
+
+    if districts.crs is None:
+        districts = districts.set_crs(CRS)
+
+    districts = (
+        districts
+        .to_crs(CRS)
+        .rename(columns={id_column: 'GeoID'})
+        .astype({'GeoID': int})
+        [['GeoID', 'geometry']]
+        .sort_values('GeoID', ignore_index=True)
+    )
+
+    logger.info('loaded %s community districts from %s', len(districts), path)
+
+    return districts
+
+
+@functools.lru_cache(maxsize=None)
+def get_district_index(path=COMMUNITY_DISTRICTS_FILE) -> DistrictIndex:
+    """Spatial index over the (prepared) community district polygons, built once per process"""
+    districts = load_community_districts(path)
+
+    geometries = np.asarray(districts.geometry.values)
+    shapely.prepare(geometries)
+
+    return DistrictIndex(shapely.STRtree(geometries), districts['GeoID'].to_numpy())
+
+
+def assign_community_districts(points: gpd.GeoSeries, path=COMMUNITY_DISTRICTS_FILE) -> pd.Series:
+    """
+    Community district code (`GeoID`) of each point, in one bulk query of the district index.
+    Points outside all districts (or without a location) get <NA>.
+    """
+    if points.crs is not None and points.crs != CRS:
+        points = points.to_crs(CRS)
+
+    index = get_district_index(path)
+
+    point_positions, district_positions = index.tree.query(np.asarray(points.values), predicate='intersects')
+
+    # a point on a shared boundary intersects both districts; keep the first
+    point_positions, first = np.unique(point_positions, return_index=True)
+
+    geo_ids = pd.array(np.full(len(points), pd.NA), dtype='Int64')
+    geo_ids[point_positions] = index.geo_ids[district_positions[first]]
+
+    return pd.Series(geo_ids, index=points.index, name='GeoID')
+
+
+def count_by_community_district(
+    points: gpd.GeoDataFrame,
+    by: Optional[str] = None,
+    path=COMMUNITY_DISTRICTS_FILE
+) -> pd.DataFrame:
+    """
+    Number of points in each community district, as a `count` column,
+    or, if `by` is given, one column per value of `by` plus a `total`.
+    Every district is included, with zero counts where it has no points.
+
+    Points outside all districts are left out (and logged).
+    """
+    geo_ids = assign_community_districts(points.geometry, path)
+
+    unassigned = geo_ids.isna().sum()
+    if unassigned:
+        logger.warning('%s of %s points are not in any community district', unassigned, len(points))
+
+    all_geo_ids = pd.Index(get_district_index(path).geo_ids, name='GeoID')
+
+    if by is None:
+        return (
+            geo_ids
+            .value_counts()
+            .reindex(all_geo_ids, fill_value=0)
+            .to_frame('count')
+        )
+
+    counts = (
+        pd.crosstab(geo_ids, points[by])
+        .reindex(all_geo_ids, fill_value=0)
+        .rename_axis(columns=None)
+    )
+
+    return counts.assign(total=counts.sum(axis=1))
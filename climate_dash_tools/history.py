@@ -0,0 +1,298 @@
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import logging
+import os
+import pathlib
+import shutil
+import zlib
+from typing import Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIRECTORY = pathlib.Path('History')
+
+# Chunk boundaries are content-defined: a chunk ends after a line whose hash is 0 modulo
+# CHUNK_BOUNDARY_LINES (once it is at least MIN_CHUNK_BYTES), so inserting or removing rows
+# only changes the chunks around them and every other chunk is deduplicated.
+CHUNK_BOUNDARY_LINES = 512
+MIN_CHUNK_BYTES = 16 * 1024
+MAX_CHUNK_BYTES = 1024 * 1024
+
+# names of all datasets, with the first run that recorded each, in the index directory
+DATASET_NAMES_FILE = 'datasets.jsonl'
+
+class DatasetVersion(NamedTuple):
+    run:int
+    name:str
+    chunks:List[str]
+    size:int
+    sha256:str
+
+
+def _split_chunks(data: bytes) -> List[bytes]:
+    chunks = []
+    chunk = []
+    chunk_size = 0
+
+    for line in io.BytesIO(data):
+        chunk.append(line)
+        chunk_size += len(line)
+
+        if (
+            chunk_size >= MAX_CHUNK_BYTES
+            or (chunk_size >= MIN_CHUNK_BYTES and zlib.crc32(line) % CHUNK_BOUNDARY_LINES == 0)
+        ):
+            chunks.append(b''.join(chunk))
+            chunk = []
+            chunk_size = 0
+
+    if chunk:
+        chunks.append(b''.join(chunk))
+
+    return chunks
+
+
+def _write_atomic(path: pathlib.Path, data: bytes):
+    temporary_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    temporary_path.write_bytes(data)
+    os.replace(temporary_path, path)
+
+
+class HistoryStore:
+    """
+    Versioned, content-addressed store for raw extracts and summary outputs.
+
+    Each dataset is split into content-defined chunks stored once per distinct content
+    (`objects/`), and each run records which chunks make up each dataset (`runs/`).
+    Storing an unchanged dataset, or the unchanged parts of a changed one, costs nothing
+    beyond its entry in the run manifest.
+
+    Each dataset also has an index of the runs that recorded it (`index/`), so looking up
+    a version reads only that dataset's entries rather than every run's manifest.
+    """
+
+    def __init__(self, root=HISTORY_DIRECTORY):
+        self.root = pathlib.Path(root)
+        self.objects_directory = self.root / 'objects'
+        self.runs_directory = self.root / 'runs'
+        self.index_directory = self.root / 'index'
+        self.objects_directory.mkdir(exist_ok=True, parents=True)
+        self.runs_directory.mkdir(exist_ok=True, parents=True)
+
+        if not self.index_directory.exists():
+            self.rebuild_index()
+
+    # writing
+
+    def _put_chunk(self, chunk: bytes) -> str:
+        digest = hashlib.sha256(chunk).hexdigest()
+        path = self.objects_directory / digest[:2] / digest
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            _write_atomic(path, zlib.compress(chunk))
+        return digest
+
+    def new_run(self) -> 'HistoryRun':
+        return HistoryRun(self)
+
+    def _commit(self, datasets: Dict[str, Dict], note: Optional[str]) -> int:
+        runs = self.list_runs()
+        run = runs[-1] + 1 if runs else 1
+
+        manifest = {
+            'run': run,
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'note': note,
+            'datasets': datasets,
+        }
+
+        path = self.runs_directory / f'{run:06d}.json'
+        temporary_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        temporary_path.write_bytes(json.dumps(manifest, indent=1).encode())
+        try:
+            # unlike a replace, linking fails if the run exists
+            os.link(temporary_path, path)
+        except FileExistsError:
+            raise FileExistsError(f'run {run} was committed concurrently') from None
+        finally:
+            temporary_path.unlink()
+
+        self._index_run(run, datasets)
+
+        logger.info('recorded history run %s with %s datasets', run, len(datasets))
+
+        return run
+
+    # index
+
+    def _index_path(self, name: str) -> pathlib.Path:
+        return self.index_directory / f'{hashlib.sha256(name.encode()).hexdigest()[:32]}.jsonl'
+
+    def _index_run(self, run: int, datasets: Dict[str, Dict]):
+        """Append a run's datasets to their indexes (and new dataset names to the list of names)"""
+        self.index_directory.mkdir(exist_ok=True)
+
+        new_names = []
+        for name, version in datasets.items():
+            path = self._index_path(name)
+            if not path.exists():
+                new_names.append(name)
+            with open(path, 'a') as f:
+                f.write(json.dumps({'run': run, **version}) + '\n')
+
+        if new_names:
+            with open(self.index_directory / DATASET_NAMES_FILE, 'a') as f:
+                f.writelines(json.dumps({'name': name, 'run': run}) + '\n' for name in new_names)
+
+    def rebuild_index(self):
+        """Recreate the dataset indexes from the run manifests"""
+        if self.index_directory.exists():
+            shutil.rmtree(self.index_directory)
+        self.index_directory.mkdir()
+
+        for run in self.list_runs():
+            self._index_run(run, self.get_manifest(run)['datasets'])
+
+    # reading
+
+    def list_runs(self) -> List[int]:
+        return sorted(int(path.stem) for path in self.runs_directory.glob('*.json'))
+
+    def get_manifest(self, run: int) -> Dict:
+        return json.loads((self.runs_directory / f'{run:06d}.json').read_text())
+
+    def get_version(self, name: str, run: Optional[int] = None) -> DatasetVersion:
+        """The version of a dataset as of run `run` (default: latest), i.e. as last recorded at or before it"""
+        path = self._index_path(name)
+
+        entries = []
+        if path.exists():
+            entries = [json.loads(line) for line in path.read_text().splitlines()]
+
+        # concurrent commits may have appended out of order
+        entry = max(
+            (entry for entry in entries if run is None or entry['run'] <= run),
+            key=lambda entry: entry['run'],
+            default=None
+        )
+
+        if entry is None:
+            raise KeyError(f'{name} not recorded as of run {run}')
+
+        return DatasetVersion(name=name, **entry)
+
+    def list_datasets(self, run: Optional[int] = None) -> List[str]:
+        """Names of all datasets recorded as of run `run` (default: latest)"""
+        path = self.index_directory / DATASET_NAMES_FILE
+        if not path.exists():
+            return []
+
+        return sorted({
+            entry['name']
+            for entry in map(json.loads, path.read_text().splitlines())
+            if run is None or entry['run'] <= run
+        })
+
+    def read_bytes(self, name: str, run: Optional[int] = None) -> bytes:
+        version = self.get_version(name, run)
+        return b''.join(
+            zlib.decompress((self.objects_directory / digest[:2] / digest).read_bytes())
+            for digest in version.chunks
+        )
+
+    def read_csv(self, name: str, run: Optional[int] = None, **kwargs) -> pd.DataFrame:
+        return pd.read_csv(io.BytesIO(self.read_bytes(name, run)), **kwargs)
+
+    def diff(self, name: str, run_a: int, run_b: int) -> pd.DataFrame:
+        """
+        Rows of a CSV dataset that differ between two runs, with a `change` column
+        of 'removed' (only in `run_a`) or 'added' (only in `run_b`).
+        """
+        version_a = self.get_version(name, run_a)
+        version_b = self.get_version(name, run_b)
+
+        read_options = dict(dtype=str, keep_default_na=False)
+
+        if version_a.sha256 == version_b.sha256:
+            return self.read_csv(name, run_a, **read_options).iloc[0:0].assign(change=pd.Series(dtype=str))
+
+        data_a = self.read_csv(name, run_a, **read_options)
+        data_b = self.read_csv(name, run_b, **read_options)
+
+        merged = data_a.merge(data_b, how='outer', indicator='change')
+
+        return (
+            merged
+            [merged['change'].ne('both')]
+            .assign(change=lambda df: df['change'].map({'left_only': 'removed', 'right_only': 'added'}))
+            .reset_index(drop=True)
+        )
+
+
+class HistoryRun:
+    """Datasets staged for one run of a HistoryStore; recorded by `commit`"""
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self.datasets: Dict[str, Dict] = {}
+
+    def add_bytes(self, name: str, data: bytes):
+        self.datasets[name] = {
+            'chunks': [self.store._put_chunk(chunk) for chunk in _split_chunks(data)],
+            'size': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+
+    def add_file(self, path, name: Optional[str] = None):
+        path = pathlib.Path(path)
+        self.add_bytes(name or path.name, path.read_bytes())
+
+    def add_records(self, name: str, records: List):
+        """Raw JSON records, stored one per line so that unchanged records deduplicate"""
+        self.add_bytes(name, b''.join(json.dumps(record, sort_keys=True).encode() + b'\n' for record in records))
+
+    def commit(self, note: Optional[str] = None) -> int:
+        return self.store._commit(self.datasets, note)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Inspect the history of raw extracts and summary outputs')
+    parser.add_argument('--root', default=HISTORY_DIRECTORY)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('runs', help='list runs')
+
+    list_parser = subparsers.add_parser('datasets', help='list datasets as of a run')
+    list_parser.add_argument('--run', type=int)
+
+    show_parser = subparsers.add_parser('show', help='print a dataset as of a run')
+    show_parser.add_argument('name')
+    show_parser.add_argument('--run', type=int)
+
+    diff_parser = subparsers.add_parser('diff', help='print rows of a CSV dataset that changed between two runs')
+    diff_parser.add_argument('name')
+    diff_parser.add_argument('run_a', type=int)
+    diff_parser.add_argument('run_b', type=int)
+
+    args = parser.parse_args(args)
+    store = HistoryStore(args.root)
+
+    if args.command == 'runs':
+        for run in store.list_runs():
+            manifest = store.get_manifest(run)
+            print(run, manifest['created'], len(manifest['datasets']), manifest.get('note') or '')
+    elif args.command == 'datasets':
+        print('\n'.join(store.list_datasets(args.run)))
+    elif args.command == 'show':
+        print(store.read_bytes(args.name, args.run).decode(), end='')
+    elif args.command == 'diff':
+        print(store.diff(args.name, args.run_a, args.run_b).to_string())
+
+
+if __name__ == '__main__':
+    main()
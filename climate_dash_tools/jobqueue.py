@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+class Job(NamedTuple):
+    id:int
+    batch:str
+    kind:str
+    payload:Dict[str, Any]
+    attempts:int
+
+class JobResult(NamedTuple):
+    job:Job
+    status:str
+    result:Optional[bytes]
+    error:Optional[str]
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+
+class JobQueue:
+    """
+    Job store in a SQLite file, which can live on storage shared by several hosts.
+
+    Workers claim jobs under a lease, which they extend with heartbeats while working.
+    Jobs whose lease expires (e.g. the worker died) become claimable again, and failed
+    jobs are retried until they have been attempted `max_attempts` times.
+
+    SQLite's default rollback journal is used rather than WAL, since WAL needs shared memory
+    and doesn't work over network filesystems.
+    """
+
+    def __init__(self, path, lease_seconds: float = 300, max_attempts: int = 3):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        with self._connect() as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    batch TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    result BLOB,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, id)')
+
+    @contextmanager
+    def _connect(self):
+        # autocommit; transactions are opened explicitly where needed
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], batch: str) -> int:
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                'INSERT INTO jobs (batch, kind, payload, max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                (batch, kind, json.dumps(payload), self.max_attempts, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Claim the oldest available job, or return None if there is none"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                # jobs whose worker stopped heartbeating and that have no attempts left
+                connection.execute(
+                    '''
+                    UPDATE jobs SET status = 'failed', error = 'lease expired', updated = ?
+                    WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts
+                    ''',
+                    (now, now)
+                )
+
+                row = connection.execute(
+                    '''
+                    SELECT id, batch, kind, payload, attempts FROM jobs
+                    WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?)
+                    ORDER BY id
+                    LIMIT 1
+                    ''',
+                    (now,)
+                ).fetchone()
+
+                if row is None:
+                    connection.execute('COMMIT')
+                    return None
+
+                job_id, batch, kind, payload, attempts = row
+
+                connection.execute(
+                    '''
+                    UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ?
+                    WHERE id = ?
+                    ''',
+                    (worker, now + self.lease_seconds, now, job_id)
+                )
+                connection.execute('COMMIT')
+
+                return Job(job_id, batch, kind, json.loads(payload), attempts + 1)
+
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+    def heartbeat(self, job: Job, worker: str) -> bool:
+        """Extend the lease on a job. Returns False if the job is no longer held by this worker"""
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                '''
+                UPDATE jobs SET lease_expires = ?, updated = ?
+                WHERE id = ? AND worker = ? AND status = 'running'
+                ''',
+                (now + self.lease_seconds, now, job.id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job: Job, worker: str, result: Optional[bytes] = None):
+        with self._connect() as connection:
+            connection.execute(
+                '''
+                UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_expires = NULL, updated = ?
+                WHERE id = ? AND worker = ?
+                ''',
+                (result, time.time(), job.id, worker)
+            )
+
+    def fail(self, job: Job, worker: str, error: str):
+        """Record a failed attempt; the job is retried unless it is out of attempts"""
+        with self._connect() as connection:
+            connection.execute(
+                '''
+                UPDATE jobs SET
+                    status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                    error = ?, lease_expires = NULL, updated = ?
+                WHERE id = ? AND worker = ?
+                ''',
+                (error, time.time(), job.id, worker)
+            )
+
+    def counts(self, batch: str) -> Dict[str, int]:
+        with self._connect() as connection:
+            return dict(connection.execute(
+                'SELECT status, COUNT(*) FROM jobs WHERE batch = ? GROUP BY status',
+                (batch,)
+            ).fetchall())
+
+    def results(self, batch: str) -> List[JobResult]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                '''
+                SELECT id, batch, kind, payload, attempts, status, result, error FROM jobs
+                WHERE batch = ? ORDER BY id
+                ''',
+                (batch,)
+            ).fetchall()
+
+        return [
+            JobResult(Job(job_id, batch, kind, json.loads(payload), attempts), status, result, error)
+            for job_id, batch, kind, payload, attempts, status, result, error in rows
+        ]
+
+    def latest_batch(self) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute('SELECT batch FROM jobs ORDER BY id DESC LIMIT 1').fetchone()
+        return row[0] if row else None
+
+
+def run_worker(
+    queue: JobQueue,
+    handlers: Dict[str, Callable[[Dict[str, Any]], Optional[bytes]]],
+    worker: Optional[str] = None,
+    poll_interval: float = 5,
+    exit_when_empty: bool = True
+) -> int:
+    """
+    Claim and run jobs until the queue is empty (or forever).
+
+    Parameters
+    ----------
+    queue : JobQueue
+
+    handlers : dict
+        function by job kind, taking the job payload and returning the result as bytes (or None)
+
+    worker : str, optional
+        worker id; defaults to host:pid:random
+
+    poll_interval : float
+        seconds to wait before polling an empty queue again, when `exit_when_empty` is False
+
+    Returns
+    -------
+    int
+        number of jobs completed
+    """
+    worker = worker or default_worker_id()
+    completed = 0
+
+    while True:
+        job = queue.claim(worker)
+
+        if job is None:
+            if exit_when_empty:
+                return completed
+            time.sleep(poll_interval)
+            continue
+
+        logger.info('%s claimed job %s (%s, attempt %s)', worker, job.id, job.kind, job.attempts)
+
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(queue.lease_seconds / 3):
+                if not queue.heartbeat(job, worker):
+                    logger.warning('lost lease on job %s', job.id)
+                    return
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            result = handlers[job.kind](job.payload)
+        except Exception as e:
+            logger.error('job %s failed: %r', job.id, e)
+            queue.fail(job, worker, repr(e))
+        else:
+            queue.complete(job, worker, result)
+            completed += 1
+        finally:
+            done.set()
+            heartbeat_thread.join()
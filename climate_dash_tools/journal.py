@@ -0,0 +1,141 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import climate_dash_tools.cache
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE_NAME = 'journal.json'
+RESULTS_DIRECTORY_NAME = 'results'
+
+# pipeline statuses; anything but SUCCEEDED (including RUNNING, i.e. interrupted) is retried
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+INVALID = 'invalid'
+
+
+def _key_hash(key) -> str:
+    return hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()[:16]
+
+
+def _write_atomic(path, data: bytes):
+    temporary_path = path.with_name(path.name + f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    temporary_path.write_bytes(data)
+    os.replace(temporary_path, path)
+
+
+class RunJournal:
+    """
+    Status of each pipeline in the latest run, and the results of the requests made by
+    pipelines that failed, so a retry only repeats the requests that didn't succeed.
+
+    Set as `climate_dash_tools.extract.result_journal` for the duration of a run, it is given the
+    result of every `from_open_data` call, keyed by the request and the table's `dataUpdatedAt`,
+    under the pipeline started last, and serves results it has from an earlier failed run of that
+    pipeline until the table changes. Results are kept in memory, and only written to disk if the
+    pipeline fails, so runs that succeed don't pay for recording them. Results of pipelines whose
+    output was invalid are dropped too, since the data itself may be at fault.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or climate_dash_tools.cache.get_cache_dir('journal')
+        self.path = self.directory / JOURNAL_FILE_NAME
+        self.current_pipeline: Optional[str] = None
+        # results of the current pipeline's requests, by key hash, written out if it fails
+        self._pending: Dict[str, Any] = {}
+        self._table_versions: Dict[Any, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            self.pipelines: Dict[str, Dict[str, Any]] = json.loads(self.path.read_text())['pipelines']
+        else:
+            self.pipelines = {}
+
+    @classmethod
+    def new(cls, directory=None) -> 'RunJournal':
+        """An empty journal, replacing the previous run's"""
+        journal = cls(directory)
+        shutil.rmtree(journal.directory / RESULTS_DIRECTORY_NAME, ignore_errors=True)
+        journal.pipelines = {}
+        journal.save()
+        return journal
+
+    def save(self):
+        _write_atomic(self.path, json.dumps({'pipelines': self.pipelines}, indent=1).encode())
+
+    def failed_pipelines(self) -> List[str]:
+        return [name for name, entry in self.pipelines.items() if entry['status'] != SUCCEEDED]
+
+    def _results_dir(self, pipeline_name: str):
+        return self.directory / RESULTS_DIRECTORY_NAME / pipeline_name
+
+    def start_pipeline(self, pipeline_name: str):
+        self.current_pipeline = pipeline_name
+        with self._lock:
+            self._pending = {}
+            self._table_versions = {}
+        self.pipelines[pipeline_name] = {
+            'status': RUNNING,
+            'started': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        self.save()
+
+    def finish_pipeline(self, pipeline_name: str, status: str, error: Optional[str] = None):
+        entry = self.pipelines.setdefault(pipeline_name, {})
+        entry['status'] = status
+        entry['finished'] = datetime.datetime.now().isoformat(timespec='seconds')
+        if error is not None:
+            entry['error'] = error
+        self.save()
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if status == FAILED:
+            directory = self._results_dir(pipeline_name)
+            directory.mkdir(exist_ok=True, parents=True)
+            for key_hash, result in pending.items():
+                _write_atomic(directory / f'{key_hash}.pickle', pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            logger.info('recorded %s results of %s in the run journal', len(pending), pipeline_name)
+        else:
+            shutil.rmtree(self._results_dir(pipeline_name), ignore_errors=True)
+
+        self.current_pipeline = None
+
+    def get_table_version(self, table_id: str, open_data_collection: str, fetch: Callable[[], Optional[str]]) -> Optional[str]:
+        """The table's `dataUpdatedAt`, fetched with `fetch` once per pipeline"""
+        key = (table_id, open_data_collection)
+        with self._lock:
+            if key in self._table_versions:
+                return self._table_versions[key]
+        version = fetch()
+        with self._lock:
+            return self._table_versions.setdefault(key, version)
+
+    def get_result(self, key, data_updated_at: Optional[str] = None) -> Any:
+        """
+        The result of the request with this key recorded by an earlier failed run of the
+        current pipeline, while the table's `dataUpdatedAt` was the same, or None
+        """
+        if self.current_pipeline is None:
+            return None
+        path = self._results_dir(self.current_pipeline) / f'{_key_hash([key, data_updated_at])}.pickle'
+        if not path.exists():
+            return None
+        logger.info('using result of %s recorded in the run journal', key)
+        return pickle.loads(path.read_bytes())
+
+    def record_result(self, key, result, data_updated_at: Optional[str] = None):
+        """Keep a result of the current pipeline, to be written out if it fails; pass a copy the caller won't modify"""
+        if self.current_pipeline is None:
+            return
+        with self._lock:
+            self._pending[_key_hash([key, data_updated_at])] = result
@@ -1,5 +1,13 @@
+import atexit
+import contextvars
+import copy
+import datetime
+import json
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import multiprocessing
+import queue
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 import pathlib
 
 LOG_DIRECTORY = pathlib.Path('Logs')
@@ -12,43 +20,250 @@ WARN_DIR.mkdir(exist_ok=True)
 
 WARN_FILE = WARN_DIR / 'Warnings.log'
 
-def setup_logging_for_pipeline(pipeline_filename: str):
+# pipeline that log records emitted in the current context belong to
+_current_pipeline = contextvars.ContextVar('current_pipeline', default=None)
+
+_handlers = []
+_listeners = []
+_worker_queue = None
+
+
+class LazySummary:
     """
-    Sets up logging so that ALL log messages (from any module) are handled by the same handlers:
-    - Info-level and above go to the pipeline's log file
-    - Warning-level and above go to the warnings log file
-    - All messages go to the console
+    Log argument that renders a short summary of a (possibly large) object,
+    only when the record is actually formatted.
     """
-    root_logger = logging.getLogger()
-    if root_logger.hasHandlers():
-        return logging.getLogger(pipeline_filename)
 
-    formatter = logging.Formatter(
+    def __init__(self, obj, rows: int = 5):
+        self.obj = obj
+        self.rows = rows
+
+    def _summarize(self, obj):
+        if hasattr(obj, 'shape') and hasattr(obj, 'tail'):
+            return f'<{type(obj).__name__} shape={obj.shape}>\n{obj.tail(self.rows)}'
+        if isinstance(obj, dict):
+            return '{' + ', '.join(f'{key!r}: {self._summarize(value)}' for key, value in obj.items()) + '}'
+        text = repr(obj)
+        return text if len(text) <= 1000 else text[:1000] + f'... ({len(text)} chars)'
+
+    def __str__(self):
+        return self._summarize(self.obj)
+
+    __repr__ = __str__
+
+
+def summarize(obj, rows: int = 5) -> LazySummary:
+    """
+    Wrap a DataFrame (or dict of them, or any large object) for logging,
+    e.g. `logger.error('Incorrect data: %s', summarize(df))`
+    """
+    return LazySummary(obj, rows)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'pipeline': getattr(record, 'pipeline', None),
+            'process': record.process,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class PipelineFilter(logging.Filter):
+    """Stamp records with the pipeline running in the current context"""
+
+    def filter(self, record):
+        if not hasattr(record, 'pipeline'):
+            record.pipeline = _current_pipeline.get()
+        return True
+
+
+class PipelineRoutingHandler(logging.Handler):
+    """Write each record to its pipeline's own log file, opened on first use"""
+
+    def __init__(self, formatter, level=logging.INFO):
+        super().__init__(level)
+        self._formatter = formatter
+        self._pipeline_handlers = {}
+
+    def emit(self, record):
+        pipeline = getattr(record, 'pipeline', None)
+        if pipeline is None:
+            return
+
+        handler = self._pipeline_handlers.get(pipeline)
+        if handler is None:
+            handler = TimedRotatingFileHandler(INFO_DIR / f"{pipeline}.log", when='midnight', backupCount=30)
+            handler.setFormatter(self._formatter)
+            self._pipeline_handlers[pipeline] = handler
+
+        handler.handle(record)
+
+    def close(self):
+        for handler in self._pipeline_handlers.values():
+            handler.close()
+        super().close()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Enqueue records unformatted, so that messages with `LazySummary` arguments and
+    exceptions are only formatted by the listener. The stock `prepare` formats them
+    on the logging thread, and folds the exception into the message.
+
+    Messages with any other arguments (e.g. a DataFrame the caller goes on to modify)
+    are formatted here, as the listener would format them too late. Records sent to another
+    process are pickled on the way, so for those the traceback is rendered here too,
+    and only messages with plain values are left unformatted.
+    """
+
+    IMMUTABLE_TYPES = (str, int, float, bool, bytes, type(None))
+
+    def __init__(self, log_queue, cross_process: bool = False):
+        super().__init__(log_queue)
+        self.cross_process = cross_process
+
+    def prepare(self, record):
+        record = copy.copy(record)
+
+        deferred_types = self.IMMUTABLE_TYPES
+        if not self.cross_process:
+            deferred_types += (LazySummary,)
+
+        args = record.args.values() if isinstance(record.args, dict) else record.args or ()
+        if not all(isinstance(arg, deferred_types) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+
+        if self.cross_process and record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+def _stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+    for handler in _handlers:
+        handler.close()
+    _handlers.clear()
+
+
+def _create_handlers():
+    text_formatter = logging.Formatter(
         '[%(asctime)s] %(levelname)s %(name)s: %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
+    json_formatter = JsonFormatter()
 
-    pipeline_log_file = INFO_DIR/ f"{pipeline_filename}.log"
-    pipeline_handler = TimedRotatingFileHandler(pipeline_log_file, when='midnight', backupCount=30)
-    pipeline_handler.setFormatter(formatter)
-    pipeline_handler.setLevel(logging.INFO)
+    pipeline_handler = PipelineRoutingHandler(json_formatter, level=logging.INFO)
 
     warn_handler = TimedRotatingFileHandler(WARN_FILE, when='midnight', backupCount=30)
-    warn_handler.setFormatter(formatter)
+    warn_handler.setFormatter(json_formatter)
     warn_handler.setLevel(logging.WARNING)
 
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(text_formatter)
     console_handler.setLevel(logging.INFO)
 
-    # Set up handlers on the root logger so all loggers propagate here
+    return [pipeline_handler, warn_handler, console_handler]
+
+
+def _start_listener(log_queue):
+    listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+
+def _install_queue_handler(log_queue, cross_process: bool = False):
+    queue_handler = DeferredQueueHandler(log_queue, cross_process)
+    # nothing below INFO is written anywhere, so don't pay to format it
+    queue_handler.setLevel(logging.INFO)
+    queue_handler.addFilter(PipelineFilter())
+
+    root_logger = logging.getLogger()
     root_logger.setLevel(logging.DEBUG)
     root_logger.handlers = []
-    root_logger.addHandler(pipeline_handler)
-    root_logger.addHandler(warn_handler)
-    root_logger.addHandler(console_handler)
+    root_logger.addHandler(queue_handler)
+
+
+def _configure_root_logger():
+    """
+    Loggers only enqueue records; a background listener thread formats them
+    and does all file and console I/O.
+    """
+    _stop_listeners()
+    _handlers.extend(_create_handlers())
+
+    log_queue = queue.SimpleQueue()
+    _start_listener(log_queue)
+    _install_queue_handler(log_queue)
+
+
+def get_worker_log_queue():
+    """
+    Queue for worker processes to send their log records to this process's handlers.
+    Pass it to `setup_logging_for_worker` in the worker.
+    """
+    global _worker_queue
+
+    if not _handlers:
+        _configure_root_logger()
+
+    if _worker_queue is None:
+        _worker_queue = multiprocessing.get_context('spawn').Queue()
+        _start_listener(_worker_queue)
+
+    return _worker_queue
+
+
+def setup_logging_for_worker(log_queue):
+    """
+    Send all log records from this (worker) process to the parent's handlers
+    through `log_queue` (from `get_worker_log_queue`)
+    """
+    _stop_listeners()
+    _install_queue_handler(log_queue, cross_process=True)
+
+
+@contextmanager
+def pipeline_context(pipeline_name: str):
+    """Attribute records to a pipeline within this block only (including any pipeline set inside it)"""
+    token = _current_pipeline.set(pipeline_name)
+    try:
+        yield
+    finally:
+        _current_pipeline.reset(token)
+
+
+def setup_logging_for_pipeline(pipeline_filename: str):
+    """
+    Sets up logging so that ALL log messages (from any module) are handled by the same handlers:
+    - Info-level and above go to the pipeline's log file (JSON lines)
+    - Warning-level and above go to the warnings log file (JSON lines)
+    - All messages go to the console
+
+    Records are attributed to the pipeline for the rest of the current context,
+    so pipelines run one after another each get their own log file.
+    """
+    _current_pipeline.set(pipeline_filename)
+
+    # leave logging configured elsewhere (e.g. in a notebook) as is
+    if not logging.getLogger().hasHandlers():
+        _configure_root_logger()
 
-    # Return a named logger for the pipeline, but all loggers will use the root handlers
     return logging.getLogger(pipeline_filename)
 
 def setup_logging_for_main():
@@ -56,28 +271,13 @@ def setup_logging_for_main():
     if root_logger.hasHandlers():
         return root_logger
 
-    formatter = logging.Formatter(
-        '[%(asctime)s] %(levelname)s %(name)s: %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    warn_handler = TimedRotatingFileHandler(WARN_FILE, when='midnight', backupCount=30)
-    warn_handler.setFormatter(formatter)
-    warn_handler.setLevel(logging.WARNING)
-
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
-
-    root_logger.setLevel(logging.DEBUG)
-    root_logger.handlers = []
-    root_logger.addHandler(warn_handler)
-    root_logger.addHandler(console_handler)
+    _configure_root_logger()
 
     return root_logger
 
 def configure_notebook_logging():
     import logging
+    _stop_listeners()
     for handler in logging.root.handlers[:]:
         logging.root.removeHandler(handler)
     logging.basicConfig(
@@ -86,3 +286,4 @@ def configure_notebook_logging():
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
+atexit.register(_stop_listeners)
@@ -0,0 +1,25 @@
+import contextvars
+import pathlib
+from contextlib import contextmanager
+
+SUMMARY_DIRECTORY = pathlib.Path('Data/Summary Data')
+
+# where pipelines running in the current context write their outputs
+_output_directory = contextvars.ContextVar('output_directory', default=SUMMARY_DIRECTORY)
+
+
+def get_output_dir() -> pathlib.Path:
+    """Directory for a pipeline's summary outputs (`Data/Summary Data` unless redirected), created if needed"""
+    path = _output_directory.get()
+    path.mkdir(exist_ok=True, parents=True)
+    return path
+
+
+@contextmanager
+def redirect_outputs(directory):
+    """Have pipelines run in this context write their outputs to `directory` instead"""
+    token = _output_directory.set(pathlib.Path(directory))
+    try:
+        yield pathlib.Path(directory)
+    finally:
+        _output_directory.reset(token)
@@ -0,0 +1,133 @@
+import contextvars
+import gzip
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Optional, Union
+
+import requests
+
+import climate_dash_tools.cache
+import climate_dash_tools.extract
+import climate_dash_tools.soql
+from climate_dash_tools.extract import OpenDataCollection, RawData
+
+logger = logging.getLogger(__name__)
+
+# attempts per partition, and seconds to wait before the first retry (doubled for each one after)
+PARTITION_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5
+
+
+def _cache_path(table_id, open_data_collection, cache_name, key, query):
+    fingerprint = climate_dash_tools.soql.fingerprint(query, table_id, open_data_collection)
+    return climate_dash_tools.cache.get_cache_dir('partitions', open_data_collection, table_id, cache_name) / f'{key}.{fingerprint}.json.gz'
+
+
+def _write_cache(path, records: RawData):
+    temporary_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    temporary_path.write_bytes(gzip.compress(json.dumps(records).encode()))
+    os.replace(temporary_path, path)
+
+
+def _fetch(table_id, open_data_collection, key, query) -> RawData:
+    for attempt in range(1, PARTITION_ATTEMPTS + 1):
+        try:
+            return climate_dash_tools.extract.from_open_data(
+                table_id,
+                query,
+                open_data_collection=open_data_collection,
+                parse=False
+            )
+        except requests.RequestException as e:
+            if attempt == PARTITION_ATTEMPTS:
+                raise
+            backoff = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            logger.warning('partition %s of %s failed (attempt %s): %s. Retrying in %s s', key, table_id, attempt, e, backoff)
+            time.sleep(backoff)
+
+
+def fetch_partitions(
+    table_id: str,
+    partitions: Dict[str, Union[str, climate_dash_tools.soql.Query]],
+    open_data_collection: OpenDataCollection = 'city',
+    max_workers: int = 4,
+    cache_name: Optional[str] = None,
+    final: Iterable[str] = ()
+) -> Dict[str, RawData]:
+    """
+    Fetch the partitions of an extract concurrently, each as its own request,
+    retrying each partition separately.
+
+    Parameters
+    ----------
+    table_id : str
+
+    partitions : dict
+        query by partition key; the partitions should not overlap
+
+    open_data_collection : {'city','state'}, default 'city'
+
+    max_workers : int, default 4
+        number of partitions fetched at once
+
+    cache_name : str, optional
+        if given, partitions in `final` are cached locally under this name
+        (and their query), and only fetched once per local cache directory (so again
+        by runs that start without one, e.g. in CI). Each is cached as soon as it
+        is fetched, even if other partitions then fail
+
+    final : iterable of str
+        keys of partitions whose data won't change any more (e.g. closed years)
+
+    Returns
+    -------
+    dict
+        raw records by partition key
+    """
+    final = set(final) if cache_name else set()
+
+    results = {}
+    to_fetch = {}
+
+    for key, query in partitions.items():
+        query = str(query)
+        if key in final:
+            path = _cache_path(table_id, open_data_collection, cache_name, key, query)
+            if path.exists():
+                results[key] = json.loads(gzip.decompress(path.read_bytes()))
+                continue
+        to_fetch[key] = query
+
+    logger.info('fetching %s of %s partitions of %s (%s cached)', len(to_fetch), len(partitions), table_id, len(results))
+
+    if to_fetch:
+        errors = []
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(to_fetch))) as executor:
+            futures = {
+                # in this context, so the workers' records are attributed to the running pipeline
+                executor.submit(contextvars.copy_context().run, _fetch, table_id, open_data_collection, key, query): key
+                for key, query in to_fetch.items()
+            }
+
+            # final partitions are cached as each one arrives, so those fetched before
+            # another partition fails aren't fetched again
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+
+                if key in final:
+                    _write_cache(_cache_path(table_id, open_data_collection, cache_name, key, to_fetch[key]), results[key])
+
+        if errors:
+            logger.error('%s of %s partitions of %s failed', len(errors), len(to_fetch), table_id)
+            raise errors[0]
+
+    return {key: results[key] for key in partitions}
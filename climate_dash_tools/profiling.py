@@ -0,0 +1,145 @@
+import argparse
+import collections
+import cProfile
+import io
+import logging
+import pathlib
+import pstats
+import sysconfig
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIRECTORY = pathlib.Path('Profiles')
+
+# number of entries in each section of the report
+REPORT_TOP = 30
+
+# frames kept per allocation by tracemalloc; more is slower
+TRACEMALLOC_FRAMES = 1
+
+_STDLIB_DIRECTORY = pathlib.Path(sysconfig.get_paths()['stdlib'])
+
+
+def _package(file_name: str) -> str:
+    """Top-level package (or stdlib module) a profiled function belongs to"""
+    if file_name == '~':
+        return 'builtins'
+
+    path = pathlib.Path(file_name)
+
+    if 'site-packages' in path.parts:
+        parts = path.parts[path.parts.index('site-packages') + 1:]
+    elif path.is_relative_to(_STDLIB_DIRECTORY):
+        parts = path.relative_to(_STDLIB_DIRECTORY).parts
+    else:
+        try:
+            parts = path.resolve().relative_to(pathlib.Path.cwd()).parts
+        except ValueError:
+            return str(path)
+
+    return parts[0].removesuffix('.py') if parts else str(path)
+
+
+def _time_by_package(stats: pstats.Stats):
+    """Own (not cumulative) time by package, highest first"""
+    totals = collections.Counter()
+    for (file_name, _, _), (_, _, own_time, _, _) in stats.stats.items():
+        totals[_package(file_name)] += own_time
+    return totals.most_common()
+
+
+def write_report(name, profiler: cProfile.Profile, snapshot, peak_bytes, elapsed, directory=PROFILE_DIRECTORY, top=REPORT_TOP):
+    """Write `<name>.prof` (loadable with pstats or snakeviz) and a ranked hot-spot report `<name>.txt`"""
+    directory = pathlib.Path(directory)
+    directory.mkdir(exist_ok=True, parents=True)
+
+    profile_path = directory / f'{name}.prof'
+    report_path = directory / f'{name}.txt'
+
+    profiler.dump_stats(profile_path)
+
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+
+    report.write(f'{name}\n\n')
+    report.write(f'wall time: {elapsed:.2f} s\n')
+    report.write(f'peak traced memory: {peak_bytes / 2**20:.1f} MiB\n')
+    report.write('CPU time of the profiled thread only: work in other threads shows as waiting for them\n\n')
+
+    report.write('own time by package\n')
+    for package, own_time in _time_by_package(stats)[:top]:
+        report.write(f'  {own_time:10.3f} s  {package}\n')
+
+    report.write('\nby cumulative time\n')
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+    report.write('\nby own time\n')
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+
+    report.write('\nlargest allocations still held at the end of the run, by line\n')
+    for statistic in snapshot.statistics('lineno')[:top]:
+        report.write(f'  {statistic}\n')
+
+    report_path.write_text(report.getvalue())
+
+    logger.info('profile of %s written to %s and %s', name, profile_path, report_path)
+
+    return report_path
+
+
+@contextmanager
+def profile(name, directory=PROFILE_DIRECTORY, top=REPORT_TOP):
+    """
+    Profile CPU time (cProfile) and memory (tracemalloc) of the enclosed block.
+
+    Writes `<directory>/<name>.prof` and a ranked hot-spot report `<directory>/<name>.txt`.
+
+    cProfile only profiles the thread that enters the block. Work done in other threads
+    (e.g. partitions fetched by `climate_dash_tools.partitions`, source versions checked by
+    `climate_dash_tools.freshness`, hedged requests) shows up only as time spent waiting for
+    them, while memory and wall time cover all threads.
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+
+        if started_tracing:
+            tracemalloc.stop()
+
+        write_report(name, profiler, snapshot, peak_bytes, elapsed, directory, top)
+
+
+def pipeline_main(run, pipeline_file, args=None):
+    """Entry point for a pipeline's `__main__`: runs it, with `--profile` under `profile`"""
+    parser = argparse.ArgumentParser(description=f'Run the {pathlib.Path(pipeline_file).stem} pipeline')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help=f'write CPU and memory profiles of the run to {PROFILE_DIRECTORY}'
+    )
+    args = parser.parse_args(args)
+
+    if args.profile:
+        with profile(pathlib.Path(pipeline_file).stem):
+            return run()
+
+    return run()
@@ -0,0 +1,349 @@
+import datetime
+import importlib
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import climate_dash_tools.logging_config
+
+logger = logging.getLogger(__name__)
+
+# modules imported once per worker process, so runs don't pay for them
+WARM_MODULES = (
+    'pandas',
+    'geopandas',
+    'climate_dash_tools.extract',
+    'climate_dash_tools.transform',
+)
+
+
+class CronSchedule:
+    """
+    Standard 5-field cron expression: minute hour day-of-month month day-of-week.
+
+    Fields accept `*`, `a`, `a-b`, lists `a,b` and steps `*/n` or `a-b/n`.
+    Day of week is 0-6 (or 7) starting Sunday. As in cron, when both day fields
+    are restricted a time matches if either of them does.
+    """
+
+    FIELD_RANGES = (
+        (0, 59),
+        (0, 23),
+        (1, 31),
+        (1, 12),
+        (0, 7),
+    )
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression must have 5 fields, got {expression!r}')
+
+        self.expression = expression
+
+        (
+            self.minutes,
+            self.hours,
+            self.days,
+            self.months,
+            days_of_week
+        ) = (
+            self._parse_field(field, low, high)
+            for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        )
+
+        self.days_of_week = {day % 7 for day in days_of_week}
+        self.days_restricted = fields[2] != '*'
+        self.days_of_week_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> set:
+        values = set()
+        for part in field.split(','):
+            value_range, _, step = part.partition('/')
+            if value_range == '*':
+                start, end = low, high
+            elif '-' in value_range:
+                start, end = (int(value) for value in value_range.split('-'))
+            else:
+                start = end = int(value_range)
+                if step:
+                    end = high
+
+            if not (low <= start <= end <= high):
+                raise ValueError(f'Cron field {field!r} out of range {low}-{high}')
+
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def matches(self, moment: datetime.datetime) -> bool:
+        if (
+            moment.minute not in self.minutes
+            or moment.hour not in self.hours
+            or moment.month not in self.months
+        ):
+            return False
+
+        day_matches = moment.day in self.days
+        # datetime weeks start Monday=0, cron weeks Sunday=0
+        day_of_week_matches = (moment.weekday() + 1) % 7 in self.days_of_week
+
+        if self.days_restricted and self.days_of_week_restricted:
+            return day_matches or day_of_week_matches
+        return day_matches and day_of_week_matches
+
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        """First matching minute strictly after `moment`"""
+        candidate = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        # every schedule matches at least once in 4 years (e.g. Feb 29)
+        for _ in range(4 * 366 * 24 * 60):
+            if self.matches(candidate):
+                return candidate
+            candidate += datetime.timedelta(minutes=1)
+        raise ValueError(f'Cron expression {self.expression!r} never matches')
+
+    def __repr__(self):
+        return f'CronSchedule({self.expression!r})'
+
+
+def _warm_worker(module_names: List[str], log_queue, hedge_requests: bool):
+    import climate_dash_tools.extract
+
+    climate_dash_tools.logging_config.setup_logging_for_worker(log_queue)
+
+    # spawned workers start from the module defaults, not the scheduler's settings
+    climate_dash_tools.extract.HEDGE_REQUESTS = hedge_requests
+
+    for module_name in (*WARM_MODULES, *module_names):
+        try:
+            importlib.import_module(module_name)
+        except ImportError as e:
+            logger.warning('could not preload %s: %s', module_name, e)
+
+    # open the shared HTTP pool up front; connections stay alive between runs
+    climate_dash_tools.extract.get_session()
+
+
+def _ping() -> int:
+    import os
+    return os.getpid()
+
+
+def _run_in_worker(module_name: str) -> bool:
+    import climate_dash_tools.extract
+
+    module = importlib.import_module(module_name)
+    try:
+        # outputs are written to disk by the pipeline; only report success back to the scheduler
+        return module.run() is not None
+    finally:
+        # workers live for many runs, so don't let per-request stats pile up
+        climate_dash_tools.extract.transfer_stats.clear()
+
+
+class Scheduler:
+    """
+    Run pipeline modules on cron schedules in a pool of warm worker processes.
+
+    Each worker imports the heavy stack and every scheduled pipeline once at startup,
+    and keeps its HTTP connection pool between runs. A pipeline never runs concurrently
+    with itself: if it is still running when it is next due, that run is skipped.
+
+    Parameters
+    ----------
+    schedules : dict
+        cron expression by pipeline module name, e.g. `{'pipelines.extract.ev_fleet_count': '30 * * * *'}`
+
+    max_workers : int
+        number of warm worker processes
+    """
+
+    def __init__(self, schedules: Dict[str, str], max_workers: int = 2):
+        self.schedules = {
+            module_name: CronSchedule(expression)
+            for module_name, expression in schedules.items()
+        }
+        self.max_workers = max_workers
+        self._executor = None
+        self._running: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        # runs to resubmit, with the broken pool they were lost with
+        self._rescheduled: Dict[str, ProcessPoolExecutor] = {}
+
+        now = datetime.datetime.now()
+
+        self.status: Dict[str, Dict[str, Any]] = {
+            module_name: {
+                'schedule': schedule.expression,
+                'next_run': schedule.next_after(now).isoformat(),
+                'running': False,
+                'runs': 0,
+                'failures': 0,
+                'last_started': None,
+                'last_finished': None,
+                'last_duration_seconds': None,
+                'last_status': None,
+            }
+            for module_name, schedule in self.schedules.items()
+        }
+
+    def start_workers(self):
+        import climate_dash_tools.extract
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm_worker,
+            initargs=(
+                list(self.schedules),
+                climate_dash_tools.logging_config.get_worker_log_queue(),
+                climate_dash_tools.extract.HEDGE_REQUESTS
+            )
+        )
+        # workers are started lazily; make them all start (and warm up) now
+        pids = {future.result() for future in [self._executor.submit(_ping) for _ in range(self.max_workers)]}
+        logger.info('%s warm workers ready: %s', len(pids), sorted(pids))
+
+    def _restart_workers(self):
+        logger.warning('worker pool is broken, restarting it')
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.start_workers()
+
+    def _reschedule(self, module_name: str, executor: ProcessPoolExecutor):
+        # called with the lock held
+        self._rescheduled[module_name] = executor
+        self._wake.set()
+
+    def submit(self, module_name: str) -> Optional[Future]:
+        with self._lock:
+            if module_name in self._running:
+                logger.warning('%s is still running, skipping', module_name)
+                return None
+
+            started = time.monotonic()
+            status = self.status[module_name]
+            status.update(
+                running=True,
+                last_started=datetime.datetime.now().isoformat()
+            )
+
+            logger.info('▶ starting %s', module_name)
+            executor = self._executor
+            try:
+                future = executor.submit(_run_in_worker, module_name)
+            except BrokenProcessPool:
+                status['running'] = False
+                self._reschedule(module_name, executor)
+                return None
+            self._running[module_name] = future
+
+        def on_done(future):
+            broken = False
+            try:
+                succeeded = future.result()
+                error = None
+            except BrokenProcessPool as e:
+                succeeded = False
+                error = repr(e)
+                broken = True
+            except Exception as e:
+                succeeded = False
+                error = repr(e)
+
+            with self._lock:
+                del self._running[module_name]
+                if broken:
+                    self._reschedule(module_name, executor)
+                status.update(
+                    running=False,
+                    runs=status['runs'] + 1,
+                    failures=status['failures'] + (not succeeded),
+                    last_finished=datetime.datetime.now().isoformat(),
+                    last_duration_seconds=round(time.monotonic() - started, 3),
+                    last_status='ok' if succeeded else (error or 'invalid data'),
+                )
+
+            if succeeded:
+                logger.info('✔ %s finished', module_name)
+            else:
+                logger.error('✖ %s failed: %s', module_name, status['last_status'])
+
+        future.add_done_callback(on_done)
+        return future
+
+    def run_forever(self):
+        if self._executor is None:
+            self.start_workers()
+
+        next_runs = {
+            module_name: schedule.next_after(datetime.datetime.now())
+            for module_name, schedule in self.schedules.items()
+        }
+
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._lock:
+                rescheduled, self._rescheduled = self._rescheduled, {}
+
+            if rescheduled:
+                # runs lost with the same pool are all rescheduled after a single restart
+                if self._executor in rescheduled.values():
+                    self._restart_workers()
+                for module_name in rescheduled:
+                    logger.info('rescheduling %s', module_name)
+                    self.submit(module_name)
+
+            now = datetime.datetime.now()
+
+            for module_name, next_run in next_runs.items():
+                if next_run <= now:
+                    self.submit(module_name)
+                    next_runs[module_name] = self.schedules[module_name].next_after(now)
+                    with self._lock:
+                        self.status[module_name]['next_run'] = next_runs[module_name].isoformat()
+
+            wake_at = min(next_runs.values())
+            self._wake.wait(max((wake_at - datetime.datetime.now()).total_seconds(), 0))
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {module_name: dict(status) for module_name, status in self.status.items()}
+
+
+def serve_status(scheduler: Scheduler, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Serve the scheduler's run status as JSON at `http://host:port/` in a background thread.
+    """
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(scheduler.get_status(), indent=2).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    logger.info('serving scheduler status at http://%s:%s/', host, port)
+
+    return server
@@ -0,0 +1,137 @@
+import json
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import climate_dash_tools.cache
+import climate_dash_tools.extract
+
+logger = logging.getLogger(__name__)
+
+# cached schemas younger than this are used without any request
+SCHEMA_TTL_SECONDS = 24 * 60 * 60
+
+# view column types that parse like the SoQL types returned in `X-SODA2-Types`
+VIEW_TYPE_TO_SODA_TYPE = {
+    'calendar_date': 'floating_timestamp',
+    'date': 'fixed_timestamp',
+    'money': 'number',
+    'percent': 'number',
+    'double': 'number',
+}
+
+class TableSchema(NamedTuple):
+    columns:Dict[str, str]
+    metadata_updated_at:Optional[str]
+    fetched_at:float
+    # field name by column display name (as in bulk CSV exports)
+    field_names:Optional[Dict[str, str]] = None
+
+    @property
+    def types(self) -> Dict[str, str]:
+        """SoQL data type by field name"""
+        return {
+            column: VIEW_TYPE_TO_SODA_TYPE.get(dtype, dtype)
+            for column, dtype in self.columns.items()
+        }
+
+
+def _schema_path(table_id: str, open_data_collection: climate_dash_tools.extract.OpenDataCollection):
+    return climate_dash_tools.cache.get_cache_dir('schema', open_data_collection) / f'{table_id}.json'
+
+
+def _load_cached(table_id, open_data_collection) -> Optional[TableSchema]:
+    path = _schema_path(table_id, open_data_collection)
+    if not path.exists():
+        return None
+    try:
+        return TableSchema(**json.loads(path.read_text()))
+    except (json.JSONDecodeError, TypeError) as e:
+        logger.warning('ignoring unreadable schema cache %s: %s', path, e)
+        return None
+
+
+def _save(table_id, open_data_collection, schema: TableSchema):
+    path = _schema_path(table_id, open_data_collection)
+    path.write_text(json.dumps(schema._asdict(), indent=2))
+
+
+def _fetch(table_id, open_data_collection, metadata_updated_at=None) -> TableSchema:
+    view = climate_dash_tools.extract.get_view(table_id, open_data_collection)
+
+    if metadata_updated_at is None:
+        metadata_updated_at = climate_dash_tools.extract.get_metadata(
+            table_id,
+            open_data_collection
+        ).get('metadataUpdatedAt')
+
+    return TableSchema(
+        columns={
+            column['fieldName']: column['dataTypeName']
+            for column in view.get('columns', [])
+        },
+        metadata_updated_at=metadata_updated_at,
+        fetched_at=time.time(),
+        field_names={
+            column['name']: column['fieldName']
+            for column in view.get('columns', [])
+        }
+    )
+
+
+def get_schema(
+    table_id: str,
+    open_data_collection: climate_dash_tools.extract.OpenDataCollection = 'city',
+    max_age: float = SCHEMA_TTL_SECONDS
+) -> TableSchema:
+    """
+    Column names and types of a table, from a local cache where possible.
+
+    A cached schema younger than `max_age` seconds is used as is. An older one is
+    revalidated against the table's `metadataUpdatedAt` (one small metadata request)
+    and only refetched if the table's metadata changed since.
+    """
+    cached = _load_cached(table_id, open_data_collection)
+
+    # cached before display names were recorded
+    if cached is not None and cached.field_names is None:
+        cached = None
+
+    if cached is not None and time.time() - cached.fetched_at < max_age:
+        return cached
+
+    metadata_updated_at = None
+
+    if cached is not None:
+        metadata_updated_at = climate_dash_tools.extract.get_metadata(
+            table_id,
+            open_data_collection
+        ).get('metadataUpdatedAt')
+
+        if metadata_updated_at is not None and metadata_updated_at == cached.metadata_updated_at:
+            logger.debug('schema of %s unchanged', table_id)
+            schema = cached._replace(fetched_at=time.time())
+            _save(table_id, open_data_collection, schema)
+            return schema
+
+    logger.info('fetching schema of %s', table_id)
+    schema = _fetch(table_id, open_data_collection, metadata_updated_at)
+    _save(table_id, open_data_collection, schema)
+
+    return schema
+
+
+def get_field_names(
+    table_id: str,
+    open_data_collection: climate_dash_tools.extract.OpenDataCollection = 'city'
+) -> Dict[str, str]:
+    """Field name of each column by its display name, e.g. to rename the columns of a CSV export"""
+    return get_schema(table_id, open_data_collection).field_names
+
+
+def get_columns(
+    table_id: str,
+    open_data_collection: climate_dash_tools.extract.OpenDataCollection = 'city'
+) -> List[str]:
+    """Field names of a table's columns"""
+    return list(get_schema(table_id, open_data_collection).columns)
@@ -0,0 +1,149 @@
+import importlib.util
+import json
+import logging
+import os
+from typing import Optional, Union
+
+import pandas as pd
+
+import climate_dash_tools.cache
+import climate_dash_tools.extract
+import climate_dash_tools.soql
+from climate_dash_tools.extract import Backend, Dataset, OpenDataCollection
+
+logger = logging.getLogger(__name__)
+
+# schema metadata key of the snapshot's table, query and `dataUpdatedAt`
+SNAPSHOT_INFO_KEY = b'climate_dash_tools.snapshot'
+
+
+def _snapshot_path(table_id, open_data_collection, query: str):
+    fingerprint = climate_dash_tools.soql.fingerprint(query, table_id, open_data_collection)
+    return climate_dash_tools.cache.get_cache_dir('snapshots', open_data_collection, table_id) / f'{fingerprint}.arrow'
+
+
+def _open_snapshot(path):
+    """The snapshot's table, memory-mapped: its buffers are the OS page cache's, shared by every process"""
+    import pyarrow as pa
+
+    with pa.memory_map(str(path), 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _read_info(path) -> Optional[dict]:
+    """The info stored in a snapshot's schema metadata, read without reading its data"""
+    import pyarrow as pa
+
+    if not path.exists():
+        return None
+    with pa.memory_map(str(path), 'r') as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    info = metadata.get(SNAPSHOT_INFO_KEY)
+    return json.loads(info) if info is not None else None
+
+
+def _write_snapshot(path, table, info):
+    import pyarrow as pa
+
+    # the info travels in the schema, so a single replace swaps data and info together
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        SNAPSHOT_INFO_KEY: json.dumps(info).encode(),
+    })
+
+    # uncompressed, since compressed buffers can't be memory-mapped
+    temporary_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with pa.OSFile(str(temporary_path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temporary_path, path)
+
+
+def snapshots_available() -> bool:
+    """Whether pyarrow, which snapshots require, is installed"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def from_open_data_snapshot(
+    table_id: str,
+    query: Union[str, climate_dash_tools.soql.Query] = 'SELECT * LIMIT 1000000',
+    open_data_collection: OpenDataCollection = 'city',
+    include_metadata: bool = False,
+    backend: Backend = 'arrow_dtype'
+):
+    """
+    Like `climate_dash_tools.extract.from_open_data`, but keep the result as a local Arrow IPC
+    snapshot, opened with memory mapping.
+
+    The snapshot is used as long as the table's `dataUpdatedAt` is unchanged, so repeated loads
+    (in any process, e.g. several pipelines or notebooks) cost one metadata request and share the
+    same pages of memory instead of each downloading and parsing their own copy. Requires pyarrow
+    (the `arrow` extra); see `snapshots_available`.
+
+    Parameters
+    ----------
+    table_id, query, open_data_collection, include_metadata
+        as for `from_open_data`
+
+    backend : {'arrow', 'arrow_dtype', 'pandas'}, default 'arrow_dtype'
+        'arrow' returns the memory-mapped pyarrow Table (zero-copy), 'arrow_dtype' a DataFrame
+        with `pd.ArrowDtype` columns backed by it, and 'pandas' a DataFrame with numpy dtypes
+        (which copies the data into this process)
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError('snapshots require pyarrow. Install it with `pip install pyarrow`') from e
+
+    query = str(query)
+    path = _snapshot_path(table_id, open_data_collection, query)
+
+    metadata = climate_dash_tools.extract.get_metadata(table_id, open_data_collection)
+    data_updated_at = metadata.get('dataUpdatedAt')
+
+    info = _read_info(path)
+
+    if info is not None and info['data_updated_at'] == data_updated_at:
+        logger.info('using snapshot of %s as of %s', table_id, data_updated_at)
+    else:
+        logger.info('taking snapshot of %s as of %s', table_id, data_updated_at)
+
+        table = climate_dash_tools.extract.from_open_data(
+            table_id,
+            query,
+            open_data_collection=open_data_collection,
+            backend='arrow'
+        )
+
+        _write_snapshot(path, table, {
+            'table_id': table_id,
+            'open_data_collection': open_data_collection,
+            'query': query,
+            'data_updated_at': data_updated_at,
+            'rows': table.num_rows,
+        })
+
+    table = _open_snapshot(path)
+
+    if backend == 'arrow_dtype':
+        data = table.to_pandas(types_mapper=pd.ArrowDtype)
+    elif backend == 'pandas':
+        data = table.to_pandas()
+    else:
+        data = table
+
+    if include_metadata:
+        return Dataset(data, metadata)
+
+    return data
+
+
+def clear_snapshots(table_id: Optional[str] = None, open_data_collection: OpenDataCollection = 'city'):
+    """Remove the snapshots of a table (or all snapshots)"""
+    directory = climate_dash_tools.cache.get_cache_dir('snapshots')
+    if table_id is not None:
+        directory = directory / open_data_collection / table_id
+
+    for path in directory.rglob('*'):
+        if path.is_file() and path.suffix == '.arrow':
+            path.unlink()
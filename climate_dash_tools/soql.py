@@ -0,0 +1,518 @@
+import datetime
+import hashlib
+import json
+import re
+import sqlite3
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+# Keywords are upper-cased in canonical SoQL. Function names keep their case,
+# since it determines the names of unaliased result columns (e.g. `MAX_report_year`)
+KEYWORDS = {
+    'select', 'where', 'group', 'by', 'having', 'order', 'limit', 'offset', 'search',
+    'and', 'or', 'not', 'in', 'is', 'null', 'like', 'between', 'as', 'distinct',
+    'case', 'when', 'then', 'else', 'end', 'asc', 'desc', 'true', 'false',
+}
+
+# longest first, so e.g. `<=` isn't split into `<` `=`
+OPERATORS = ('::', '<=', '>=', '!=', '<>', '==', '||', '|>', '=', '<', '>', '+', '-', '*', '/', '%', '(', ')', ',', '.')
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<single>'(?:[^']|'')*')
+    |(?P<double>"(?:[^"]|"")*")
+    |(?P<backtick>`[^`]*`)
+    |(?P<operator>""" + '|'.join(re.escape(operator) for operator in OPERATORS) + r""")
+    |(?P<word>(?::@|[:@])?[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<number>\d+(?:\.\d*)?|\.\d+)
+    """,
+    re.VERBOSE
+)
+
+_SIMPLE_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# names that stay backtick-quoted as identifiers, since unquoted they read as keywords or functions
+RESERVED_NAMES = KEYWORDS | {'count', 'sum', 'min', 'max', 'avg'}
+
+_UPPER_KEYWORDS = {keyword.upper() for keyword in KEYWORDS}
+
+
+def tokenize(query: str) -> List[str]:
+    """
+    Tokens of a SoQL query, canonicalized as in `normalize` and without whitespace.
+    Raises ValueError at text that isn't SoQL.
+    """
+    tokens = []
+    position = 0
+
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if match is None:
+            raise ValueError(f'Cannot parse SoQL at {query[position:position + 20]!r}')
+        position = match.end()
+
+        kind = match.lastgroup
+        text = match.group()
+
+        if kind == 'space':
+            continue
+        elif kind == 'double':
+            # canonical string literals are single-quoted
+            text = "'" + text[1:-1].replace('""', '"').replace("'", "''") + "'"
+        elif kind == 'backtick':
+            # only quote identifiers that need it
+            name = text[1:-1]
+            if _SIMPLE_IDENTIFIER.match(name) and name.lower() not in RESERVED_NAMES:
+                text = name
+        elif kind == 'word' and text.lower() in KEYWORDS:
+            text = text.upper()
+        elif kind == 'operator' and text == '==':
+            text = '='
+        elif kind == 'operator' and text == '<>':
+            text = '!='
+
+        tokens.append(text)
+
+    return tokens
+
+
+def render_tokens(tokens: List[str]) -> str:
+    """SoQL text of tokens from `tokenize`, spaced as in `normalize`"""
+    rendered = ''
+    previous = None
+
+    for token in tokens:
+        if previous is None:
+            space = False
+        elif token in (')', ',', '.', '::') or previous in ('(', '.', '::'):
+            space = False
+        elif token == '(':
+            # function calls hug their parentheses, keywords (e.g. `IN (`) don't
+            space = not re.match(r'^[A-Za-z_]', previous) or previous in _UPPER_KEYWORDS
+        else:
+            space = True
+
+        rendered += (' ' if space else '') + token
+        previous = token
+
+    return rendered
+
+
+def normalize(query: Union[str, 'Query']) -> str:
+    """
+    Canonical form of a SoQL query.
+
+    Whitespace is collapsed, keywords upper-cased, `==` written as `=`, string literals
+    single-quoted and identifiers backtick-quoted only where needed, so logically identical
+    queries written in different styles normalize to the same string.
+    """
+    return render_tokens(tokenize(str(query)))
+
+
+def fingerprint(
+    query: Union[str, 'Query'],
+    table_id: Optional[str] = None,
+    open_data_collection: Optional[str] = None
+) -> str:
+    """
+    Stable short hash of the canonical query (and table it runs against),
+    for use as a cache, deduplication or metrics key.
+
+    Queries the tokenizer can't parse are hashed with only their whitespace collapsed,
+    and are left for the API to accept or reject.
+    """
+    try:
+        canonical = normalize(query)
+    except ValueError:
+        canonical = ' '.join(str(query).split())
+    key = json.dumps([open_data_collection, table_id, canonical])
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+class Query:
+    """
+    Immutable SoQL query builder. Every method returns a new Query.
+
+    Example
+    -------
+    >>> Query().select('`fiscalyear`', 'SUM(`acceptedvalue`) AS `total`').where('`id` == 2851').group_by('`fiscalyear`')
+    Query('SELECT fiscalyear, SUM(acceptedvalue) AS total WHERE id = 2851 GROUP BY fiscalyear')
+
+    Expressions are SoQL snippets and are normalized when rendered, so `str(query)`
+    is always canonical.
+    """
+
+    def __init__(
+        self,
+        select: Iterable[str] = (),
+        where: Iterable[str] = (),
+        group_by: Iterable[str] = (),
+        order_by: Iterable[str] = (),
+        limit: Optional[int] = None,
+        offset: Optional[int] = None
+    ):
+        self._select: Tuple[str, ...] = tuple(select)
+        self._where: Tuple[str, ...] = tuple(where)
+        self._group_by: Tuple[str, ...] = tuple(group_by)
+        self._order_by: Tuple[str, ...] = tuple(order_by)
+        self._limit = limit
+        self._offset = offset
+
+    def _replace(self, **changes) -> 'Query':
+        fields = {
+            'select': self._select,
+            'where': self._where,
+            'group_by': self._group_by,
+            'order_by': self._order_by,
+            'limit': self._limit,
+            'offset': self._offset,
+        }
+        fields.update(changes)
+        return Query(**fields)
+
+    def select(self, *columns: str) -> 'Query':
+        return self._replace(select=self._select + columns)
+
+    def where(self, *conditions: str) -> 'Query':
+        """Conditions are combined with AND"""
+        return self._replace(where=self._where + conditions)
+
+    def group_by(self, *columns: str) -> 'Query':
+        return self._replace(group_by=self._group_by + columns)
+
+    def order_by(self, *columns: str) -> 'Query':
+        return self._replace(order_by=self._order_by + columns)
+
+    def limit(self, limit: Optional[int]) -> 'Query':
+        return self._replace(limit=limit)
+
+    def offset(self, offset: Optional[int]) -> 'Query':
+        return self._replace(offset=offset)
+
+    def count(self) -> 'Query':
+        """Query for the number of rows this query's filters match"""
+        if self._group_by:
+            raise ValueError('Cannot count rows of a grouped query')
+        return Query(select=('COUNT(*) AS `count`',), where=self._where)
+
+    def paged(self, limit: int, offset: int) -> 'Query':
+        """
+        One page of this query. Pages are only stable if the order is total, so queries
+        without ORDER BY are ordered by their group columns, or by row id if ungrouped.
+        """
+        query = self
+        if not self._order_by:
+            query = query.order_by(*(self._group_by or (':id',)))
+        return query.limit(limit).offset(offset)
+
+    def render(self) -> str:
+        clauses = ['SELECT ' + ', '.join(self._select or ('*',))]
+
+        if self._where:
+            if len(self._where) == 1:
+                clauses.append('WHERE ' + self._where[0])
+            else:
+                clauses.append('WHERE ' + ' AND '.join(f'({condition})' for condition in self._where))
+        if self._group_by:
+            clauses.append('GROUP BY ' + ', '.join(self._group_by))
+        if self._order_by:
+            clauses.append('ORDER BY ' + ', '.join(self._order_by))
+        if self._limit is not None:
+            clauses.append(f'LIMIT {int(self._limit)}')
+        if self._offset is not None:
+            clauses.append(f'OFFSET {int(self._offset)}')
+
+        return normalize(' '.join(clauses))
+
+    def fingerprint(self, table_id: Optional[str] = None, open_data_collection: Optional[str] = None) -> str:
+        return fingerprint(self, table_id, open_data_collection)
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return f'Query({self.render()!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and self.render() == other.render()
+
+    def __hash__(self):
+        return hash(self.render())
+
+
+# Running SoQL locally, on a SQLite table (fixtures of `climate_dash_tools.emulator`, and bulk exports
+# loaded by `climate_dash_tools.bulk`)
+
+# rows returned by the real API when a query has no LIMIT
+DEFAULT_LIMIT = 1000
+
+# floating timestamps are stored as text in this format, so they sort and compare as text
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.000'
+
+_TIMESTAMP_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+# SQL templates of supported SoQL functions with special translations; `{0}`, `{1}` are arguments
+FUNCTION_TEMPLATES = {
+    'date_extract_y': "CAST(strftime('%Y', {0}) AS INTEGER)",
+    'date_extract_m': "CAST(strftime('%m', {0}) AS INTEGER)",
+    'date_extract_d': "CAST(strftime('%d', {0}) AS INTEGER)",
+    'date_trunc_y': "strftime('%Y-01-01T00:00:00.000', {0})",
+    'date_trunc_ym': "strftime('%Y-%m-01T00:00:00.000', {0})",
+    'date_trunc_ymd': "strftime('%Y-%m-%dT00:00:00.000', {0})",
+    'caseless_eq': "(lower({0}) = lower({1}))",
+    'starts_with': "({0} LIKE {1} || '%')",
+}
+
+# SoQL functions that SQLite has as they are
+PASSTHROUGH_FUNCTIONS = {'count', 'sum', 'min', 'max', 'avg', 'upper', 'lower', 'abs', 'coalesce', 'length'}
+
+CLAUSE_KEYWORDS = ('SELECT', 'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT', 'OFFSET', 'SEARCH')
+
+
+class SqlQuery(NamedTuple):
+    sql:str
+    # output column names and, for columns selected as they are, their source column
+    fields:List[str]
+    source_columns:List[Optional[str]]
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _identifier_name(token: str) -> str:
+    return token[1:-1] if token.startswith('`') else token
+
+
+def _cast(operand: str, soql_type: str) -> str:
+    soql_type = soql_type.lower()
+
+    if soql_type in ('number', 'double', 'money'):
+        return f'CAST({operand} AS REAL)'
+    if soql_type == 'text':
+        return f'CAST({operand} AS TEXT)'
+    if soql_type in ('floating_timestamp', 'fixed_timestamp', 'calendar_date'):
+        # literals are written out in the stored format, so they compare correctly as text
+        if operand.startswith("'") and _TIMESTAMP_PATTERN.match(operand[1:-1]):
+            return "'" + datetime.datetime.fromisoformat(operand[1:-1]).strftime(TIMESTAMP_FORMAT) + "'"
+        return operand
+
+    raise ValueError(f'unsupported cast to {soql_type}')
+
+
+def _function(name: str, arguments: List[str]) -> str:
+    lower_name = name.lower()
+
+    if lower_name == 'caseless_one_of':
+        return f"(lower({arguments[0]}) IN ({', '.join(f'lower({argument})' for argument in arguments[1:])}))"
+    if lower_name in FUNCTION_TEMPLATES:
+        return FUNCTION_TEMPLATES[lower_name].format(*arguments)
+    if lower_name in PASSTHROUGH_FUNCTIONS:
+        return f"{lower_name}({', '.join(arguments)})"
+
+    raise ValueError(f'unsupported function {name}')
+
+
+def _translate(tokens: List[str], position: int = 0, stop: Tuple[str, ...] = ()) -> Tuple[str, int]:
+    """Translate a SoQL expression starting at `position`, up to a top-level token in `stop`"""
+    units = []
+
+    while position < len(tokens) and tokens[position] not in stop:
+        token = tokens[position]
+        following = tokens[position + 1] if position + 1 < len(tokens) else None
+
+        if token == '(':
+            inner, position = _translate(tokens, position + 1, (')',))
+            units.append(f'({inner})')
+            position += 1
+
+        elif following == '(' and re.match(r'^[A-Za-z_]', token) and token not in _UPPER_KEYWORDS:
+            arguments = []
+            position += 2
+            while tokens[position - 1] != ')':
+                argument, position = _translate(tokens, position, (',', ')'))
+                arguments.append(argument)
+                position += 1
+            units.append(_function(token, arguments))
+
+        elif token == '::':
+            units.append(_cast(units.pop(), following))
+            position += 2
+
+        else:
+            if token in ('TRUE', 'FALSE'):
+                units.append('1' if token == 'TRUE' else '0')
+            elif token == ':id':
+                units.append('rowid')
+            elif token.startswith(':'):
+                units.append('NULL')
+            elif token.startswith("'") or token in _UPPER_KEYWORDS or not re.match(r'^[A-Za-z_`]', token):
+                units.append(token)
+            else:
+                units.append(_quote_identifier(_identifier_name(token)))
+            position += 1
+
+    return ' '.join(units), position
+
+
+def _split_top_level(tokens: List[str], separator: str = ',') -> List[List[str]]:
+    parts = [[]]
+    depth = 0
+    for token in tokens:
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        if token == separator and depth == 0:
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    return [part for part in parts if part]
+
+
+def split_clauses(tokens: List[str]) -> Dict[str, List[str]]:
+    """
+    Tokens of a tokenized SoQL query (see `climate_dash_tools.soql.tokenize`) by clause keyword,
+    e.g. `{'SELECT': [...], 'WHERE': [...]}`; `GROUP BY` and `ORDER BY` are keyed `GROUP` and `ORDER`
+    """
+    clauses = {}
+    clause = 'SELECT'
+    depth = 0
+    position = 0
+
+    while position < len(tokens):
+        token = tokens[position]
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+
+        if depth == 0 and token in CLAUSE_KEYWORDS:
+            clause = token
+            if token in ('GROUP', 'ORDER'):
+                position += 1  # BY
+            clauses.setdefault(clause, [])
+        else:
+            clauses.setdefault(clause, []).append(token)
+        position += 1
+
+    return clauses
+
+
+def _default_field_name(expression: List[str], index: int) -> str:
+    """Name of an unaliased result column, as the API names it (e.g. `MAX_report_year`)"""
+    if len(expression) == 1:
+        return _identifier_name(expression[0])
+    if len(expression) >= 3 and expression[1] == '(' and expression[-1] == ')':
+        arguments = [token for token in expression[2:-1] if token != 'DISTINCT']
+        if arguments == ['*']:
+            return expression[0]
+        if len(arguments) == 1:
+            return f'{expression[0]}_{_identifier_name(arguments[0])}'
+    return f'_expr{index}'
+
+
+def to_sqlite(query: str, table: str, columns: List[str]) -> SqlQuery:
+    """
+    Translate a SoQL query into a SQLite query on `table`.
+
+    Supports the subset of SoQL the pipelines use: SELECT / WHERE / GROUP BY / HAVING / ORDER BY /
+    LIMIT / OFFSET, CASE, aggregates (including COUNT(DISTINCT ...)), `::` casts, `date_extract_*`,
+    `date_trunc_*`, `caseless_one_of`, `caseless_eq` and `starts_with`. Without a LIMIT, at most
+    DEFAULT_LIMIT rows are returned, as by the API.
+
+    Parameters
+    ----------
+    query : str
+        SoQL query
+
+    table : str
+        name of the SQLite table
+
+    columns : list of str
+        columns of the table, selected by `SELECT *`
+    """
+    clauses = split_clauses(tokenize(str(query)))
+
+    if 'SEARCH' in clauses:
+        raise ValueError('SEARCH is not supported')
+
+    select_items = []
+    fields = []
+    source_columns = []
+
+    for index, item in enumerate(_split_top_level(clauses.get('SELECT') or ['*'])):
+        if item == ['*']:
+            select_items.extend(_quote_identifier(column) for column in columns)
+            fields.extend(columns)
+            source_columns.extend(columns)
+            continue
+
+        if len(item) > 2 and item[-2] == 'AS':
+            expression, alias = item[:-2], _identifier_name(item[-1])
+        else:
+            expression, alias = item, _default_field_name(item, index)
+
+        sql, _ = _translate(expression)
+        select_items.append(f'{sql} AS {_quote_identifier(alias)}')
+        fields.append(alias)
+        source_columns.append(
+            _identifier_name(expression[0]) if len(expression) == 1 and _identifier_name(expression[0]) in columns else None
+        )
+
+    sql = f'SELECT {", ".join(select_items)} FROM {_quote_identifier(table)}'
+
+    if 'WHERE' in clauses:
+        sql += ' WHERE ' + _translate(clauses['WHERE'])[0]
+    if 'GROUP' in clauses:
+        sql += ' GROUP BY ' + ', '.join(_translate(item)[0] for item in _split_top_level(clauses['GROUP']))
+    if 'HAVING' in clauses:
+        sql += ' HAVING ' + _translate(clauses['HAVING'])[0]
+    if 'ORDER' in clauses:
+        sql += ' ORDER BY ' + ', '.join(_translate(item)[0] for item in _split_top_level(clauses['ORDER']))
+
+    sql += f" LIMIT {int(clauses['LIMIT'][0]) if 'LIMIT' in clauses else DEFAULT_LIMIT}"
+
+    if 'OFFSET' in clauses:
+        sql += f" OFFSET {int(clauses['OFFSET'][0])}"
+
+    return SqlQuery(sql, fields, source_columns)
+
+
+def _value_type(value) -> str:
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str) and _TIMESTAMP_PATTERN.match(value):
+        return 'floating_timestamp'
+    return 'text'
+
+
+def format_value(value) -> str:
+    """Values are strings in API responses, and whole numbers have no decimals"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def run_sqlite_query(database: str, column_types: Dict[str, str], query: str) -> Tuple[List[str], List[str], List[tuple]]:
+    """
+    Run a SoQL query on the `data` table of a SQLite database (opened read-only), whose columns
+    have the SoQL types `column_types`. Returns field names, SoQL types and rows
+    """
+    sql_query = to_sqlite(query, 'data', list(column_types))
+
+    connection = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    try:
+        rows = connection.execute(sql_query.sql).fetchall()
+    finally:
+        connection.close()
+
+    types = []
+    for index, (field, source_column) in enumerate(zip(sql_query.fields, sql_query.source_columns)):
+        if source_column is not None:
+            types.append(column_types[source_column])
+        else:
+            value = next((row[index] for row in rows if row[index] is not None), None)
+            types.append(_value_type(value))
+
+    return sql_query.fields, types, rows
@@ -0,0 +1,184 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+from typing import Dict, Optional
+
+import climate_dash_tools.cache
+import climate_dash_tools.extract
+from climate_dash_tools.extract import OpenDataCollection
+from climate_dash_tools.soql import Query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50_000
+
+# times a download is started over because the table was updated while it was being paged
+MAX_RESTARTS = 2
+
+STATE_FILE_NAME = 'state.json'
+
+
+def _spool_dir(table_id, open_data_collection, query: Query):
+    return climate_dash_tools.cache.get_cache_dir('spool', open_data_collection, table_id, query.fingerprint(table_id, open_data_collection))
+
+
+def _page_path(spool_dir, page: int):
+    return spool_dir / f'page-{page:06d}.json.gz'
+
+
+def _write_atomic(path, data: bytes):
+    temporary_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    temporary_path.write_bytes(data)
+    os.replace(temporary_path, path)
+
+
+def _load_state(spool_dir) -> Optional[Dict]:
+    path = spool_dir / STATE_FILE_NAME
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except json.JSONDecodeError as e:
+        logger.warning('ignoring unreadable spool state %s: %s', path, e)
+        return None
+
+
+def _save_state(spool_dir, state: Dict):
+    _write_atomic(spool_dir / STATE_FILE_NAME, json.dumps(state, indent=1).encode())
+
+
+def _clear(spool_dir):
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    spool_dir.mkdir(exist_ok=True, parents=True)
+
+
+def _download(table_id, open_data_collection, query: Query, page_size, spool_dir, data_updated_at) -> Dict:
+    """Fetch the pages of `query` not in the spool yet, checkpointing each one. Returns the final state"""
+    state = _load_state(spool_dir)
+
+    if state is not None and (state['data_updated_at'] != data_updated_at or state['page_size'] != page_size):
+        logger.warning(
+            'discarding %s spooled pages of %s: table updated at %s, pages are as of %s',
+            state['pages'], table_id, data_updated_at, state['data_updated_at']
+        )
+        _clear(spool_dir)
+        state = None
+
+    if state is None:
+        state = {
+            'table_id': table_id,
+            'open_data_collection': open_data_collection,
+            'query': str(query),
+            'page_size': page_size,
+            'data_updated_at': data_updated_at,
+            'pages': 0,
+            'rows': 0,
+            'column_types': None,
+            'complete': False,
+        }
+    elif not state['complete']:
+        logger.info('resuming %s from page %s (%s rows spooled)', table_id, state['pages'], state['rows'])
+
+    while not state['complete']:
+        offset = state['pages'] * page_size
+
+        records, column_types = climate_dash_tools.extract.fetch_page(
+            table_id,
+            query.paged(page_size, offset),
+            open_data_collection=open_data_collection
+        )
+
+        _write_atomic(_page_path(spool_dir, state['pages']), gzip.compress(json.dumps(records).encode()))
+
+        state['pages'] += 1
+        state['rows'] += len(records)
+        state['complete'] = len(records) < page_size
+        # the column types, for parsing the spooled pages later
+        state['column_types'] = state.get('column_types') or column_types
+
+        # the resume token: pages before `pages` are spooled and don't need fetching again
+        _save_state(spool_dir, state)
+
+        logger.info('spooled page %s of %s (%s rows so far)', state['pages'], table_id, state['rows'])
+
+    return state
+
+
+def from_open_data_resumable(
+    table_id: str,
+    query: Query,
+    open_data_collection: OpenDataCollection = 'city',
+    page_size: int = DEFAULT_PAGE_SIZE,
+    parse: bool = True,
+    include_metadata: bool = False,
+    optimize_memory: bool = False
+):
+    """
+    Like `climate_dash_tools.extract.from_open_data`, but fetch the data in pages and
+    checkpoint each page to a local spool, so an interrupted download resumes from the
+    last complete page when called again.
+
+    Spooled pages are only reused while the table's `dataUpdatedAt` is unchanged; it is
+    checked again once all pages are in, and the download is started over if the table
+    was updated meanwhile. The spool is removed after a complete, consistent download.
+
+    Parameters
+    ----------
+    table_id : str
+
+    query : climate_dash_tools.soql.Query
+        query without LIMIT / OFFSET. Pages are ordered by its ORDER BY, which should
+        be total (e.g. end with `:id`) so that pages don't overlap
+
+    open_data_collection : {'city','state'}, default 'city'
+
+    page_size : int, default 50000
+
+    parse, include_metadata, optimize_memory
+        as for `from_open_data`
+    """
+    spool_dir = _spool_dir(table_id, open_data_collection, query)
+
+    for attempt in range(MAX_RESTARTS + 1):
+        metadata = climate_dash_tools.extract.get_metadata(table_id, open_data_collection)
+
+        state = _download(table_id, open_data_collection, query, page_size, spool_dir, metadata.get('dataUpdatedAt'))
+
+        metadata = climate_dash_tools.extract.get_metadata(table_id, open_data_collection)
+
+        if metadata.get('dataUpdatedAt') == state['data_updated_at']:
+            break
+
+        logger.warning('%s was updated while it was being downloaded; starting over', table_id)
+        _clear(spool_dir)
+    else:
+        raise RuntimeError(f'{table_id} kept changing while it was being downloaded ({MAX_RESTARTS + 1} attempts)')
+
+    data_json = []
+    for page in range(state['pages']):
+        data_json.extend(json.loads(gzip.decompress(_page_path(spool_dir, page).read_bytes())))
+
+    query = str(query)
+
+    for hook in climate_dash_tools.extract.raw_data_hooks:
+        hook(table_id, open_data_collection, query, data_json)
+
+    if parse:
+        data = climate_dash_tools.extract.parse_records(
+            data_json,
+            table_id=table_id,
+            open_data_collection=open_data_collection,
+            optimize_memory=optimize_memory,
+            column_types=state.get('column_types')
+        )
+    else:
+        data = data_json
+
+    shutil.rmtree(spool_dir, ignore_errors=True)
+
+    if include_metadata:
+        return climate_dash_tools.extract.Dataset(data, metadata)
+
+    return data
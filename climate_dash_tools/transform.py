@@ -30,7 +30,22 @@ def get_last_complete_period_end_date(metadata,freq):
 
     Returns pd.Timestamp
     """
-    last_updated = pd.to_datetime(metadata['dataUpdatedAt'])
+    return get_last_complete_period_end_date_as_of(metadata['dataUpdatedAt'], freq)
+
+def get_last_complete_period_end_date_as_of(as_of,freq):
+    """Get end date of the most recent full period preceding a timestamp.
+
+    Parameters
+    ----------
+    as_of : str or pd.Timestamp
+        e.g. a `dataUpdatedAt` from OpenData metadata, or a past date to backfill outputs as of
+
+    freq : str
+        pandas freq str / offset alias, see ``get_last_complete_period_end_date``
+
+    Returns pd.Timestamp
+    """
+    last_updated = pd.to_datetime(as_of)
     
     if last_updated.tz:
         last_updated = last_updated.tz_convert('US/Eastern')
@@ -40,6 +55,3 @@ def get_last_complete_period_end_date(metadata,freq):
         .tz_localize(None)
         - pd.tseries.frequencies.to_offset(freq)
     ).normalize()
-
-
-
@@ -3,10 +3,85 @@
 import pathlib
 
 import pandas as pd
-import requests
 
+import climate_dash_tools.extract
+import climate_dash_tools.outputs
 import climate_dash_tools.logging_config
 
+EHDP_BASE_URL = 'https://raw.githubusercontent.com/nychealth/EHDP-data/refs/heads/production/indicators/'
+
+TIME_PERIODS_URL = EHDP_BASE_URL + 'metadata/TimePeriods.json'
+MEASURES_METADATA_URL = EHDP_BASE_URL + 'metadata/metadata.json'
+
+INDICATOR_MEASURE_IDS = {
+    'PM25':{'indicator_id':2023,'measure_id':1425},
+    'BC':{'indicator_id':2024,'measure_id':1428},
+    'NO':{'indicator_id':2028,'measure_id':1436},
+    'NO2':{'indicator_id':2025,'measure_id':1431},
+    'O3':{'indicator_id':2027,'measure_id':1435},
+}
+
+def get_data_table_url(indicator_id):
+    return EHDP_BASE_URL + f'data/{indicator_id}.json'
+
+# source files, checked for changes (by ETag) by `run_extractors --changed-only`
+SOURCE_URLS = [
+    TIME_PERIODS_URL,
+    MEASURES_METADATA_URL,
+    *(get_data_table_url(ids['indicator_id']) for ids in INDICATOR_MEASURE_IDS.values())
+]
+
+def build_index(data_tables, time_period_table):
+    """
+    All indicators' data in one table, joined with yearly time periods once,
+    and indexed (sorted) by (MeasureID, GeoType, TimePeriodID) for fast lookups.
+    Rows with the same index keep their order in the data tables
+    """
+    yearly_time_periods = (
+        time_period_table
+        .loc[time_period_table['TimeType'].eq('year'), ['TimePeriodID','TimePeriod']]
+        .set_index('TimePeriodID')
+    )
+
+    return (
+        pd.concat(data_tables, ignore_index=True)
+        .join(yearly_time_periods, on='TimePeriodID', how='inner')
+        .set_index(['MeasureID','GeoType','TimePeriodID'])
+        .sort_index()
+    )
+
+def get_history_for_cd(data_index, measures_metadata_table):
+    """
+    Full annual history of every pollutant in INDICATOR_MEASURE_IDS, for all CDs,
+    by pollutant and year, and within a year in the order of the data tables
+    """
+
+    pollutant_by_measure_id = {ids['measure_id']:pollutant for pollutant,ids in INDICATOR_MEASURE_IDS.items()}
+
+    return (
+        data_index
+        .loc[pd.IndexSlice[list(pollutant_by_measure_id), 'CD', :], :]
+        .reset_index()
+        .merge(
+            measures_metadata_table,
+            on='MeasureID'
+        )
+        .assign(
+            Pollutant = lambda df: df['MeasureID'].map(pollutant_by_measure_id),
+            Year = lambda df: df['TimePeriod']
+        )
+        .rename(columns={'DisplayType':'Unit'})
+        .sort_values(['Pollutant','Year'], kind='stable', ignore_index=True)
+        [[
+            'Pollutant',
+            'GeoID',
+            'Year',
+            'Value',
+            'Unit',
+            'MeasureName',
+        ]]
+    )
+
 def run():
     
     pipeline_name = pathlib.Path(__file__).stem
@@ -14,118 +89,55 @@ def run():
     # set up logging
     logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
 
-    def get_newest_data_for_cd(
-        indicator_id,
-        measure_id,
-        time_period_table,
-        measures_metadata_table
-    ):
+    # EXTRACT
 
-        # # Fetch time period and measure metadata tables 
-        # if time_period_table is None:
-        #     time_period_table = pd.read_json('https://raw.githubusercontent.com/nychealth/EHDP-data/refs/heads/production/indicators/metadata/TimePeriods.json')
-
-        # if measures_metadata_table is None:
-        #     r = requests.get('https://raw.githubusercontent.com/nychealth/EHDP-data/refs/heads/production/indicators/metadata/metadata.json')
-        #     r.raise_for_status()
-        #     metadata_json = r.json()
-        #     measures_metadata_table = pd.json_normalize(metadata_json,record_path='Measures')
-
-        # Fetch data table for this indicator
-        data_table_url = f"https://raw.githubusercontent.com/nychealth/EHDP-data/refs/heads/production/indicators/data/{indicator_id}.json"
-        data_table = pd.read_json(data_table_url)
-
-        # Find time periods available for this measure by CD
-        available_time_periods_for_data_for_cd = (
-            data_table
-            [
-                data_table['GeoType'].eq('CD')
-                &
-                data_table['MeasureID'].eq(measure_id)
-            ]
-            ['TimePeriodID']
-            .unique()
-        )
+    time_period_table = pd.read_json(TIME_PERIODS_URL)
 
-        # Find most recent time period
-        most_recent_time_period_for_data_for_cd = (
-            time_period_table
-            [
-                time_period_table['TimeType'].eq('year')
-                &
-                time_period_table['TimePeriodID'].isin(available_time_periods_for_data_for_cd)
-            ]
-            .sort_values('TimePeriod')
-            .tail(1)
-        )
+    r = climate_dash_tools.extract.get_session().get(MEASURES_METADATA_URL)
+    r.raise_for_status()
+    metadata_json = r.json()
+    measures_metadata_table = pd.json_normalize(metadata_json,record_path='Measures')
 
-        most_recent_time_period_for_data_for_cd_label = most_recent_time_period_for_data_for_cd['TimePeriod'].item()
-        most_recent_time_period_for_data_for_cd_id = most_recent_time_period_for_data_for_cd['TimePeriodID'].item()
+    data_tables = []
 
-        # Filter and format data
-        data = (
-            data_table
-            [
-                
-                data_table['GeoType'].eq('CD')
-                &
-                data_table['MeasureID'].eq(measure_id)
-                &
-                data_table['TimePeriodID'].eq(most_recent_time_period_for_data_for_cd_id)
-            ]
-            .merge(
-                measures_metadata_table,
-                on='MeasureID'
-            )
-            .assign(
-                Year = most_recent_time_period_for_data_for_cd_label
-            )
-            .rename(columns={'DisplayType':'Unit'})
-            [[
-                'GeoID',
-                'Year',
-                'Value',
-                'Unit',
-                'MeasureName',
-            ]]
-        )
+    for pollutant,ids in INDICATOR_MEASURE_IDS.items():
 
-        return data
+        logger.info('getting %s', pollutant)
 
+        data_tables.append(pd.read_json(get_data_table_url(ids['indicator_id'])))
 
-    # Get data for all indicators
+    # TRANSFORM
 
-    INDICATOR_MEASURE_IDS = {
-        'PM25':{'indicator_id':2023,'measure_id':1425},
-        'BC':{'indicator_id':2024,'measure_id':1428},
-        'NO':{'indicator_id':2028,'measure_id':1436},
-        'NO2':{'indicator_id':2025,'measure_id':1431},
-        'O3':{'indicator_id':2027,'measure_id':1435},
-    }
+    # one index over all indicators, so each lookup is a search rather than a scan
 
-    time_period_table = pd.read_json('https://raw.githubusercontent.com/nychealth/EHDP-data/refs/heads/production/indicators/metadata/TimePeriods.json')
+    data_index = build_index(data_tables, time_period_table)
 
-    r = requests.get('https://raw.githubusercontent.com/nychealth/EHDP-data/refs/heads/production/indicators/metadata/metadata.json')
-    r.raise_for_status()
-    metadata_json = r.json()
-    measures_metadata_table = pd.json_normalize(metadata_json,record_path='Measures')
+    history = get_history_for_cd(data_index, measures_metadata_table)
+
+    # most recent year of each pollutant, written as before the history was added
 
+    latest = history[
+        history['Year'].eq(history.groupby('Pollutant')['Year'].transform('max'))
+    ]
 
     air_pollution_measures = {}
 
-    for pollutant,ids in INDICATOR_MEASURE_IDS.items():
+    data_dir = climate_dash_tools.outputs.get_output_dir()
 
-        logger.info('getting %s', pollutant)
+    for pollutant in INDICATOR_MEASURE_IDS:
 
-        data = get_newest_data_for_cd(
-            **ids,
-            time_period_table=time_period_table,
-            measures_metadata_table=measures_metadata_table
+        data = (
+            latest
+            [latest['Pollutant'].eq(pollutant)]
+            .drop(columns='Pollutant')
+            .reset_index(drop=True)
         )
 
         # VALIDATE
 
         if (
+            len(data) > 0
+            and
             data['Value'].between(0,100).all()
         ):
 
@@ -133,9 +145,6 @@ def run():
 
             # SAVE
 
-            data_dir = pathlib.Path('Data/Summary Data')
-            data_dir.mkdir(exist_ok=True)
-
             data.to_csv(
                 data_dir / f'{pollutant}_by_CD.csv'
             )
@@ -143,11 +152,33 @@ def run():
             air_pollution_measures[pollutant] = data
 
         else:
-            logger.error('Incorrect data for %s: %s', pollutant, data.tail(20))
+            logger.error('Incorrect data for %s: %s', pollutant, climate_dash_tools.logging_config.summarize(data))
 
             air_pollution_measures[pollutant] = None
 
+    # VALIDATE
+
+    if (
+        history['Value'].between(0,100).all()
+    ):
+
+        # SAVE
+
+        history.to_csv(
+            data_dir / f'{pipeline_name}__history_by_CD.csv',
+            index=False
+        )
+
+        air_pollution_measures['history'] = history
+
+    else:
+        logger.error('Incorrect history data: %s', climate_dash_tools.logging_config.summarize(history))
+
+        air_pollution_measures['history'] = None
+
     return air_pollution_measures
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
@@ -1,20 +1,8 @@
-def run():
-    import pathlib
-    
-    import pandas as pd
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = 'rbed-zzin'
 
+def extract():
     import climate_dash_tools.extract
-    import climate_dash_tools.transform
-    import climate_dash_tools.logging_config
-
-    pipeline_name = pathlib.Path(__file__).stem
-
-    # set up logging
-    logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
-
-    # EXTRACT
-
-    table_id = 'rbed-zzin'
 
     query = '''SELECT 
     `fiscalyear`,
@@ -26,18 +14,20 @@ def run():
         `indicator`
     '''
 
-    bicycle_lane_miles = climate_dash_tools.extract.from_open_data(
-        table_id=table_id,
+    return climate_dash_tools.extract.from_open_data(
+        table_id=TABLE_ID,
         query=query,
         include_metadata=True
     )
 
-    # TRANSFORM
+def summarize(data, as_of):
+    """Protected and unprotected lane miles by fiscal year, through the last fiscal year complete as of `as_of`"""
+    import climate_dash_tools.transform
 
-    last_complete_year = climate_dash_tools.transform.get_last_complete_period_end_date(bicycle_lane_miles.metadata,'YE-JUN').year
+    last_complete_year = climate_dash_tools.transform.get_last_complete_period_end_date_as_of(as_of,'YE-JUN').year
 
-    summary_data = (
-        bicycle_lane_miles.data
+    return (
+        data
         .set_index(['fiscalyear','indicator'])
         .unstack()
         ['total_miles']
@@ -58,16 +48,35 @@ def run():
         .sort_index()
     )
 
+def validate(summary_data):
+    return summary_data['miles'].between(0,300).all()
+
+def run():
+    import pathlib
+
+    import climate_dash_tools.outputs
+    import climate_dash_tools.logging_config
+
+    pipeline_name = pathlib.Path(__file__).stem
+
+    # set up logging
+    logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
+
+    # EXTRACT
+
+    bicycle_lane_miles = extract()
+
+    # TRANSFORM
+
+    summary_data = summarize(bicycle_lane_miles.data, bicycle_lane_miles.metadata['dataUpdatedAt'])
+
     # VALIDATE
 
-    if (
-        summary_data['miles'].between(0,300).all()
-    ):
+    if validate(summary_data):
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
         summary_data.to_csv(
             data_dir / f'{pipeline_name}.csv'
@@ -76,9 +85,11 @@ def run():
         return summary_data
 
     else:
-        logger.error('Incorrect data: %s', summary_data.tail(20))
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(summary_data))
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
@@ -1,19 +1,8 @@
-def run():
-    import pandas as pd
-    import pathlib
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = 'ebb7-mvp5'
 
+def extract():
     import climate_dash_tools.extract
-    import climate_dash_tools.transform
-    import climate_dash_tools.logging_config
-
-    pipeline_name = pathlib.Path(__file__).stem
-
-    # set up logging
-    logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
-
-    # EXTRACT
-
-    table_id = 'ebb7-mvp5'
 
     query = '''
     SELECT
@@ -33,17 +22,18 @@ def run():
     LIMIT 100000000
     '''
 
-    tonnage = climate_dash_tools.extract.from_open_data(table_id, query, include_metadata=True)
+    return climate_dash_tools.extract.from_open_data(TABLE_ID, query, include_metadata=True)
 
-    # TRANSFORM
+def summarize(data, as_of):
+    """Diversion rate by fiscal year and borough, through the last fiscal year complete as of `as_of`"""
+    import pandas as pd
 
-    # summarize e.g. 
+    import climate_dash_tools.transform
 
-    last_complete_fy = climate_dash_tools.transform.get_last_complete_period_end_date(tonnage.metadata, 'YE-JUN').year
+    last_complete_fy = climate_dash_tools.transform.get_last_complete_period_end_date_as_of(as_of, 'YE-JUN').year
 
-    summary_data = (
-        tonnage
-        .data
+    return (
+        data
         .fillna(0)
         .assign(
             fy = lambda row: (
@@ -87,16 +77,35 @@ def run():
         [['diversion_rate']]
     )
 
+def validate(summary_data):
+    return (summary_data.gt(0) & summary_data.lt(1)).all().all()
+
+def run():
+    import pathlib
+
+    import climate_dash_tools.outputs
+    import climate_dash_tools.logging_config
+
+    pipeline_name = pathlib.Path(__file__).stem
+
+    # set up logging
+    logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
+
+    # EXTRACT
+
+    tonnage = extract()
+
+    # TRANSFORM
+
+    summary_data = summarize(tonnage.data, tonnage.metadata['dataUpdatedAt'])
+
     # VALIDATE
 
-    if (
-        (summary_data.gt(0) & summary_data.lt(1)).all().all()
-    ):
+    if validate(summary_data):
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
         summary_data.to_csv(
             data_dir / f'{pipeline_name}.csv'
@@ -105,9 +114,11 @@ def run():
         return summary_data
 
     else:
-        logger.error('Incorrect data: %s', summary_data.tail(20))
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(summary_data))
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
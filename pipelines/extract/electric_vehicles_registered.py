@@ -1,8 +1,39 @@
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = 'w4pv-hbkt'
+OPEN_DATA_COLLECTION = 'state'
+
+# Distinct VINs are counted separately in disjoint ranges of VIN (by first character, i.e.
+# region of manufacture) and summed. The table can't be split by county instead, since a
+# vehicle can be registered in more than one county and would be counted in each
+VIN_RANGE_BOUNDARIES = ('1', '2', '3', '4', '5', 'J', 'S', 'W')
+
+FUEL_GROUPS = {
+    'ELECTRIC':"`fuel_type` = 'ELECTRIC'",
+    'GAS_AND_DIESEL':"`fuel_type` IN ('GAS', 'DIESEL')",
+}
+
+def get_vin_range_conditions():
+    bounds = [None, *VIN_RANGE_BOUNDARIES, None]
+    return [
+        ' AND '.join(
+            condition for condition in (
+                f"`vin` >= '{lower}'" if lower else None,
+                f"`vin` < '{upper}'" if upper else None,
+            )
+            if condition
+        )
+        for lower, upper in zip(bounds[:-1], bounds[1:])
+    ]
+
 def run():
     import pathlib
-    
-    import climate_dash_tools.extract
+
+    import pandas as pd
+
+    import climate_dash_tools.partitions
+    import climate_dash_tools.soql
     # import climate_dash_tools.transform
+    import climate_dash_tools.outputs
     import climate_dash_tools.logging_config
 
     pipeline_name = pathlib.Path(__file__).stem
@@ -12,26 +43,44 @@ def run():
 
     # EXTRACT
 
-    table_id = 'w4pv-hbkt'
-
-    query = '''
-    SELECT
-    CASE 
-        WHEN `fuel_type` IN ('GAS', 'DIESEL') THEN 'GAS_AND_DIESEL'
-        ELSE `fuel_type` 
-    END AS `fuel_group`,
-    COUNT(DISTINCT `vin`) AS `vehicle_count`
-    WHERE
-    `county` IN ("KINGS", "NEW YORK", "BRONX", "RICHMOND", "QUEENS")
-    AND `record_type` = 'VEH' 
-    AND `fuel_type` IN ("ELECTRIC", "GAS", "DIESEL")
-    GROUP BY `fuel_group`
-    '''
-
-    vehicles = climate_dash_tools.extract.from_open_data(
-        table_id=table_id,
-        query=query,
-        open_data_collection='state'
+    table_id = TABLE_ID
+
+    # one query per fuel group and VIN range, each much faster than the whole count,
+    # run concurrently and retried separately
+
+    query = (
+        climate_dash_tools.soql.Query()
+        .select('COUNT(DISTINCT `vin`) AS `vehicle_count`')
+        .where(
+            '`county` IN ("KINGS", "NEW YORK", "BRONX", "RICHMOND", "QUEENS")',
+            "`record_type` = 'VEH'"
+        )
+    )
+
+    partition_queries = {
+        f'{fuel_group}:{vin_range}':query.where(fuel_group_condition, vin_range_condition)
+        for fuel_group, fuel_group_condition in FUEL_GROUPS.items()
+        for vin_range, vin_range_condition in enumerate(get_vin_range_conditions())
+    }
+
+    partitions = climate_dash_tools.partitions.fetch_partitions(
+        table_id,
+        partition_queries,
+        open_data_collection=OPEN_DATA_COLLECTION,
+        max_workers=8
+    )
+
+    # VIN ranges are disjoint, so distinct counts add up
+    vehicles = (
+        pd.DataFrame(
+            [
+                {'fuel_group':key.split(':')[0], 'vehicle_count':int(records[0]['vehicle_count']) if records else 0}
+                for key, records in partitions.items()
+            ]
+        )
+        .groupby('fuel_group', as_index=False)
+        ['vehicle_count']
+        .sum()
     )
 
     summary_data = (
@@ -51,8 +100,7 @@ def run():
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
         summary_data.to_csv(
             data_dir / f'{pipeline_name}.csv'
@@ -61,9 +109,11 @@ def run():
         return summary_data
 
     else:
-        logger.error('Incorrect data: %s', summary_data.tail(20))
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(summary_data))
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
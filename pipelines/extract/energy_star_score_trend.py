@@ -0,0 +1,163 @@
+# not one of `run_extractors.PIPELINES`; run on its own with `python -m pipelines.extract.energy_star_score_trend`
+
+# source table
+TABLE_ID = '5zyy-y8am'
+
+# report years this recent can still be revised; older years are cached and not fetched again.
+# They are cached in Cache/, which the scheduled CI workflow doesn't keep (it only commits Data/),
+# so only repeated runs on the same machine skip closed years
+OPEN_REPORT_YEARS = 2
+
+def run():
+    import pathlib
+
+    import pandas as pd
+
+    import climate_dash_tools.extract
+    import climate_dash_tools.partitions
+    import climate_dash_tools.soql
+    import climate_dash_tools.outputs
+    import climate_dash_tools.logging_config
+
+    pipeline_name = pathlib.Path(__file__).stem
+
+    # set up logging
+    logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
+
+    # EXTRACT
+
+    table_id = TABLE_ID
+
+    # Step 1: Get all report years in the table
+
+    years_query = '''SELECT `report_year` GROUP BY `report_year` ORDER BY `report_year`'''
+
+    report_years = sorted(
+        int(row['report_year'])
+        for row in climate_dash_tools.extract.from_open_data(table_id,years_query,parse=False)
+        if row.get('report_year') is not None
+    )
+
+    logger.info('Report years found in data: %s', report_years)
+
+    # Step 2: Get each year's building scores as its own partition, fetched concurrently
+
+    building_scores_query = (
+        climate_dash_tools.soql.Query()
+        .select(
+            '`report_year`',
+            '`property_id`',
+            '`energy_star_score` AS `score`'
+        )
+        .where("`energy_star_score` != 'Not Available'")
+        # unordered, since rows are sorted locally; without a LIMIT the API returns only 1000 rows
+        .limit(100000000)
+    )
+
+    partitions = climate_dash_tools.partitions.fetch_partitions(
+        table_id,
+        {
+            str(year): building_scores_query.where(f'`report_year` = {year}')
+            for year in report_years
+        },
+        cache_name=pipeline_name,
+        final=[str(year) for year in report_years[:-OPEN_REPORT_YEARS]]
+    )
+
+    building_scores = pd.DataFrame(
+        [record for records in partitions.values() for record in records],
+        columns=['report_year', 'property_id', 'score']
+    )
+
+    # TRANSFORM
+
+    # Step 3: One score per building per year (the highest), and its grade
+
+    building_scores = (
+        building_scores
+        .assign(
+            report_year = lambda df: pd.to_numeric(df['report_year'], errors='coerce'),
+            score = lambda df: pd.to_numeric(df['score'], errors='coerce')
+        )
+        .dropna(subset=['report_year', 'score'])
+        .astype({'report_year': int})
+        .sort_values(['property_id', 'report_year', 'score'], ascending=[True, True, False])
+        .drop_duplicates(subset=['property_id', 'report_year'], keep='first')
+        .assign(
+            Energy_Rating = lambda df: pd.cut(
+                df['score'],
+                bins=[0, 55, 70, 85, float('inf')],
+                labels=['D', 'C', 'B', 'A'],
+                right=False
+            )
+        )
+        .reset_index(drop=True)
+    )
+
+    # Step 4: Grade distribution per year
+
+    grades_by_year = (
+        building_scores
+        .groupby(['report_year', 'Energy_Rating'], observed=False)
+        .size()
+        .rename('count')
+        .to_frame()
+        .assign(
+            proportion = lambda df: df['count'] / df.groupby(level='report_year')['count'].transform('sum')
+        )
+    )
+
+    # Step 5: Each building's latest score change, against its previous reported year
+
+    previous = building_scores.groupby('property_id')[['report_year', 'score']].shift()
+
+    building_score_deltas = (
+        building_scores
+        .assign(
+            previous_report_year = previous['report_year'].astype('Int64'),
+            previous_score = previous['score'],
+            score_delta = lambda df: df['score'] - df['previous_score']
+        )
+        .dropna(subset=['previous_score'])
+        .groupby('property_id')
+        .tail(1)
+        .set_index('property_id')
+        [['previous_report_year', 'previous_score', 'report_year', 'score', 'score_delta']]
+    )
+
+    # VALIDATE
+
+    if (
+        grades_by_year['count'].ge(0).all()
+        and
+        grades_by_year['count'].max() < 50_000
+        and
+        building_score_deltas['score_delta'].between(-100, 100).all()
+    ):
+
+        # SAVE
+
+        data_dir = climate_dash_tools.outputs.get_output_dir()
+
+        grades_by_year.to_csv(
+            data_dir / f'{pipeline_name}__grades_by_year.csv'
+        )
+
+        building_score_deltas.to_csv(
+            data_dir / f'{pipeline_name}__building_score_deltas.csv'
+        )
+
+        return {
+            'grades_by_year':grades_by_year,
+            'building_score_deltas':building_score_deltas
+        }
+
+    else:
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(grades_by_year))
+
+        return None
+
+if __name__ == "__main__":
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
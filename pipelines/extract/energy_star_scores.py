@@ -1,3 +1,6 @@
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = '5zyy-y8am'
+
 def run():
     import pathlib
 
@@ -5,7 +8,11 @@ def run():
     import geopandas as gpd
 
     import climate_dash_tools.extract
+    import climate_dash_tools.geo
+    import climate_dash_tools.soql
+    import climate_dash_tools.spool
     import climate_dash_tools.transform
+    import climate_dash_tools.outputs
     import climate_dash_tools.logging_config
 
     pipeline_name = pathlib.Path(__file__).stem
@@ -15,7 +22,7 @@ def run():
 
     # EXTRACT
 
-    table_id = '5zyy-y8am'
+    table_id = TABLE_ID
 
     # Step 1: Get the most recent year in the table
 
@@ -28,29 +35,36 @@ def run():
     # Step 2: Get all building scores and grades for the most recent year 
     # sort by property_id and energy_star_score (descending)
 
-    building_grades_query = f'''
-    SELECT 
-    `property_id`,
-    `energy_star_score` AS `ENERGY_STAR_Score`,
-    CASE 
-        WHEN `energy_star_score`::number >= 85 THEN 'A'
-        WHEN `energy_star_score`::number >= 70 THEN 'B'
-        WHEN `energy_star_score`::number >= 55 THEN 'C'
-        WHEN `energy_star_score`::number >= 0 THEN 'D'
-        ELSE 'na'
-    END AS `Energy_Rating`,
-    `address_1` AS Address,
-    `city` AS City,
-    `largest_property_use_type` AS `Largest_Property_Use_Type`,
-    `latitude`,
-    `longitude`
-    WHERE (`report_year` = {max_year})
-    AND(`energy_star_score` != 'Not Available')
-    ORDER BY `property_id` ASC, `energy_star_score` DESC
-    LIMIT 100000000
-    '''
-
-    building_grades = climate_dash_tools.extract.from_open_data(table_id,building_grades_query)
+    # a full year is large, so it is downloaded in pages checkpointed to a local spool,
+    # and a rerun after a failure resumes from the last complete page.
+    # `:id` breaks ties in the ordering, so that pages don't overlap
+
+    building_grades_query = (
+        climate_dash_tools.soql.Query()
+        .select(
+            '`property_id`',
+            '`energy_star_score` AS `ENERGY_STAR_Score`',
+            '''CASE
+                WHEN `energy_star_score`::number >= 85 THEN 'A'
+                WHEN `energy_star_score`::number >= 70 THEN 'B'
+                WHEN `energy_star_score`::number >= 55 THEN 'C'
+                WHEN `energy_star_score`::number >= 0 THEN 'D'
+                ELSE 'na'
+            END AS `Energy_Rating`''',
+            '`address_1` AS Address',
+            '`city` AS City',
+            '`largest_property_use_type` AS `Largest_Property_Use_Type`',
+            '`latitude`',
+            '`longitude`'
+        )
+        .where(
+            f'`report_year` = {max_year}',
+            "`energy_star_score` != 'Not Available'"
+        )
+        .order_by('`property_id` ASC', '`energy_star_score` DESC', ':id')
+    )
+
+    building_grades = climate_dash_tools.spool.from_open_data_resumable(table_id, building_grades_query)
 
     # Step 3: Drop duplicated property_id rows, keeping first (highest)
 
@@ -86,6 +100,18 @@ def run():
         .sort_index()
     )
 
+    # Step 5: count grades by community district, in one pass over the district index
+
+    grades_by_cd = None
+
+    if climate_dash_tools.geo.community_districts_available():
+        grades_by_cd = climate_dash_tools.geo.count_by_community_district(
+            deduplicated_buildings_scores_geo,
+            by='Energy_Rating'
+        )
+    else:
+        logger.warning('No community district boundaries. Not counting grades by district')
+
     # VALIDATE
 
     if (
@@ -96,8 +122,7 @@ def run():
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
         deduplicated_buildings_scores_geo.to_file(
             data_dir / 'energy_star_scores__deduplicated_buildings_scores.geojson'
@@ -107,15 +132,23 @@ def run():
             data_dir / 'energy_star_scores__count_and_proportion_by_grade.csv'
         )
 
+        if grades_by_cd is not None:
+            grades_by_cd.to_csv(
+                data_dir / 'energy_star_scores__grades_by_CD.csv'
+            )
+
         return {
             'deduplicated_buildings_scores_geo':deduplicated_buildings_scores_geo,
-            'count_and_proportion_by_grade':count_and_proportion_by_grade
+            'count_and_proportion_by_grade':count_and_proportion_by_grade,
+            'grades_by_cd':grades_by_cd
         }
 
     else:
-        logger.error('Incorrect data: %s', count_and_proportion_by_grade.tail(20))
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(count_and_proportion_by_grade))
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
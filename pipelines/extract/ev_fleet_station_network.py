@@ -1,3 +1,6 @@
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = 'fc53-9hrv'
+
 def run(): 
     import pathlib
 
@@ -5,7 +8,10 @@ def run():
     import geopandas as gpd
 
     import climate_dash_tools.extract
+    import climate_dash_tools.geo
+    import climate_dash_tools.snapshots
     import climate_dash_tools.transform
+    import climate_dash_tools.outputs
     import climate_dash_tools.logging_config
 
     pipeline_name = pathlib.Path(__file__).stem
@@ -15,7 +21,7 @@ def run():
 
     # EXTRACT
 
-    table_id = 'fc53-9hrv'
+    table_id = TABLE_ID
 
     query = '''
     SELECT
@@ -31,7 +37,11 @@ def run():
     LIMIT 1000000
     '''
 
-    chargers = climate_dash_tools.extract.from_open_data(table_id,query)
+    # the whole table, so with pyarrow it is kept as a snapshot, downloaded again only once the table changes
+    if climate_dash_tools.snapshots.snapshots_available():
+        chargers = climate_dash_tools.snapshots.from_open_data_snapshot(table_id,query,backend='pandas')
+    else:
+        chargers = climate_dash_tools.extract.from_open_data(table_id,query)
 
     chargers_geo = gpd.GeoDataFrame(
         data=chargers.drop(columns=['latitude','longitude']),
@@ -42,6 +52,20 @@ def run():
         )
     )
 
+    # TRANSFORM
+
+    # chargers by type in each community district
+
+    chargers_by_cd = None
+
+    if climate_dash_tools.geo.community_districts_available():
+        chargers_by_cd = climate_dash_tools.geo.count_by_community_district(
+            chargers_geo,
+            by='type_of_charger'
+        )
+    else:
+        logger.warning('No community district boundaries. Not counting chargers by district')
+
     # VALIDATE
 
     if (
@@ -50,19 +74,25 @@ def run():
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
         chargers_geo.to_file(
             data_dir / f'{pipeline_name}.geojson'
         )
 
+        if chargers_by_cd is not None:
+            chargers_by_cd.to_csv(
+                data_dir / f'{pipeline_name}__chargers_by_CD.csv'
+            )
+
         return chargers_geo
 
     else:
-        logger.error('Incorrect data: %s', chargers_geo.tail(20))
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(chargers_geo))
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
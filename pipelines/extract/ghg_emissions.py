@@ -1,3 +1,6 @@
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = 'wq7q-htne'
+
 def run():
     import pathlib
     import re
@@ -6,7 +9,10 @@ def run():
 
     import climate_dash_tools.extract
     # import climate_dash_tools.transform
+    import climate_dash_tools.outputs
     import climate_dash_tools.logging_config
+    import climate_dash_tools.schema
+    from climate_dash_tools.soql import Query
 
     pipeline_name = pathlib.Path(__file__).stem
 
@@ -15,24 +21,20 @@ def run():
 
     # EXTRACT
 
-    table_id = 'wq7q-htne'
+    table_id = TABLE_ID
 
     # Step 1: Find the most recent year of data available
 
-    column_names_query = '''
-    SELECT *
-    LIMIT 1
-    '''
-
-    one_row = climate_dash_tools.extract.from_open_data(
-        table_id=table_id,
-        query=column_names_query
-    )
+    # column names come from the (locally cached) table schema, no data request needed.
+    # A cached schema is used for up to a day (climate_dash_tools.schema.SCHEMA_TTL_SECONDS) without
+    # checking the table, so a new year's column can be picked up up to a day late; CI runs, which
+    # start without a cache, always fetch the schema
+    column_names = climate_dash_tools.schema.get_columns(table_id)
 
     # Filter to '*_tco2e' columns 
     columns_pattern = r'(^cy_\d{4}_tco2e(_100_yr_gwp|$))'
 
-    tco2e_cols = one_row.columns.str.extract(columns_pattern)[0].dropna().to_list()
+    tco2e_cols = [col for col in column_names if re.match(columns_pattern, col)]
 
     # Find max (i.e. highest year) of those columns
     max_tco2e_col_name = max(tco2e_cols)
@@ -46,13 +48,15 @@ def run():
     # Step 2: Query data for most recent year
 
     # Total by sector
-    query = f'''
-    SELECT
-        `sectors_sector` AS `sector`,
-        {','.join([f'SUM({col})' for col in tco2e_cols])}
-    WHERE `sectors_sector` != 'Total'
-    GROUP BY `sectors_sector`
-    '''
+    query = (
+        Query()
+        .select(
+            '`sectors_sector` AS `sector`',
+            *[f'SUM(`{col}`)' for col in tco2e_cols]
+        )
+        .where("`sectors_sector` != 'Total'")
+        .group_by('`sectors_sector`')
+    )
     total_by_sector = climate_dash_tools.extract.from_open_data(table_id,query)
 
     total_by_sector = total_by_sector.set_index('sector')
@@ -73,21 +77,35 @@ def run():
 
     # Buildings
 
-    buildings_by_sector_by_fuel_query = f'''
-    SELECT
-        `category_label`,
-        CASE 
-            WHEN `source_label` IN ('#2 fuel oil', '#4 fuel oil', '#6 fuel oil') THEN 'Fuel oil'
-            ELSE `source_label`
-        END AS `source_group`,
-        SUM({max_tco2e_col_name}) AS total
-    WHERE
-        sectors_sector = 'Stationary Energy'
-        AND `inventory_type` = 'GPC'
-        AND `category_label` != 'Fugitive'
-        AND `source_label` != 'Biofuel'
-    GROUP BY `category_label`, `source_group`
-    '''
+    buildings_conditions = (
+        "`sectors_sector` = 'Stationary Energy'",
+        "`inventory_type` = 'GPC'",
+        "`category_label` != 'Fugitive'",
+        "`source_label` != 'Biofuel'",
+    )
+
+    # totals for 2005 and the most recent year, and change between them
+    change_columns = (
+        'SUM(`cy_2005_tco2e_100_yr_gwp`) AS `total_2005`',
+        f'SUM(`{max_tco2e_col_name}`) AS `total_{max_tco2e_col_year}`',
+        f'(SUM(`{max_tco2e_col_name}`) - SUM(`cy_2005_tco2e_100_yr_gwp`)) / SUM(`cy_2005_tco2e_100_yr_gwp`) AS `pct_change`',
+    )
+
+    buildings_by_sector_by_fuel_query = (
+        Query()
+        .select(
+            '`category_label`',
+            '''
+            CASE
+                WHEN `source_label` IN ('#2 fuel oil', '#4 fuel oil', '#6 fuel oil') THEN 'Fuel oil'
+                ELSE `source_label`
+            END AS `source_group`
+            ''',
+            f'SUM(`{max_tco2e_col_name}`) AS `total`'
+        )
+        .where(*buildings_conditions)
+        .group_by('`category_label`', '`source_group`')
+    )
 
     buildings_by_sector_by_fuel = climate_dash_tools.extract.from_open_data(table_id,buildings_by_sector_by_fuel_query)
 
@@ -98,20 +116,12 @@ def run():
         .sort_index()
     )
 
-    buildings_change_query = f'''
-    SELECT
-        `category_label`,
-        `source_label`,
-        SUM(`cy_2005_tco2e_100_yr_gwp`) AS `total_2005`,
-        SUM(`{max_tco2e_col_name}`) AS `total_{max_tco2e_col_year}`,
-        (SUM(`{max_tco2e_col_name}`) - SUM(`cy_2005_tco2e_100_yr_gwp`)) / SUM(`cy_2005_tco2e_100_yr_gwp`) AS `pct_change`
-    WHERE
-        (`sectors_sector` == "Stationary Energy")
-        AND (`inventory_type` == "GPC")
-        AND (`category_label` != "Fugitive")
-        AND (`source_label` != "Biofuel")
-    GROUP BY `category_label`, `source_label`
-    '''
+    buildings_change_query = (
+        Query()
+        .select('`category_label`', '`source_label`', *change_columns)
+        .where(*buildings_conditions)
+        .group_by('`category_label`', '`source_label`')
+    )
     buildings_change = climate_dash_tools.extract.from_open_data(table_id,buildings_change_query)
 
     buildings_change = (
@@ -122,16 +132,12 @@ def run():
 
     # Transportation
 
-    transportation_change_query = f'''
-    SELECT
-        `category_label`,
-        SUM(`cy_2005_tco2e_100_yr_gwp`) AS `total_2005`,
-        SUM(`{max_tco2e_col_name}`) AS `total_{max_tco2e_col_year}`,
-        (SUM(`{max_tco2e_col_name}`) - SUM(`cy_2005_tco2e_100_yr_gwp`)) / SUM(`cy_2005_tco2e_100_yr_gwp`) AS `pct_change`
-    WHERE
-        (`sectors_sector` == "Transportation")
-    GROUP BY `category_label`
-    '''
+    transportation_change_query = (
+        Query()
+        .select('`category_label`', *change_columns)
+        .where("`sectors_sector` = 'Transportation'")
+        .group_by('`category_label`')
+    )
 
     transportation_change = climate_dash_tools.extract.from_open_data(table_id,transportation_change_query)
 
@@ -155,8 +161,7 @@ def run():
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
         total_by_sector.to_csv(
             data_dir / 'ghg_emissions__total_by_sector.csv'
@@ -184,13 +189,15 @@ def run():
     else:
         logger.error(
             'Incorrect data: %s | %s | %s | %s',
-            total_by_sector,
-            buildings_by_sector_by_fuel,
-            buildings_change,
-            transportation_change
+            climate_dash_tools.logging_config.summarize(total_by_sector),
+            climate_dash_tools.logging_config.summarize(buildings_by_sector_by_fuel),
+            climate_dash_tools.logging_config.summarize(buildings_change),
+            climate_dash_tools.logging_config.summarize(transportation_change)
         )
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
@@ -1,28 +1,21 @@
-def run():
-    import pathlib
-
-    import pandas as pd
-    
-    import climate_dash_tools.extract
-    import climate_dash_tools.transform
-    import climate_dash_tools.logging_config
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = 'wgsj-jt5f'
+OPEN_DATA_COLLECTION = 'state'
 
-    pipeline_name = pathlib.Path(__file__).stem
-
-    # set up logging
-    logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
+# sums of `estimated_pv_system_size` (kW, to two decimals) in MW are exact to this many decimals;
+# sums of daily sums are rounded to them, so they are written as the API's own sums were
+MW_DECIMALS = 5
 
+def extract():
+    import climate_dash_tools.extract
 
-    table_id = 'wgsj-jt5f'
-
-    ### Step 1: Get total per year
-
-    # EXTRACT
+    # Installed capacity per interconnection day: every yearly total and running
+    # total as of any date can be summed from this locally
 
     query = '''
     SELECT
-        date_extract_y(`interconnection_date`) AS `year`,
-        sum(`estimated_pv_system_size`) / 1000 AS `total_installed_mw`
+        date_trunc_ymd(`interconnection_date`) AS `day`,
+        sum(`estimated_pv_system_size`) / 1000 AS `installed_mw`
     WHERE
         caseless_one_of(
         `county`,
@@ -32,63 +25,69 @@ def run():
         "Queens",
         "Richmond"
         )
-    GROUP BY date_extract_y(`interconnection_date`)
+    GROUP BY date_trunc_ymd(`interconnection_date`)
+    LIMIT 1000000
     '''
 
-    installed_mw_by_year = climate_dash_tools.extract.from_open_data(
-        table_id=table_id,
+    return climate_dash_tools.extract.from_open_data(
+        table_id=TABLE_ID,
         query=query,
-        open_data_collection='state',
+        open_data_collection=OPEN_DATA_COLLECTION,
         include_metadata=True
     )
 
-    ### Step 2: Get end of last complete year 
+def summarize(data, as_of):
+    """Installed MW by year, and installed / remaining to the 2030 goal, as of the end of the last year complete as of `as_of`"""
+    import pandas as pd
+
+    import climate_dash_tools.transform
 
-    end_date_of_last_complete_year = climate_dash_tools.transform.get_last_complete_period_end_date(
-        installed_mw_by_year.metadata, 
+    ### Step 1: Get end of last complete year
+
+    end_date_of_last_complete_year = climate_dash_tools.transform.get_last_complete_period_end_date_as_of(
+        as_of,
         'YE'
     )
 
     last_complete_year = end_date_of_last_complete_year.year
 
-    # Step 3: Get remaining to goal, as of end of last complete year
-
-    query = f'''SELECT 
-        sum(`estimated_pv_system_size`) / 1000 AS `installed`,
-        1000 - sum(`estimated_pv_system_size`) / 1000 AS `remaining`
-    WHERE
-    caseless_one_of(
-        `county`,
-        'Bronx',
-        'New York',
-        'Kings',
-        'Queens',
-        'Richmond'
+    installed_by_day = (
+        data
+        .dropna(subset=['day'])
+        # floating timestamps are parsed as UTC; compare as naive local dates
+        .assign(day = lambda df: df['day'].dt.tz_localize(None))
     )
-    AND (`interconnection_date` >= '2014-01-01T00:00:00' :: floating_timestamp)
-    AND (`interconnection_date` <= '{end_date_of_last_complete_year.isoformat()}' :: floating_timestamp)
-    '''
 
-    installed_remaining = climate_dash_tools.extract.from_open_data(
-        table_id,query,
-        open_data_collection='state'
-    )
-
-
-    # TRANSFORMS
+    ### Step 2: Get total per year
 
     summary_installed_mw_by_year = (
-        installed_mw_by_year.data
-        .set_index('year')
+        installed_by_day
+        .groupby(installed_by_day['day'].dt.year.rename('year'))
+        .agg(total_installed_mw=('installed_mw','sum'))
+        .round(MW_DECIMALS)
         .sort_index()
         .loc[:last_complete_year]
     )
-    
+
+    # Step 3: Get remaining to goal, as of end of last complete year
+
+    installed = round(
+        installed_by_day.loc[
+            installed_by_day['day'].between(pd.Timestamp('2014-01-01'), end_date_of_last_complete_year),
+            'installed_mw'
+        ].sum(),
+        MW_DECIMALS
+    )
+
+    installed_remaining = pd.DataFrame({
+        'installed':[installed],
+        'remaining':[round(1000 - installed, MW_DECIMALS)]
+    })
 
     years_until_2030 = 2030 - last_complete_year
 
     annual_needed_to_meet_goal = installed_remaining['remaining'].item() / years_until_2030
-    
+
     summary_installed_remaining = (
         installed_remaining
         .assign(
@@ -102,43 +101,67 @@ def run():
         data={'annual_needed_to_meet_goal':annual_needed_to_meet_goal}
     )
 
+    return {
+        'summary_installed_mw_by_year':summary_installed_mw_by_year,
+        'summary_installed_remaining':summary_installed_remaining,
+        'summary_annual_to_meet_goal':summary_annual_to_meet_goal
+    }
+
+def validate(summary):
+    return (
+        summary['summary_installed_mw_by_year']['total_installed_mw'].between(0,500).all()
+        and
+        summary['summary_installed_remaining'][['installed','remaining']].iloc[0].between(0,1000).all()
+    )
+
+def run():
+    import pathlib
+
+    import climate_dash_tools.outputs
+    import climate_dash_tools.logging_config
+
+    pipeline_name = pathlib.Path(__file__).stem
+
+    # set up logging
+    logger = climate_dash_tools.logging_config.setup_logging_for_pipeline(pipeline_name)
+
+    # EXTRACT
+
+    installed_mw_by_day = extract()
+
+    # TRANSFORMS
+
+    summary = summarize(installed_mw_by_day.data, installed_mw_by_day.metadata['dataUpdatedAt'])
 
     # VALIDATE
 
-    if (
-        summary_installed_mw_by_year['total_installed_mw'].between(0,500).all()
-        and
-        installed_remaining[['installed','remaining']].iloc[0].between(0,1000).all()
-    ):
+    if validate(summary):
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
-        summary_installed_mw_by_year.to_csv(
+        summary['summary_installed_mw_by_year'].to_csv(
             data_dir / 'solar_installed_mw_by_year.csv'
         )
 
-        summary_installed_remaining.to_csv(
+        summary['summary_installed_remaining'].to_csv(
             data_dir / 'solar_installed_remaining.csv',
             index=False
         )
 
-        summary_annual_to_meet_goal.to_csv(
+        summary['summary_annual_to_meet_goal'].to_csv(
             data_dir / 'solar_annual_to_meet_goal.csv'
         )
 
-        return {
-            'summary_installed_mw_by_year':summary_installed_mw_by_year,
-            'summary_installed_remaining':summary_installed_remaining,
-            'summary_annual_to_meet_goal':summary_annual_to_meet_goal
-        }
+        return summary
 
     else:
-        logger.error('Incorrect data: %s', summary_installed_mw_by_year.tail(20))
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(summary['summary_installed_mw_by_year']))
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
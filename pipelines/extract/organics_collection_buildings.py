@@ -1,9 +1,13 @@
+# source table, checked for changes by `run_extractors --changed-only`
+TABLE_ID = 'tiyn-ajjm'
+
 def run():
     import pandas as pd
     import pathlib
 
     import climate_dash_tools.extract
     import climate_dash_tools.transform
+    import climate_dash_tools.outputs
     import climate_dash_tools.logging_config
 
     pipeline_name = pathlib.Path(__file__).stem
@@ -13,7 +17,7 @@ def run():
 
     # EXTRACT
 
-    table_id = 'tiyn-ajjm'
+    table_id = TABLE_ID
 
     query = '''
     SELECT
@@ -53,8 +57,7 @@ def run():
 
         # SAVE
 
-        data_dir = pathlib.Path('Data/Summary Data')
-        data_dir.mkdir(exist_ok=True, parents=True)
+        data_dir = climate_dash_tools.outputs.get_output_dir()
 
         summary_data.to_csv(
             data_dir / f'{pipeline_name}.csv',
@@ -63,9 +66,11 @@ def run():
         return summary_data
 
     else:
-        logger.error('Incorrect data: %s', summary_data.tail(20))
+        logger.error('Incorrect data: %s', climate_dash_tools.logging_config.summarize(summary_data))
 
         return None
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    import climate_dash_tools.profiling
+
+    climate_dash_tools.profiling.pipeline_main(run, __file__)
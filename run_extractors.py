@@ -1,41 +1,419 @@
+import argparse
 import importlib
+import pathlib
 
+import climate_dash_tools.backfill
+import climate_dash_tools.bundle
+import climate_dash_tools.distributed
+import climate_dash_tools.extract
+import climate_dash_tools.freshness
+import climate_dash_tools.history
+import climate_dash_tools.jobqueue
+import climate_dash_tools.journal
 import climate_dash_tools.logging_config
+import climate_dash_tools.profiling
+import climate_dash_tools.scheduler
+import climate_dash_tools.soql
 
 logger = climate_dash_tools.logging_config.setup_logging_for_main()
 
-def run_all():
+PIPELINES = (
+    'organics_collection_buildings',
+    'energy_star_scores',
+    'diversion_rate',
+    'ghg_emissions',
+    'bicycle_lane_miles',
+    'bike_parking_spaces',
+    'electric_vehicles_registered',
+    'ev_fleet_count',
+    'installed_solar',
+    'air_quality'
+)
 
-    PIPELINES = (
-        'organics_collection_buildings',
-        'energy_star_scores',
-        'diversion_rate',
-        'ghg_emissions',
-        'bicycle_lane_miles',
-        'bike_parking_spaces',
-        'electric_vehicles_registered',
-        'ev_fleet_count',
-        'installed_solar',
-        'air_quality'
+OUTPUT_DIRECTORY = pathlib.Path('Data/Summary Data')
+
+# used by --daemon for pipelines that don't set a module-level `SCHEDULE` cron expression
+DEFAULT_SCHEDULE = '30 * * * *'
+
+def import_pipeline(pipeline_name):
+    return importlib.import_module('pipelines.extract.' + pipeline_name)
+
+def get_pipeline_sources(pipeline):
+    """Source keys a pipeline declares via `SOURCE_URLS` or `TABLE_ID` / `OPEN_DATA_COLLECTION`"""
+    if hasattr(pipeline, 'SOURCE_URLS'):
+        return list(pipeline.SOURCE_URLS)
+
+    if hasattr(pipeline, 'TABLE_ID'):
+        return [
+            climate_dash_tools.freshness.table_source(
+                pipeline.TABLE_ID,
+                getattr(pipeline, 'OPEN_DATA_COLLECTION', 'city')
+            )
+        ]
+
+    return []
+
+def _import_pipeline_sources(pipeline_name):
+    """A pipeline's sources, or none if it fails to import (so it is run, and its failure recorded)"""
+    try:
+        return get_pipeline_sources(import_pipeline(pipeline_name))
+    except Exception as e:
+        logger.error('✖ could not import %s: %s', pipeline_name, e)
+        return []
+
+def run_all(changed_only=False, history=False, profile=False, retry_failed=False):
+
+    pipelines = PIPELINES
+    source_versions = {}
+
+    # source versions of every successful run are recorded, so a later --changed-only run can skip it
+    state = climate_dash_tools.freshness.load_state()
+
+    if changed_only:
+        pipeline_sources = {pipeline_name: _import_pipeline_sources(pipeline_name) for pipeline_name in PIPELINES}
+        pipelines, source_versions = climate_dash_tools.freshness.find_changed_pipelines(pipeline_sources, state)
+
+        logger.info('%s of %s pipelines have changed sources', len(pipelines), len(PIPELINES))
+
+    # the journal records each pipeline's status and, until it succeeds, its requests' results
+    if retry_failed:
+        journal = climate_dash_tools.journal.RunJournal()
+        failed_pipelines = journal.failed_pipelines()
+        pipelines = [pipeline_name for pipeline_name in pipelines if pipeline_name in failed_pipelines]
+
+        logger.info('retrying %s failed pipelines: %s', len(pipelines), ', '.join(pipelines))
+    else:
+        journal = climate_dash_tools.journal.RunJournal.new()
+
+    climate_dash_tools.extract.result_journal = journal
+
+    if history:
+        history_run = climate_dash_tools.history.HistoryStore().new_run()
+
+        def record_raw_data(table_id, open_data_collection, query, data_json):
+            if not isinstance(data_json, list):
+                return
+            fingerprint = climate_dash_tools.soql.fingerprint(query, table_id, open_data_collection)
+            history_run.add_records(f'raw/{open_data_collection}/{table_id}/{fingerprint}.jsonl', data_json)
+
+        climate_dash_tools.extract.raw_data_hooks.append(record_raw_data)
+
+    results = {}
+
+    for pipeline_name in pipelines:
+
+        # the pipeline's records (and its failure) go to its log file, and nothing after it
+        with climate_dash_tools.logging_config.pipeline_context(pipeline_name):
+            logger.info('▶ starting %s', pipeline_name)
+            journal.start_pipeline(pipeline_name)
+            try:
+                pipeline = import_pipeline(pipeline_name)
+
+                # sources as of before the run, so anything published mid-run is picked up next time
+                versions = source_versions.get(pipeline_name)
+                if versions is None:
+                    versions = climate_dash_tools.freshness.get_pipeline_source_versions(
+                        {pipeline_name: get_pipeline_sources(pipeline)}
+                    )[pipeline_name]
+
+                if profile:
+                    with climate_dash_tools.profiling.profile(pipeline_name):
+                        results[pipeline_name] = pipeline.run()
+                else:
+                    results[pipeline_name] = pipeline.run()
+
+                journal.finish_pipeline(
+                    pipeline_name,
+                    climate_dash_tools.journal.SUCCEEDED if results[pipeline_name] is not None else climate_dash_tools.journal.INVALID
+                )
+
+                if results[pipeline_name] is not None:
+                    state[pipeline_name] = versions
+                    climate_dash_tools.freshness.save_state(state)
+            except Exception as e:
+                logger.error('✖ %s failed with error', pipeline_name)
+                logger.info(e)
+                journal.finish_pipeline(pipeline_name, climate_dash_tools.journal.FAILED, error=repr(e))
+
+    climate_dash_tools.extract.result_journal = None
+
+    if history:
+        climate_dash_tools.extract.raw_data_hooks.remove(record_raw_data)
+
+        for path in sorted(OUTPUT_DIRECTORY.glob('*')):
+            if path.is_file():
+                history_run.add_file(path, f'outputs/{path.name}')
+
+        history_run.commit(note=', '.join(results))
+
+    transfer_stats = climate_dash_tools.extract.transfer_stats
+
+    logger.info(
+        'transferred %s bytes compressed, %s bytes decompressed over %s requests',
+        sum(stats.compressed_bytes for stats in transfer_stats),
+        sum(stats.decompressed_bytes for stats in transfer_stats),
+        len(transfer_stats)
     )
 
+    return results
+
+
+def run_daemon(max_workers=2, status_port=8765):
+    schedules = {
+        'pipelines.extract.' + pipeline_name: getattr(import_pipeline(pipeline_name), 'SCHEDULE', DEFAULT_SCHEDULE)
+        for pipeline_name in PIPELINES
+    }
+
+    scheduler = climate_dash_tools.scheduler.Scheduler(schedules, max_workers=max_workers)
+    scheduler.start_workers()
+
+    server = climate_dash_tools.scheduler.serve_status(scheduler, status_port)
+
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        logger.info('stopping scheduler')
+    finally:
+        server.shutdown()
+        scheduler.stop()
+
+
+def run_distributed(
+    queue_path,
+    enqueue=False,
+    work=False,
+    gather=False,
+    batch=None,
+    extract_table=None,
+    extract_where=(),
+    extract_collection='city',
+    page_size=100_000,
+    gather_extract_path=None
+):
+    """
+    Spread pipeline runs and large paged extracts over several hosts through a job queue on shared storage.
+
+    Typically one host enqueues, any number of hosts work, and one host gathers
+    the outputs back into `Data/Summary Data` (or an extract into one file). Steps can be combined.
+    """
+    queue = climate_dash_tools.jobqueue.JobQueue(queue_path)
+
+    if enqueue:
+        batch = climate_dash_tools.distributed.enqueue_pipelines(
+            queue,
+            ['pipelines.extract.' + pipeline_name for pipeline_name in PIPELINES],
+            batch
+        )
+        logger.info('enqueued %s pipelines as batch %s', len(PIPELINES), batch)
+
+    if extract_table:
+        batch = climate_dash_tools.distributed.enqueue_paged_extract(
+            queue,
+            extract_table,
+            climate_dash_tools.soql.Query().where(*extract_where),
+            page_size=page_size,
+            open_data_collection=extract_collection,
+            batch=batch
+        )
+        logger.info('enqueued pages of %s as batch %s', extract_table, batch)
+
+    if work:
+        completed = climate_dash_tools.jobqueue.run_worker(queue, climate_dash_tools.distributed.HANDLERS)
+        logger.info('completed %s jobs', completed)
+
+    if gather:
+        batch = batch or queue.latest_batch()
+        logger.info('gathering batch %s: %s', batch, queue.counts(batch))
+        return climate_dash_tools.distributed.gather_outputs(queue, batch)
+
+    if gather_extract_path:
+        batch = batch or queue.latest_batch()
+        data = climate_dash_tools.distributed.gather_extract(queue, batch)
+        data.to_csv(gather_extract_path, index=False)
+        logger.info('gathered %s rows of batch %s into %s', len(data), batch, gather_extract_path)
+        return data
+
+
+def run_backfill(start, end, freq='MS', pipeline_names=None, max_workers=None):
+    """
+    Recompute outputs as of each date from `start` to `end` (every `freq`), into `Data/Backfill`,
+    for pipelines that support it (i.e. define `extract` and `summarize`)
+    """
+    import pandas as pd
+
+    as_of_dates = pd.date_range(start, end, freq=freq)
+
     results = {}
 
-    for pipeline_name in PIPELINES:
+    for pipeline_name in pipeline_names or PIPELINES:
+        pipeline = import_pipeline(pipeline_name)
+
+        if not hasattr(pipeline, 'summarize'):
+            continue
 
-        logger.info('▶ starting %s', pipeline_name)
+        logger.info('▶ backfilling %s', pipeline_name)
         try:
-            pipeline = importlib.import_module('pipelines.extract.' + pipeline_name)
-        
-            results[pipeline_name] = pipeline.run()
+            results[pipeline_name] = climate_dash_tools.backfill.backfill(
+                pipeline.__name__,
+                as_of_dates,
+                max_workers=max_workers
+            )
+            climate_dash_tools.backfill.save_backfill(pipeline_name, results[pipeline_name])
         except Exception as e:
-            logger.error('✖ %s failed with error', pipeline_name)
+            logger.error('✖ backfilling %s failed with error', pipeline_name)
             logger.info(e)
-            pass
-
 
     return results
 
 
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='Extract and transform data for NYC Climate Dashboard')
+    parser.add_argument(
+        '--changed-only',
+        action='store_true',
+        help='only run pipelines whose sources were updated since their last successful run'
+    )
+    parser.add_argument(
+        '--history',
+        action='store_true',
+        help='record raw extracts and summary outputs of this run in the history store'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='write CPU and memory profiles and a hot-spot report per pipeline to Profiles/'
+    )
+    parser.add_argument(
+        '--retry-failed',
+        action='store_true',
+        help='only rerun pipelines that failed in the last run, reusing the results of their requests that succeeded'
+    )
+    parser.add_argument(
+        '--hedge-requests',
+        action='store_true',
+        help='duplicate requests still unanswered after their endpoint\'s p95 latency, and use the first response'
+    )
+    parser.add_argument(
+        '--bundle',
+        action='store_true',
+        help='after the run, pack all summary outputs into one compressed bundle in Data/Bundle for the dashboard'
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='keep running, and run each pipeline on its cron schedule in warm worker processes'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=2,
+        help='number of worker processes for --daemon'
+    )
+    parser.add_argument(
+        '--status-port',
+        type=int,
+        default=8765,
+        help='local port serving run status as JSON for --daemon'
+    )
+    parser.add_argument(
+        '--queue',
+        metavar='PATH',
+        help='SQLite job queue (e.g. on shared storage) for distributed runs with --enqueue, --work and --gather'
+    )
+    parser.add_argument(
+        '--enqueue',
+        action='store_true',
+        help='enqueue all pipelines as a new batch'
+    )
+    parser.add_argument(
+        '--work',
+        action='store_true',
+        help='run queued jobs until the queue is empty'
+    )
+    parser.add_argument(
+        '--gather',
+        action='store_true',
+        help='write the outputs of finished jobs into Data/Summary Data'
+    )
+    parser.add_argument(
+        '--batch',
+        help='batch id to enqueue as, or to gather (default: latest)'
+    )
+    parser.add_argument(
+        '--enqueue-extract',
+        metavar='TABLE_ID',
+        help='enqueue a paged extract of a whole table (filtered by --extract-where), one job per page'
+    )
+    parser.add_argument(
+        '--extract-where',
+        metavar='CONDITION',
+        action='append',
+        default=[],
+        help='SoQL condition for --enqueue-extract; can be given more than once'
+    )
+    parser.add_argument(
+        '--extract-collection',
+        choices=('city', 'state'),
+        default='city',
+        help='Open Data collection of the --enqueue-extract table (default: city)'
+    )
+    parser.add_argument(
+        '--page-size',
+        type=int,
+        default=100_000,
+        help='rows per page for --enqueue-extract (default: 100000)'
+    )
+    parser.add_argument(
+        '--gather-extract',
+        metavar='PATH',
+        help='combine the pages of an extract batch into one CSV file'
+    )
+    parser.add_argument(
+        '--backfill',
+        nargs=2,
+        metavar=('START', 'END'),
+        help='recompute outputs as of each date from START to END into Data/Backfill, for pipelines that support it'
+    )
+    parser.add_argument(
+        '--backfill-freq',
+        default='MS',
+        help='pandas frequency of --backfill dates (default: MS, the start of each month)'
+    )
+
+    args = parser.parse_args(args)
+
+    distributed_steps = (args.enqueue, args.work, args.gather, args.enqueue_extract, args.gather_extract)
+
+    if args.queue and not any(distributed_steps):
+        parser.error('--queue needs at least one of --enqueue, --enqueue-extract, --work, --gather or --gather-extract')
+    if any(distributed_steps) and not args.queue:
+        parser.error('--enqueue, --enqueue-extract, --work, --gather and --gather-extract need --queue')
+
+    return args
+
+
 if __name__ == "__main__":
-    run_all()
+    args = parse_args()
+    climate_dash_tools.extract.HEDGE_REQUESTS = args.hedge_requests
+    if args.backfill:
+        run_backfill(*args.backfill, freq=args.backfill_freq)
+    elif args.daemon:
+        run_daemon(max_workers=args.workers, status_port=args.status_port)
+    elif args.queue:
+        run_distributed(
+            args.queue,
+            enqueue=args.enqueue,
+            work=args.work,
+            gather=args.gather,
+            batch=args.batch,
+            extract_table=args.enqueue_extract,
+            extract_where=args.extract_where,
+            extract_collection=args.extract_collection,
+            page_size=args.page_size,
+            gather_extract_path=args.gather_extract
+        )
+    else:
+        run_all(changed_only=args.changed_only, history=args.history, profile=args.profile, retry_failed=args.retry_failed)
+
+        if args.bundle:
+            climate_dash_tools.bundle.export_bundle(OUTPUT_DIRECTORY)
@@ -0,0 +1,27 @@
+import logging
+
+import pytest
+
+import climate_dash_tools.logging_config
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    """Run each test in its own directory, so caches, logs and outputs start empty"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / climate_dash_tools.logging_config.INFO_DIR).mkdir(parents=True)
+    (tmp_path / climate_dash_tools.logging_config.WARN_DIR).mkdir(parents=True)
+
+    root_logger = logging.getLogger()
+    handlers, level = root_logger.handlers[:], root_logger.level
+    # pipelines run in a test set the pipeline they log for, as they do in their own process
+    pipeline_token = climate_dash_tools.logging_config._current_pipeline.set(None)
+
+    yield tmp_path
+
+    climate_dash_tools.logging_config._current_pipeline.reset(pipeline_token)
+
+    climate_dash_tools.logging_config._stop_listeners()
+    climate_dash_tools.logging_config._worker_queue = None
+    root_logger.handlers = handlers
+    root_logger.setLevel(level)
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from pipelines.extract import air_quality
+
+TIME_PERIODS = pd.DataFrame({
+    'TimePeriodID': [1, 2, 3],
+    'TimePeriod': [2022, 2023, 'Summer 2023'],
+    'TimeType': ['year', 'year', 'season'],
+})
+
+MEASURES = pd.DataFrame({
+    'MeasureID': [1425, 1431],
+    'MeasureName': ['PM2.5', 'NO2'],
+    'DisplayType': ['mcg/m3', 'ppb'],
+})
+
+
+def data_table(measure_id, geo_ids, years):
+    """Rows of an indicator's data table, with CDs out of order, and a borough row in each period"""
+    return pd.DataFrame([
+        {'MeasureID': measure_id, 'GeoType': geo_type, 'GeoID': geo_id, 'TimePeriodID': period, 'Value': value}
+        for period in years
+        for geo_type, geo_id, value in [('CD', geo_id, geo_id / 100 + period) for geo_id in geo_ids] + [('Borough', 1, 50)]
+    ])
+
+
+GEO_IDS = [503, 101, 307, 102]
+
+DATA_TABLES = [
+    data_table(1425, GEO_IDS, [2, 1, 3]),
+    data_table(1431, GEO_IDS, [1, 2]),
+]
+
+
+def test_build_index_keeps_only_yearly_periods():
+    data_index = air_quality.build_index(DATA_TABLES, TIME_PERIODS)
+
+    assert data_index.index.is_monotonic_increasing
+    assert set(data_index.index.get_level_values('TimePeriodID')) == {1, 2}
+    # in the data tables' order within each key
+    assert data_index.loc[(1425, 'CD', 2), 'GeoID'].tolist() == GEO_IDS
+    assert data_index.loc[(1431, 'CD', 1), 'TimePeriod'].unique().tolist() == [2022]
+
+
+def test_history_for_cd(monkeypatch):
+    monkeypatch.setattr(air_quality, 'INDICATOR_MEASURE_IDS', {
+        pollutant: ids for pollutant, ids in air_quality.INDICATOR_MEASURE_IDS.items() if pollutant in ('PM25', 'NO2')
+    })
+
+    history = air_quality.get_history_for_cd(air_quality.build_index(DATA_TABLES, TIME_PERIODS), MEASURES)
+
+    assert history.columns.tolist() == ['Pollutant', 'GeoID', 'Year', 'Value', 'Unit', 'MeasureName']
+    assert history[['Pollutant', 'Year']].drop_duplicates().values.tolist() == [
+        ['NO2', 2022], ['NO2', 2023], ['PM25', 2022], ['PM25', 2023],
+    ]
+    # CDs only, as ordered in the data tables, which is how the latest year is written
+    assert history.loc[history['Pollutant'].eq('PM25') & history['Year'].eq(2023), 'GeoID'].tolist() == GEO_IDS
+    assert history.loc[history['GeoID'].eq(101) & history['Pollutant'].eq('NO2'), 'Unit'].tolist() == ['ppb', 'ppb']
@@ -0,0 +1,40 @@
+import textwrap
+
+import pandas as pd
+
+import climate_dash_tools.backfill
+import climate_dash_tools.logging_config
+
+PIPELINE = '''
+import logging
+from typing import NamedTuple
+
+import pandas as pd
+
+class Extract(NamedTuple):
+    data: pd.DataFrame
+
+def extract():
+    return Extract(pd.DataFrame({'date': pd.date_range('2024-01-01', periods=90), 'value': 1}))
+
+def summarize(data, as_of):
+    logging.getLogger(__name__).info('summarizing as of %s', as_of.date())
+    return data[data['date'] < as_of].agg({'value': 'sum'}).to_frame('total')
+'''
+
+
+def test_backfill_in_spawned_workers(working_directory, monkeypatch):
+    (working_directory / 'backfill_pipeline.py').write_text(textwrap.dedent(PIPELINE))
+    monkeypatch.syspath_prepend(str(working_directory))
+
+    result = climate_dash_tools.backfill.backfill('backfill_pipeline', ['2024-01-11', '2024-02-01'], max_workers=2)
+
+    assert result.loc[(pd.Timestamp('2024-01-11'), 'value'), 'total'] == 10
+    assert result.loc[(pd.Timestamp('2024-02-01'), 'value'), 'total'] == 31
+
+    climate_dash_tools.logging_config._stop_listeners()
+
+    # workers' records reach the parent's handlers, attributed to the pipeline
+    log = (climate_dash_tools.logging_config.INFO_DIR / 'backfill_pipeline.log').read_text()
+    assert 'summarizing as of 2024-01-11' in log
+    assert 'summarizing as of 2024-02-01' in log
@@ -0,0 +1,92 @@
+import gzip
+import sqlite3
+
+import pytest
+
+import climate_dash_tools.bulk
+import climate_dash_tools.extract
+import climate_dash_tools.schema
+
+EXPORT = '''Station Name,Install Date,Ports
+Atlantic Ave,03/15/2024 12:00:00 AM,"1,200"
+Broadway,01/02/2023 01:30:00 PM,4
+Canal St,,2
+'''
+
+
+@pytest.fixture
+def downloaded_export(working_directory, monkeypatch):
+    monkeypatch.setattr(
+        climate_dash_tools.extract,
+        'get_metadata',
+        lambda table_id, open_data_collection='city': {'dataUpdatedAt': '2024-03-16T00:00:00.000Z'}
+    )
+    monkeypatch.setattr(
+        climate_dash_tools.schema,
+        'get_schema',
+        lambda table_id, open_data_collection='city': climate_dash_tools.schema.TableSchema(
+            columns={'station_name': 'text', 'install_date': 'calendar_date', 'ports': 'number'},
+            metadata_updated_at=None,
+            fetched_at=0,
+            field_names={'Station Name': 'station_name', 'Install Date': 'install_date', 'Ports': 'ports'},
+        )
+    )
+
+    version = climate_dash_tools.bulk._version('2024-03-16T00:00:00.000Z')
+    path = climate_dash_tools.bulk._export_dir('abcd-1234', 'city') / f'{version}.csv.gz'
+    with gzip.open(path, 'wt') as f:
+        f.write(EXPORT)
+    return path
+
+
+def test_load_table_stores_types_in_database(downloaded_export):
+    table = climate_dash_tools.bulk.load_table('abcd-1234')
+
+    assert table.column_types == {
+        'station_name': 'text',
+        'install_date': 'floating_timestamp',
+        'ports': 'number',
+    }
+    with sqlite3.connect(table.database) as connection:
+        rows = connection.execute('SELECT station_name, install_date, ports FROM data ORDER BY station_name').fetchall()
+    connection.close()
+    assert rows == [
+        ('Atlantic Ave', '2024-03-15T00:00:00.000', 1200.0),
+        ('Broadway', '2023-01-02T13:30:00.000', 4.0),
+        ('Canal St', None, 2.0),
+    ]
+
+
+def test_from_bulk_export_runs_query_locally(downloaded_export):
+    data = climate_dash_tools.bulk.from_bulk_export(
+        'abcd-1234',
+        "SELECT station_name, ports WHERE ports > 1 AND install_date >= '2024-01-01'"
+    )
+    assert data.to_dict('records') == [{'station_name': 'Atlantic Ave', 'ports': 1200}]
+
+    records = climate_dash_tools.bulk.from_bulk_export('abcd-1234', 'SELECT station_name, install_date ORDER BY station_name DESC', parse=False)
+    assert records[0] == {'station_name': 'Canal St'}
+
+
+def test_use_bulk_export(downloaded_export, monkeypatch):
+    # already downloaded
+    assert climate_dash_tools.bulk.use_bulk_export('abcd-1234', 'SELECT * LIMIT 1000000')
+    # aggregates, system fields and queries that don't parse go to the API
+    assert not climate_dash_tools.bulk.use_bulk_export('abcd-1234', 'SELECT COUNT(*)')
+    assert not climate_dash_tools.bulk.use_bulk_export('abcd-1234', 'SELECT * ORDER BY :id')
+    assert not climate_dash_tools.bulk.use_bulk_export('abcd-1234', 'SELECT * WHERE name = $1')
+
+
+def test_use_bulk_export_counts_in_one_request(downloaded_export, monkeypatch):
+    queries = []
+
+    def fake_from_open_data(table_id, query, open_data_collection='city', parse=True):
+        queries.append(query)
+        return [{'row_count': '1000000', 'matching_rows': '600000'}]
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'from_open_data', fake_from_open_data)
+
+    # not downloaded
+    assert climate_dash_tools.bulk.use_bulk_export('efgh-5678', "SELECT * WHERE ports > 1 LIMIT 1000000")
+    assert len(queries) == 1
+    assert not climate_dash_tools.bulk.use_bulk_export('efgh-5678', "SELECT * WHERE ports > 1 LIMIT 1000")
@@ -0,0 +1,56 @@
+import gzip
+import json
+
+import pandas as pd
+
+import climate_dash_tools.bundle
+
+
+def write_outputs(directory):
+    directory.mkdir(parents=True)
+    # two unnamed index levels, as written by `to_csv` of a grouped count
+    (
+        pd.DataFrame({
+            'count': [3, 1],
+            'proportion': [0.75, float('nan')],
+            'ok': [True, False],
+            'grade': ['A', None],
+        }, index=pd.MultiIndex.from_tuples([(2023, 'A'), (2023, 'B')]))
+        .to_csv(directory / 'grades.csv')
+    )
+    (directory / 'stations.geojson').write_text(json.dumps({'type': 'FeatureCollection', 'features': [{'type': 'Feature'}]}))
+    (directory / 'notes.txt').write_text('not bundled')
+
+
+def test_bundle_round_trip(working_directory):
+    write_outputs(working_directory / 'summary')
+
+    path = climate_dash_tools.bundle.export_bundle(working_directory / 'summary', working_directory / 'bundle')
+
+    index = json.loads((working_directory / 'bundle' / climate_dash_tools.bundle.INDEX_FILE_NAME).read_text())
+    assert index['bundle'] == path.name
+    assert index['datasets'] == {
+        'grades': {'kind': 'table', 'rows': 2, 'columns': ['', '', 'count', 'proportion', 'ok', 'grade']},
+        'stations': {'kind': 'geojson', 'rows': 1},
+    }
+
+    bundle = json.loads(gzip.decompress(path.read_bytes()))
+    # both unnamed columns are kept, and missing values are null
+    assert bundle['datasets']['grades']['values'] == [
+        [2023, 2023], ['A', 'B'], [3, 1], [0.75, None], [True, False], ['A', None],
+    ]
+
+    [grades] = climate_dash_tools.bundle.read_bundle(working_directory / 'bundle').values()
+    assert grades.columns.tolist() == ['', '', 'count', 'proportion', 'ok', 'grade']
+    assert grades.iloc[:, 1].tolist() == ['A', 'B']
+    assert grades['count'].tolist() == [3, 1]
+
+
+def test_identical_outputs_give_the_same_bundle(working_directory):
+    write_outputs(working_directory / 'summary')
+
+    first = climate_dash_tools.bundle.export_bundle(working_directory / 'summary', working_directory / 'bundle')
+    second = climate_dash_tools.bundle.export_bundle(working_directory / 'summary', working_directory / 'bundle')
+
+    assert first == second
+    assert list((working_directory / 'bundle').glob('dashboard.*.json.gz')) == [first]
@@ -0,0 +1,45 @@
+import sys
+import textwrap
+
+import pytest
+
+import climate_dash_tools.distributed
+import climate_dash_tools.jobqueue
+import climate_dash_tools.outputs
+
+PIPELINE = '''
+import climate_dash_tools.outputs
+
+def run():
+    data_dir = climate_dash_tools.outputs.get_output_dir()
+    (data_dir / 'distributed_pipeline.csv').write_text('a,b\\n1,2\\n')
+    return True
+'''
+
+
+@pytest.fixture
+def pipeline_module(working_directory, monkeypatch):
+    (working_directory / 'distributed_pipeline.py').write_text(textwrap.dedent(PIPELINE))
+    monkeypatch.syspath_prepend(str(working_directory))
+    yield 'distributed_pipeline'
+    sys.modules.pop('distributed_pipeline', None)
+
+
+def test_pipeline_job_collects_only_its_own_outputs(working_directory, pipeline_module):
+    summary_directory = working_directory / climate_dash_tools.outputs.SUMMARY_DIRECTORY
+    summary_directory.mkdir(parents=True)
+    # written by another job or process meanwhile
+    (summary_directory / 'other_pipeline.csv').write_text('x\n')
+
+    queue = climate_dash_tools.jobqueue.JobQueue(working_directory / 'queue.sqlite')
+    batch = climate_dash_tools.distributed.enqueue_pipelines(queue, [pipeline_module])
+
+    assert climate_dash_tools.jobqueue.run_worker(queue, climate_dash_tools.distributed.HANDLERS) == 1
+    assert not (summary_directory / 'distributed_pipeline.csv').exists()
+
+    gathered = working_directory / 'gathered'
+    statuses = climate_dash_tools.distributed.gather_outputs(queue, batch, gathered)
+
+    assert statuses == {pipeline_module: 'done'}
+    assert sorted(path.name for path in gathered.iterdir()) == ['distributed_pipeline.csv']
+    assert (gathered / 'distributed_pipeline.csv').read_text() == 'a,b\n1,2\n'
@@ -0,0 +1,64 @@
+import pandas as pd
+
+import climate_dash_tools.emulator
+import climate_dash_tools.extract
+from pipelines.extract import electric_vehicles_registered
+
+# VINs around and between the range boundaries, lowercase and non-alphanumeric,
+# some registered in more than one county
+REGISTRATIONS = [
+    ('KINGS', 'ELECTRIC', '0ABC'),
+    ('KINGS', 'ELECTRIC', '1ABC'),
+    ('QUEENS', 'ELECTRIC', '1ABC'),
+    ('BRONX', 'ELECTRIC', '4ZZZ'),
+    ('BRONX', 'ELECTRIC', '5'),
+    ('NEW YORK', 'ELECTRIC', 'JABC'),
+    ('NEW YORK', 'ELECTRIC', 'jabc'),
+    ('RICHMOND', 'ELECTRIC', 'zzz'),
+    ('KINGS', 'GAS', '!ABC'),
+    ('KINGS', 'GAS', ' 123'),
+    ('QUEENS', 'GAS', '~ABC'),
+    ('QUEENS', 'DIESEL', 'Wabc'),
+    ('BRONX', 'DIESEL', 'Wabc'),
+    ('BRONX', 'GAS', 'sabc'),
+    ('BRONX', 'GAS', 'SABC'),
+    ('ALBANY', 'GAS', 'ALBANY'),
+]
+
+
+def test_vin_ranges_count_every_vehicle_once(working_directory):
+    fixtures = working_directory / 'fixtures'
+    fixtures.mkdir()
+    pd.DataFrame(
+        [{'county': county, 'record_type': 'VEH', 'fuel_type': fuel_type, 'vin': vin} for county, fuel_type, vin in REGISTRATIONS]
+    ).to_csv(fixtures / f'{electric_vehicles_registered.TABLE_ID}.csv', index=False)
+
+    with climate_dash_tools.emulator.SodaEmulator(fixtures) as emulator:
+        with climate_dash_tools.emulator.point_extractor_at(emulator.base_url):
+            summary = electric_vehicles_registered.run()
+
+            unpartitioned = {
+                fuel_group: int(climate_dash_tools.extract.from_open_data(
+                    electric_vehicles_registered.TABLE_ID,
+                    f'''SELECT COUNT(DISTINCT `vin`) AS `vehicle_count`
+                    WHERE `county` IN ('KINGS', 'NEW YORK', 'BRONX', 'RICHMOND', 'QUEENS') AND {condition}''',
+                    open_data_collection=electric_vehicles_registered.OPEN_DATA_COLLECTION,
+                    parse=False
+                )[0]['vehicle_count'])
+                for fuel_group, condition in electric_vehicles_registered.FUEL_GROUPS.items()
+            }
+
+    assert unpartitioned == {'ELECTRIC': 7, 'GAS_AND_DIESEL': 6}
+    assert summary['vehicle_count'].to_dict() == unpartitioned
+
+
+def test_vin_ranges_are_contiguous():
+    conditions = electric_vehicles_registered.get_vin_range_conditions()
+    boundaries = electric_vehicles_registered.VIN_RANGE_BOUNDARIES
+
+    # open at both ends, so any VIN (in any collation) falls in exactly one range
+    assert conditions[0] == f"`vin` < '{boundaries[0]}'"
+    assert conditions[-1] == f"`vin` >= '{boundaries[-1]}'"
+    assert list(boundaries) == sorted(boundaries)
+    for lower, upper, condition in zip(boundaries, boundaries[1:], conditions[1:-1]):
+        assert condition == f"`vin` >= '{lower}' AND `vin` < '{upper}'"
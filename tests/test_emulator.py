@@ -0,0 +1,144 @@
+import concurrent.futures
+import email.utils
+import threading
+
+import pandas as pd
+import pytest
+import requests
+
+import climate_dash_tools.emulator
+import climate_dash_tools.extract
+import climate_dash_tools.soql
+
+FIXTURE = '''station_name,borough,ports,installed
+Atlantic Ave,Brooklyn,4,2023-03-15
+Broadway,Manhattan,2,2022-01-02
+Canal St,Manhattan,6,2024-06-30
+'''
+
+
+@pytest.fixture
+def emulator(working_directory):
+    fixtures = working_directory / 'fixtures'
+    fixtures.mkdir()
+    (fixtures / 'abcd-1234.csv').write_text(FIXTURE)
+
+    with climate_dash_tools.emulator.SodaEmulator(fixtures) as emulator:
+        with climate_dash_tools.emulator.point_extractor_at(emulator.base_url):
+            yield emulator
+
+
+def test_from_open_data_against_emulator(emulator):
+    data = climate_dash_tools.extract.from_open_data(
+        'abcd-1234',
+        'SELECT borough, SUM(ports) AS ports GROUP BY borough ORDER BY borough'
+    )
+    assert data.to_dict('records') == [
+        {'borough': 'Brooklyn', 'ports': 4},
+        {'borough': 'Manhattan', 'ports': 8},
+    ]
+
+    records = climate_dash_tools.extract.from_open_data(
+        'abcd-1234',
+        "SELECT station_name WHERE installed >= '2023-01-01' ORDER BY station_name",
+        parse=False
+    )
+    assert records == [{'station_name': 'Atlantic Ave'}, {'station_name': 'Canal St'}]
+
+
+def test_metadata_and_last_modified(emulator):
+    metadata = climate_dash_tools.extract.get_metadata('abcd-1234')
+
+    r = requests.get(emulator.base_url + 'resource/abcd-1234.json', params={'$query': 'SELECT COUNT(*)'})
+    r.raise_for_status()
+
+    # an HTTP-date, for the same moment as `dataUpdatedAt`
+    last_modified = email.utils.parsedate_to_datetime(r.headers['Last-Modified'])
+    assert r.headers['Last-Modified'].endswith(' GMT')
+    assert last_modified.timestamp() == pytest.approx(
+        pd.Timestamp(metadata['dataUpdatedAt']).timestamp(), abs=1
+    )
+
+
+def test_invalid_query_is_a_client_error(emulator):
+    r = requests.get(emulator.base_url + 'resource/abcd-1234.json', params={'$query': 'SELECT * WHERE $1'})
+    assert r.status_code == 400
+
+
+def test_gzip_responses_are_decoded_and_counted(emulator, monkeypatch):
+    monkeypatch.setattr(climate_dash_tools.extract, 'transfer_stats', [])
+    query = 'SELECT station_name, borough ORDER BY station_name'
+
+    records = climate_dash_tools.extract.from_open_data('abcd-1234', query, parse=False)
+
+    assert [record['station_name'] for record in records] == ['Atlantic Ave', 'Broadway', 'Canal St']
+
+    # the same response, as sent and as decompressed
+    params = {'$query': climate_dash_tools.soql.normalize(query)}
+    r = requests.get(emulator.base_url + 'resource/abcd-1234.json', params=params, headers={'Accept-Encoding': 'gzip'}, stream=True)
+    compressed = r.raw.read(decode_content=False)
+    decompressed = requests.get(emulator.base_url + 'resource/abcd-1234.json', params=params, headers={'Accept-Encoding': 'identity'}).content
+
+    [stats] = climate_dash_tools.extract.transfer_stats
+    assert stats.content_encoding == 'gzip'
+    assert stats.compressed_bytes == len(compressed)
+    assert stats.decompressed_bytes == len(decompressed)
+
+
+def test_identical_concurrent_requests_are_sent_once(working_directory):
+    fixtures = working_directory / 'fixtures'
+    fixtures.mkdir()
+    (fixtures / 'abcd-1234.csv').write_text(FIXTURE)
+    callers = 8
+    start = threading.Barrier(callers)
+
+    def extract():
+        start.wait()
+        return climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT borough, SUM(ports) AS ports GROUP BY borough')
+
+    # slow enough that every caller asks while the first request is in flight
+    with climate_dash_tools.emulator.SodaEmulator(fixtures, latency=0.5) as emulator:
+        with climate_dash_tools.emulator.point_extractor_at(emulator.base_url):
+            with concurrent.futures.ThreadPoolExecutor(callers) as executor:
+                results = list(executor.map(lambda _: extract(), range(callers)))
+
+    assert emulator.request_count == 1
+    assert all(result.equals(results[0]) for result in results)
+    # each caller gets its own copy
+    assert len({id(result) for result in results}) == callers
+    assert climate_dash_tools.extract._in_flight == {}
+
+
+def test_arrow_types_come_from_soda_types(working_directory):
+    pa = pytest.importorskip('pyarrow')
+
+    fixtures = working_directory / 'fixtures'
+    fixtures.mkdir()
+    pd.DataFrame({
+        # would be inferred as integers, losing the leading zero
+        'zip_code': pd.Series(['10001', '02134', '11201'], dtype=object),
+        'ports': [4, 2, 6],
+        'installed': pd.to_datetime(['2023-03-15', '2022-01-02', '2024-06-30']),
+        # would be inferred as Arrow's null type
+        'notes': pd.Series([None, None, None], dtype=object),
+        'rating': [float('nan')] * 3,
+    }).to_parquet(fixtures / 'abcd-1234.parquet')
+
+    with climate_dash_tools.emulator.SodaEmulator(fixtures) as emulator:
+        with climate_dash_tools.emulator.point_extractor_at(emulator.base_url):
+            table = climate_dash_tools.extract.from_open_data(
+                'abcd-1234',
+                'SELECT zip_code, ports, installed, notes, rating ORDER BY zip_code',
+                backend='arrow'
+            )
+            data = climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT zip_code, notes', backend='arrow_dtype')
+
+    assert table.schema.field('zip_code').type == pa.string()
+    assert table.schema.field('ports').type == pa.float64()
+    assert table.schema.field('installed').type == pa.timestamp('ms')
+    assert table.schema.field('notes').type == pa.string()
+    assert table.schema.field('rating').type == pa.float64()
+    assert table.column('zip_code').to_pylist() == ['02134', '10001', '11201']
+    assert table.column('notes').null_count == 3
+
+    assert data.dtypes.to_dict() == {'zip_code': pd.ArrowDtype(pa.string()), 'notes': pd.ArrowDtype(pa.string())}
@@ -0,0 +1,41 @@
+import climate_dash_tools.extract
+import climate_dash_tools.partitions
+from pipelines.extract import energy_star_score_trend
+
+# building, score; the highest score of a building in a year counts
+SCORES = {
+    2022: [('1', '54'), ('2', '55'), ('3', '69'), ('3', '70'), ('4', '85')],
+    2023: [('1', '60'), ('2', 'Not a number'), ('4', '100')],
+}
+
+
+def test_grades_by_year(working_directory, monkeypatch):
+    monkeypatch.setattr(
+        climate_dash_tools.extract,
+        'from_open_data',
+        lambda table_id, query, parse=True: [{'report_year': str(year)} for year in SCORES]
+    )
+
+    def fetch_partitions(table_id, partitions, cache_name=None, final=()):
+        assert list(final) == []
+        return {
+            key: [
+                {'report_year': key, 'property_id': property_id, 'score': score}
+                for property_id, score in SCORES[int(key)]
+            ]
+            for key in partitions
+        }
+
+    monkeypatch.setattr(climate_dash_tools.partitions, 'fetch_partitions', fetch_partitions)
+
+    result = energy_star_score_trend.run()
+
+    counts = result['grades_by_year']['count']
+    assert counts.loc[2022].to_dict() == {'D': 1, 'C': 1, 'B': 1, 'A': 1}
+    assert counts.loc[2023].to_dict() == {'D': 0, 'C': 1, 'B': 0, 'A': 1}
+    assert result['grades_by_year']['proportion'].groupby(level='report_year').sum().tolist() == [1.0, 1.0]
+
+    deltas = result['building_score_deltas']
+    assert deltas.loc['1', 'score_delta'] == 6
+    assert deltas.loc['4', 'score_delta'] == 15
+    assert '2' not in deltas.index
@@ -0,0 +1,241 @@
+import collections
+import datetime
+import json
+import threading
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+import climate_dash_tools.extract
+
+
+def test_optimize_column_string_with_missing_values():
+    col = pd.Series(['BRONX', 'QUEENS', np.nan, 'BRONX', None, 'QUEENS'] * 10, dtype=object)
+
+    optimized = climate_dash_tools.extract._optimize_column(col)
+
+    assert isinstance(optimized.dtype, pd.CategoricalDtype)
+    assert optimized.isna().sum() == col.isna().sum()
+    assert optimized.astype(object).where(optimized.notna(), None).tolist() == col.where(col.notna(), None).tolist()
+
+
+def test_optimize_column_unique_strings():
+    col = pd.Series([f'id-{i}' for i in range(10)] + [np.nan], dtype=object)
+
+    optimized = climate_dash_tools.extract._optimize_column(col)
+
+    assert not isinstance(optimized.dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_string_dtype(optimized)
+
+
+def test_optimize_column_mixed_values_unchanged():
+    col = pd.Series(['a', 1, 'a', 'a'], dtype=object)
+
+    assert climate_dash_tools.extract._optimize_column(col) is col
+
+
+def test_optimize_column_downcasts_only_losslessly():
+    assert climate_dash_tools.extract._optimize_column(pd.Series([1, 2, 3], dtype='int64')).dtype == np.int8
+    assert climate_dash_tools.extract._optimize_column(pd.Series([0.5, 1.25])).dtype == np.float32
+    assert climate_dash_tools.extract._optimize_column(pd.Series([0.1, 1.3])).dtype == np.float64
+
+
+@pytest.fixture
+def memo(monkeypatch):
+    requested = []
+
+    def fake_from_open_data(table_id, query, *args):
+        requested.append(query)
+        return [{'query': query, 'padding': 'x' * 80}]
+
+    monkeypatch.setattr(climate_dash_tools.extract, '_from_open_data', fake_from_open_data)
+    climate_dash_tools.extract.enable_memo(max_bytes=250, ttl_seconds=None)
+    climate_dash_tools.extract.clear_memo()
+    yield requested
+    climate_dash_tools.extract.disable_memo()
+
+
+def test_memo_returns_copies(memo):
+    first = climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT a', parse=False)
+    first[0]['query'] = 'changed'
+
+    # the same query written differently hits the memo
+    second = climate_dash_tools.extract.from_open_data('abcd-1234', 'select  `a`', parse=False)
+
+    assert second == [{'query': 'SELECT a', 'padding': 'x' * 80}]
+    assert memo == ['SELECT a']
+    assert climate_dash_tools.extract.memo_stats().hits == 1
+
+
+def test_memo_evicts_least_recently_used(memo):
+    for query in ('SELECT a', 'SELECT b', 'SELECT a', 'SELECT c'):
+        climate_dash_tools.extract.from_open_data('abcd-1234', query, parse=False)
+
+    # only two results fit: `b` was used least recently when `c` came in
+    stats = climate_dash_tools.extract.memo_stats()
+    assert (stats.entries, stats.evictions) == (2, 1)
+    assert stats.size_bytes <= 250
+
+    climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT a', parse=False)
+    climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT b', parse=False)
+    assert memo == ['SELECT a', 'SELECT b', 'SELECT c', 'SELECT b']
+
+
+def test_memo_results_expire(memo):
+    climate_dash_tools.extract.enable_memo(max_bytes=250, ttl_seconds=0.05)
+
+    climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT a', parse=False)
+    climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT a', parse=False)
+    time.sleep(0.1)
+    climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT a', parse=False)
+
+    assert memo == ['SELECT a', 'SELECT a']
+    assert climate_dash_tools.extract.memo_stats().expirations == 1
+
+
+@pytest.fixture
+def latencies(working_directory, monkeypatch):
+    """An empty latency history, saved to the test's own cache"""
+    path = working_directory / 'Cache' / climate_dash_tools.extract.LATENCY_FILE_NAME
+    monkeypatch.setattr(
+        climate_dash_tools.extract,
+        '_latencies',
+        collections.defaultdict(lambda: collections.deque(maxlen=climate_dash_tools.extract.LATENCY_HISTORY_SIZE))
+    )
+    monkeypatch.setattr(climate_dash_tools.extract, '_new_latencies', collections.defaultdict(list))
+    monkeypatch.setattr(climate_dash_tools.extract, '_latency_path', path)
+    return path
+
+
+def fake_response(seconds, name):
+    return types.SimpleNamespace(elapsed=datetime.timedelta(seconds=seconds), close=lambda: None, name=name)
+
+
+@pytest.mark.parametrize('latency, expected', [
+    (None, 300),
+    (0.5, climate_dash_tools.extract.MIN_TIMEOUT_SECONDS),
+    (20, 80),
+    (100, 300),
+])
+def test_timeout_is_a_multiple_of_p99_latency(latencies, latency, expected):
+    if latency is not None:
+        for _ in range(climate_dash_tools.extract.LATENCY_MIN_SAMPLES - 1):
+            climate_dash_tools.extract._record_latency('key', 0.1)
+        # the slowest sample is the p99 of a short history
+        climate_dash_tools.extract._record_latency('key', latency)
+
+    assert climate_dash_tools.extract.get_timeout('key', 300) == expected
+
+
+def test_timeout_is_recorded_as_latency(latencies, monkeypatch):
+    class TimingOutSession:
+        def get(self, url, timeout, **kwargs):
+            raise requests.Timeout()
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'get_session', TimingOutSession)
+
+    with pytest.raises(requests.Timeout):
+        climate_dash_tools.extract._timed_get('https://example.org/', 'key', 300)
+
+    assert list(climate_dash_tools.extract._latencies['key']) == [300]
+
+
+def test_hedged_request_wins(latencies, monkeypatch):
+    for _ in range(climate_dash_tools.extract.LATENCY_MIN_SAMPLES):
+        climate_dash_tools.extract._record_latency('key', 0.05)
+
+    released = threading.Event()
+    calls = []
+
+    class StuckSession:
+        """The first request hangs until released, the hedged one answers at once"""
+
+        def get(self, url, timeout, **kwargs):
+            calls.append(url)
+            if len(calls) == 1:
+                released.wait(5)
+                return fake_response(5, 'stuck')
+            return fake_response(0.01, 'hedged')
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'get_session', StuckSession)
+    monkeypatch.setattr(climate_dash_tools.extract, 'HEDGE_REQUESTS', True)
+
+    try:
+        assert climate_dash_tools.extract._timed_get('https://example.org/', 'key', 300).name == 'hedged'
+    finally:
+        released.set()
+
+    assert len(calls) == 2
+
+
+def test_latency_histories_of_processes_are_merged(latencies):
+    climate_dash_tools.extract._record_latency('key', 1)
+
+    # saved by another process meanwhile
+    latencies.parent.mkdir(parents=True)
+    latencies.write_text(json.dumps({'key': [2], 'other': [3]}))
+
+    climate_dash_tools.extract._save_latencies()
+
+    assert json.loads(latencies.read_text()) == {'key': [2, 1], 'other': [3]}
+
+
+def split_into_chunks(data: bytes, size: int):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+RECORDS = [
+    {'name': 'Café Crème', 'price': '€3.50', 'count': 12345, 'open': True},
+    {'name': '北京', 'price': None, 'count': -0.25, 'open': False},
+]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64])
+def test_decode_json_stream_across_chunk_boundaries(size):
+    # chunks split multibyte characters, strings, numbers and literals
+    chunks = split_into_chunks(json.dumps(RECORDS, ensure_ascii=False).encode(), size)
+
+    assert climate_dash_tools.extract._decode_json_stream(iter(chunks)) == RECORDS
+
+
+@pytest.mark.parametrize('document', ['{"error": true, "message": "é"}', '  [ ]  ', '[1, 2.5, "a"]'])
+def test_decode_json_stream_of_other_documents(document):
+    chunks = split_into_chunks(document.encode(), 2)
+
+    assert climate_dash_tools.extract._decode_json_stream(iter(chunks)) == json.loads(document)
+
+
+def test_error_of_a_shared_request_reaches_every_caller(monkeypatch):
+    callers = 4
+    calls = []
+
+    def failing_from_open_data(table_id, query, *args):
+        calls.append(query)
+        # fail only once the other callers wait for this request
+        [call] = climate_dash_tools.extract._in_flight.values()
+        while call.waiters < callers - 1:
+            time.sleep(0.01)
+        raise requests.ConnectionError('connection reset')
+
+    monkeypatch.setattr(climate_dash_tools.extract, '_from_open_data', failing_from_open_data)
+
+    def extract():
+        try:
+            climate_dash_tools.extract.from_open_data('abcd-1234', 'SELECT a', parse=False)
+        except requests.ConnectionError as e:
+            return e
+
+    threads = [threading.Thread(target=lambda: errors.append(extract())) for _ in range(callers)]
+    errors = []
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(calls) == 1
+    assert len(errors) == callers and all(isinstance(error, requests.ConnectionError) for error in errors)
+    assert climate_dash_tools.extract._in_flight == {}
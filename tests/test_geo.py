@@ -0,0 +1,72 @@
+import geopandas as gpd
+import pytest
+import requests
+import shapely
+
+import climate_dash_tools.extract
+import climate_dash_tools.geo
+
+
+def square(x, y):
+    return shapely.geometry.mapping(shapely.box(x, y, x + 1, y + 1))
+
+
+# as returned by Open Data, with the geometry column as GeoJSON
+DISTRICT_RECORDS = [
+    {'borocd': '101', 'shape_area': '1', 'the_geom': square(0, 0)},
+    {'borocd': '102', 'shape_area': '1', 'the_geom': square(1, 0)},
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    climate_dash_tools.geo.load_community_districts.cache_clear()
+    climate_dash_tools.geo.get_district_index.cache_clear()
+    yield
+    climate_dash_tools.geo.load_community_districts.cache_clear()
+    climate_dash_tools.geo.get_district_index.cache_clear()
+
+
+def test_boundaries_are_downloaded_once(monkeypatch):
+    calls = []
+
+    def from_open_data(table_id, query, open_data_collection='city', parse=True):
+        calls.append(table_id)
+        return DISTRICT_RECORDS
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'from_open_data', from_open_data)
+
+    assert climate_dash_tools.geo.community_districts_available()
+    assert climate_dash_tools.geo.community_districts_available()
+    assert calls == [climate_dash_tools.geo.COMMUNITY_DISTRICTS_TABLE_ID]
+
+    districts = climate_dash_tools.geo.load_community_districts()
+
+    assert districts['GeoID'].tolist() == [101, 102]
+
+
+def test_unavailable_boundaries(monkeypatch):
+    def from_open_data(*args, **kwargs):
+        raise requests.ConnectionError('offline')
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'from_open_data', from_open_data)
+
+    assert not climate_dash_tools.geo.community_districts_available()
+    assert not climate_dash_tools.geo.COMMUNITY_DISTRICTS_FILE.exists()
+
+
+def test_count_by_community_district(monkeypatch):
+    monkeypatch.setattr(climate_dash_tools.extract, 'from_open_data', lambda *args, **kwargs: DISTRICT_RECORDS)
+
+    points = gpd.GeoDataFrame(
+        {'type_of_charger': ['L2', 'L2', 'DCFC', 'L2']},
+        geometry=gpd.points_from_xy([0.5, 0.2, 1.5, 5], [0.5, 0.7, 0.5, 5]),
+        crs=climate_dash_tools.geo.CRS
+    )
+
+    counts = climate_dash_tools.geo.count_by_community_district(points, by='type_of_charger')
+
+    assert counts.to_dict('index') == {
+        101: {'DCFC': 0, 'L2': 2, 'total': 2},
+        102: {'DCFC': 1, 'L2': 0, 'total': 1},
+    }
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+import climate_dash_tools.history
+from climate_dash_tools.history import HistoryStore
+
+
+def commit(store, datasets, note=None):
+    run = store.new_run()
+    for name, data in datasets.items():
+        run.add_bytes(name, data)
+    return run.commit(note)
+
+
+def test_versions_as_of_runs(working_directory):
+    store = HistoryStore(working_directory / 'History')
+
+    assert commit(store, {'a.csv': b'x\n1\n'}) == 1
+    assert commit(store, {'a.csv': b'x\n2\n', 'b.csv': b'y\n'}) == 2
+    assert commit(store, {'b.csv': b'y\nz\n'}) == 3
+
+    assert store.read_bytes('a.csv') == b'x\n2\n'
+    assert store.read_bytes('a.csv', 1) == b'x\n1\n'
+    assert store.get_version('a.csv', 3).run == 2
+    assert store.list_datasets(1) == ['a.csv']
+    assert store.list_datasets() == ['a.csv', 'b.csv']
+
+    with pytest.raises(KeyError):
+        store.get_version('b.csv', 1)
+
+
+def test_lookups_read_only_the_index(working_directory, monkeypatch):
+    store = HistoryStore(working_directory / 'History')
+    for i in range(5):
+        commit(store, {'a.csv': f'x\n{i}\n'.encode()})
+
+    def get_manifest(run):
+        raise AssertionError('manifest read')
+
+    monkeypatch.setattr(store, 'get_manifest', get_manifest)
+
+    assert store.read_bytes('a.csv', 3) == b'x\n2\n'
+    assert store.list_datasets() == ['a.csv']
+
+
+def test_concurrent_commit_of_the_same_run(working_directory, monkeypatch):
+    store = HistoryStore(working_directory / 'History')
+    commit(store, {'a.csv': b'x\n1\n'}, note='first')
+
+    # another process commits run 2 after this one numbered its commit
+    monkeypatch.setattr(store, 'list_runs', lambda: [1])
+    (store.runs_directory / '000002.json').write_text(json.dumps({'run': 2, 'note': 'other', 'datasets': {}}))
+
+    with pytest.raises(FileExistsError):
+        commit(store, {'a.csv': b'x\n2\n'})
+
+    assert store.get_manifest(2)['note'] == 'other'
+    assert not [path for path in os.listdir(store.runs_directory) if path.endswith('.tmp')]
+
+
+def test_index_is_rebuilt_for_existing_stores(working_directory):
+    root = working_directory / 'History'
+    store = HistoryStore(root)
+    commit(store, {'a.csv': b'x\n1\n'})
+    commit(store, {'a.csv': b'x\n2\n'})
+
+    climate_dash_tools.history.shutil.rmtree(store.index_directory)
+
+    assert HistoryStore(root).get_version('a.csv').run == 2
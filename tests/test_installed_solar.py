@@ -0,0 +1,19 @@
+import pandas as pd
+
+from pipelines.extract import installed_solar
+
+
+def test_sums_of_daily_sums_are_written_as_the_api_sums():
+    data = pd.DataFrame({
+        'day': pd.to_datetime(['2023-01-01', '2023-06-01', '2023-06-02', '2024-01-01'], utc=True),
+        'installed_mw': [0.1, 0.2, 0.00001, 0.5],
+    })
+    assert data['installed_mw'].iloc[:3].sum() != 0.30001
+
+    summary = installed_solar.summarize(data, '2024-03-01T00:00:00.000Z')
+
+    assert summary['summary_installed_mw_by_year']['total_installed_mw'].to_dict() == {2023: 0.30001}
+    assert summary['summary_installed_remaining'][['installed', 'remaining']].iloc[0].to_dict() == {
+        'installed': 0.30001,
+        'remaining': 999.69999,
+    }
@@ -0,0 +1,144 @@
+import pytest
+import requests
+
+import climate_dash_tools.extract
+import climate_dash_tools.journal
+import climate_dash_tools.partitions
+from climate_dash_tools.journal import FAILED, INVALID, SUCCEEDED, RunJournal
+
+
+def test_only_unsuccessful_pipelines_are_retried(working_directory):
+    journal = RunJournal.new()
+    for pipeline_name, status in [('ok', SUCCEEDED), ('bad_data', INVALID), ('error', FAILED)]:
+        journal.start_pipeline(pipeline_name)
+        journal.record_result('key', [{'a': '1'}])
+        journal.finish_pipeline(pipeline_name, status)
+    # interrupted
+    journal.start_pipeline('running')
+
+    journal = RunJournal()
+    assert journal.failed_pipelines() == ['bad_data', 'error', 'running']
+
+    # only the failed pipeline keeps its results
+    for pipeline_name, expected in [('ok', None), ('bad_data', None), ('error', [{'a': '1'}])]:
+        journal.start_pipeline(pipeline_name)
+        assert journal.get_result('key') == expected
+
+
+def test_results_are_ignored_once_the_table_changes(working_directory):
+    journal = RunJournal.new()
+    journal.start_pipeline('pipeline')
+    journal.record_result('key', [{'a': '1'}], '2024-01-01T00:00:00.000Z')
+    journal.finish_pipeline('pipeline', FAILED)
+
+    journal = RunJournal()
+    journal.start_pipeline('pipeline')
+    assert journal.get_result('key', '2024-01-01T00:00:00.000Z') == [{'a': '1'}]
+    assert journal.get_result('key', '2024-02-01T00:00:00.000Z') is None
+
+
+@pytest.fixture
+def open_data(working_directory, monkeypatch):
+    """Requests of `from_open_data`, which fail for queries in `fail`"""
+    state = {'requested': [], 'fail': set(), 'data_updated_at': 'v1'}
+
+    def fake_from_open_data(table_id, query, *args):
+        state['requested'].append(query)
+        if query in state['fail']:
+            raise requests.ConnectionError('connection reset')
+        return [{'query': query}]
+
+    monkeypatch.setattr(climate_dash_tools.extract, '_from_open_data', fake_from_open_data)
+    monkeypatch.setattr(
+        climate_dash_tools.extract,
+        'get_metadata',
+        lambda table_id, open_data_collection='city': {'dataUpdatedAt': state['data_updated_at']}
+    )
+    monkeypatch.setattr(climate_dash_tools.partitions, 'RETRY_BACKOFF_SECONDS', 0)
+    return state
+
+
+def _run(journal, pipeline, pipeline_name='ghg_emissions'):
+    """Run a pipeline as `run_extractors.run_all` does"""
+    journal.start_pipeline(pipeline_name)
+    try:
+        result = pipeline()
+    except Exception as e:
+        journal.finish_pipeline(pipeline_name, FAILED, error=repr(e))
+        return None
+    journal.finish_pipeline(pipeline_name, SUCCEEDED)
+    return result
+
+
+# sub-queries of one table, as ghg_emissions makes
+QUERIES = [
+    'SELECT sector, SUM(cy_2023_tco2e) GROUP BY sector',
+    "SELECT category, SUM(cy_2023_tco2e) WHERE sector = 'Stationary Energy' GROUP BY category",
+    "SELECT SUM(cy_2005_tco2e), SUM(cy_2023_tco2e) WHERE sector = 'Stationary Energy'",
+    "SELECT SUM(cy_2005_tco2e), SUM(cy_2023_tco2e) WHERE sector = 'Transportation'",
+]
+
+
+def ghg_pipeline():
+    return [climate_dash_tools.extract.from_open_data('wq7q-htne', query, parse=False) for query in QUERIES]
+
+
+def test_retry_fetches_only_failed_queries(open_data, monkeypatch):
+    journal = RunJournal.new()
+    monkeypatch.setattr(climate_dash_tools.extract, 'result_journal', journal)
+
+    open_data['fail'].add(QUERIES[2])
+    assert _run(journal, ghg_pipeline) is None
+    assert open_data['requested'] == QUERIES[:3]
+
+    open_data['fail'].clear()
+    open_data['requested'].clear()
+    journal = RunJournal()
+    monkeypatch.setattr(climate_dash_tools.extract, 'result_journal', journal)
+
+    assert _run(journal, ghg_pipeline) == [[{'query': query}] for query in QUERIES]
+    assert open_data['requested'] == QUERIES[2:]
+
+
+def test_retry_refetches_once_the_table_changes(open_data, monkeypatch):
+    journal = RunJournal.new()
+    monkeypatch.setattr(climate_dash_tools.extract, 'result_journal', journal)
+
+    open_data['fail'].add(QUERIES[1])
+    _run(journal, ghg_pipeline)
+
+    open_data['fail'].clear()
+    open_data['requested'].clear()
+    open_data['data_updated_at'] = 'v2'
+    _run(journal, ghg_pipeline)
+
+    assert open_data['requested'] == QUERIES
+
+
+def test_successful_runs_write_no_results(open_data, monkeypatch):
+    journal = RunJournal.new()
+    monkeypatch.setattr(climate_dash_tools.extract, 'result_journal', journal)
+
+    _run(journal, ghg_pipeline)
+
+    assert not (journal.directory / climate_dash_tools.journal.RESULTS_DIRECTORY_NAME).exists()
+
+
+def test_retry_fetches_only_missing_partitions(open_data, monkeypatch):
+    partitions = {year: f"SELECT * WHERE year = '{year}'" for year in ('2022', '2023', '2024')}
+
+    def pipeline():
+        return climate_dash_tools.partitions.fetch_partitions('abcd-1234', partitions)
+
+    journal = RunJournal.new()
+    monkeypatch.setattr(climate_dash_tools.extract, 'result_journal', journal)
+
+    open_data['fail'].add(partitions['2023'])
+    _run(journal, pipeline, 'energy_star_score_trend')
+
+    open_data['fail'].clear()
+    open_data['requested'].clear()
+    result = _run(journal, pipeline, 'energy_star_score_trend')
+
+    assert open_data['requested'] == [partitions['2023']]
+    assert result == {year: [{'query': query}] for year, query in partitions.items()}
@@ -0,0 +1,100 @@
+import json
+import logging
+import pickle
+import queue
+import sys
+import threading
+
+import pandas as pd
+
+import climate_dash_tools.logging_config
+from climate_dash_tools.logging_config import DeferredQueueHandler, LazySummary
+
+
+class Recorder(LazySummary):
+    """Log argument that remembers the threads it was formatted on"""
+
+    def __init__(self):
+        super().__init__(None)
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread().name)
+        return 'recorded'
+
+
+def make_record(msg, args, exc_info=None):
+    return logging.LogRecord('test', logging.ERROR, __file__, 1, msg, args, exc_info)
+
+
+def exc_info():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        return sys.exc_info()
+
+
+def test_records_are_enqueued_unformatted():
+    log_queue = queue.SimpleQueue()
+    argument = Recorder()
+
+    DeferredQueueHandler(log_queue).handle(make_record('data: %s', (argument,), exc_info()))
+    record = log_queue.get_nowait()
+
+    assert argument.threads == []
+    assert record.msg == 'data: %s' and record.args == (argument,)
+    assert record.exc_info is not None
+
+
+def test_mutable_arguments_are_formatted_when_logged():
+    log_queue = queue.SimpleQueue()
+    data = pd.DataFrame({'ports': [4]})
+
+    DeferredQueueHandler(log_queue).handle(make_record('data: %s', (data,)))
+    data.loc[0, 'ports'] = 6
+    record = log_queue.get_nowait()
+
+    assert record.args is None
+    assert record.getMessage() == f"data: {pd.DataFrame({'ports': [4]})}"
+
+
+def test_records_for_other_processes_are_picklable():
+    log_queue = queue.SimpleQueue()
+
+    DeferredQueueHandler(log_queue, cross_process=True).handle(make_record('%s of %s', (threading.Lock(), 3), exc_info()))
+    record = pickle.loads(pickle.dumps(log_queue.get_nowait()))
+
+    assert record.getMessage().endswith('of 3')
+    assert record.exc_info is None
+    assert 'ValueError: boom' in record.exc_text
+
+
+def test_messages_and_exceptions_are_formatted_by_the_listener():
+    # replacing the test runner's own (synchronous) capture handlers
+    climate_dash_tools.logging_config._configure_root_logger()
+    logger = logging.getLogger('test')
+    argument = Recorder()
+
+    with climate_dash_tools.logging_config.pipeline_context('test_pipeline'):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logger.exception('failed on %s', argument)
+
+    climate_dash_tools.logging_config._stop_listeners()
+
+    assert threading.current_thread().name not in argument.threads
+
+    entry = json.loads((climate_dash_tools.logging_config.INFO_DIR / 'test_pipeline.log').read_text().splitlines()[-1])
+
+    assert entry['message'] == 'failed on recorded'
+    assert entry['pipeline'] == 'test_pipeline'
+    assert 'ValueError: boom' in entry['exception']
+
+
+def test_pipeline_context_is_reset():
+    with climate_dash_tools.logging_config.pipeline_context('outer'):
+        # as pipelines do themselves
+        climate_dash_tools.logging_config._current_pipeline.set('outer')
+
+    assert climate_dash_tools.logging_config._current_pipeline.get() is None
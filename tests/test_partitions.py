@@ -0,0 +1,69 @@
+import pytest
+import requests
+
+import climate_dash_tools.extract
+import climate_dash_tools.partitions
+
+
+@pytest.fixture
+def open_data(working_directory, monkeypatch):
+    state = {'requested': [], 'fail': set()}
+
+    def from_open_data(table_id, query, open_data_collection='city', parse=True):
+        year = query.split("'")[1]
+        state['requested'].append(year)
+        if year in state['fail']:
+            raise requests.ConnectionError('connection reset')
+        return [{'year': year}]
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'from_open_data', from_open_data)
+    monkeypatch.setattr(climate_dash_tools.partitions, 'RETRY_BACKOFF_SECONDS', 0)
+    return state
+
+
+PARTITIONS = {year: f"SELECT * WHERE year = '{year}'" for year in ('2022', '2023', '2024')}
+
+
+def test_final_partitions_are_fetched_once(open_data):
+    for _ in range(2):
+        result = climate_dash_tools.partitions.fetch_partitions(
+            'abcd-1234', PARTITIONS, cache_name='by_year', final=['2022', '2023']
+        )
+        assert result == {year: [{'year': year}] for year in PARTITIONS}
+
+    assert sorted(open_data['requested']) == ['2022', '2023', '2024', '2024']
+
+
+def test_partitions_are_retried_separately(open_data, monkeypatch):
+    attempts = []
+    from_open_data = climate_dash_tools.extract.from_open_data
+
+    def flaky(table_id, query, open_data_collection='city', parse=True):
+        if '2023' in query and not attempts:
+            attempts.append(query)
+            raise requests.ConnectionError('connection reset')
+        return from_open_data(table_id, query, open_data_collection, parse)
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'from_open_data', flaky)
+
+    result = climate_dash_tools.partitions.fetch_partitions('abcd-1234', PARTITIONS)
+
+    assert result['2023'] == [{'year': '2023'}]
+    assert sorted(open_data['requested']) == ['2022', '2023', '2024']
+
+
+def test_completed_final_partitions_are_cached_when_another_fails(open_data):
+    open_data['fail'].add('2024')
+
+    with pytest.raises(requests.ConnectionError):
+        climate_dash_tools.partitions.fetch_partitions(
+            'abcd-1234', PARTITIONS, cache_name='by_year', final=['2022', '2023']
+        )
+
+    open_data['fail'].clear()
+    open_data['requested'].clear()
+    climate_dash_tools.partitions.fetch_partitions(
+        'abcd-1234', PARTITIONS, cache_name='by_year', final=['2022', '2023']
+    )
+
+    assert open_data['requested'] == ['2024']
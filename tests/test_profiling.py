@@ -0,0 +1,42 @@
+import pathlib
+import pstats
+
+import climate_dash_tools.profiling
+
+
+def build_table(rows):
+    return [list(range(10)) for _ in range(rows)]
+
+
+def test_profile_writes_stats_and_report(working_directory):
+    with climate_dash_tools.profiling.profile('pipeline', directory='Profiles'):
+        table = build_table(10_000)
+
+    assert len(table) == 10_000
+
+    stats = pstats.Stats('Profiles/pipeline.prof')
+    assert any(function_name == 'build_table' for _, _, function_name in stats.stats)
+
+    report = pathlib.Path('Profiles/pipeline.txt').read_text()
+    assert 'peak traced memory' in report
+    assert 'CPU time of the profiled thread only' in report
+    assert 'build_table' in report
+    assert 'test_profiling' in report.split('own time by package')[1].split('by cumulative time')[0]
+
+
+def test_package_of_profiled_functions():
+    assert climate_dash_tools.profiling._package('~') == 'builtins'
+    assert climate_dash_tools.profiling._package('/venv/lib/python3.12/site-packages/pandas/core/frame.py') == 'pandas'
+    assert climate_dash_tools.profiling._package(str(climate_dash_tools.profiling._STDLIB_DIRECTORY / 'json' / 'decoder.py')) == 'json'
+    assert climate_dash_tools.profiling._package(str(pathlib.Path.cwd() / 'pipelines' / 'extract' / 'ghg_emissions.py')) == 'pipelines'
+
+
+def test_pipeline_main_profiles_only_with_flag(working_directory):
+    def run():
+        return 'ok'
+
+    assert climate_dash_tools.profiling.pipeline_main(run, 'pipelines/extract/ghg_emissions.py', []) == 'ok'
+    assert not pathlib.Path('Profiles').exists()
+
+    assert climate_dash_tools.profiling.pipeline_main(run, 'pipelines/extract/ghg_emissions.py', ['--profile']) == 'ok'
+    assert pathlib.Path('Profiles/ghg_emissions.txt').exists()
@@ -0,0 +1,79 @@
+import types
+
+import pytest
+
+import climate_dash_tools.freshness
+import climate_dash_tools.journal
+import run_extractors
+
+
+def test_queue_needs_a_step():
+    with pytest.raises(SystemExit):
+        run_extractors.parse_args(['--queue', 'queue.sqlite'])
+
+
+def test_steps_need_a_queue():
+    with pytest.raises(SystemExit):
+        run_extractors.parse_args(['--work'])
+
+
+def test_paged_extract_arguments():
+    args = run_extractors.parse_args([
+        '--queue', 'queue.sqlite',
+        '--enqueue-extract', 'w4pv-hbkt',
+        '--extract-where', "`record_type` = 'VEH'",
+        '--extract-where', "`county` = 'KINGS'",
+        '--extract-collection', 'state',
+    ])
+
+    assert args.enqueue_extract == 'w4pv-hbkt'
+    assert args.extract_where == ["`record_type` = 'VEH'", "`county` = 'KINGS'"]
+    assert args.page_size == 100_000
+
+
+def test_source_versions_are_saved_after_every_successful_run(working_directory, monkeypatch):
+    pipelines = {
+        'succeeds': types.SimpleNamespace(TABLE_ID='aaaa-1111', run=lambda: 'ok'),
+        'invalid': types.SimpleNamespace(TABLE_ID='bbbb-2222', run=lambda: None),
+    }
+    monkeypatch.setattr(run_extractors, 'PIPELINES', tuple(pipelines))
+    monkeypatch.setattr(run_extractors, 'import_pipeline', pipelines.__getitem__)
+    monkeypatch.setattr(
+        climate_dash_tools.freshness,
+        'get_source_versions',
+        lambda sources: {source: '2024-01-01T00:00:00.000Z' for source in sources}
+    )
+
+    run_extractors.run_all()
+
+    assert climate_dash_tools.freshness.load_state() == {
+        'succeeds': {'city:aaaa-1111': '2024-01-01T00:00:00.000Z'}
+    }
+
+
+@pytest.mark.parametrize('changed_only', [False, True])
+def test_a_pipeline_that_fails_to_import_does_not_stop_the_run(working_directory, monkeypatch, changed_only):
+    pipelines = {
+        'broken': None,
+        'succeeds': types.SimpleNamespace(TABLE_ID='aaaa-1111', run=lambda: 'ok'),
+    }
+
+    def import_pipeline(pipeline_name):
+        if pipelines[pipeline_name] is None:
+            raise ImportError(f'No module named {pipeline_name!r}')
+        return pipelines[pipeline_name]
+
+    fetched = []
+
+    def get_source_versions(sources):
+        sources = list(sources)
+        fetched.extend(sources)
+        return {source: '2024-01-01T00:00:00.000Z' for source in sources}
+
+    monkeypatch.setattr(run_extractors, 'PIPELINES', tuple(pipelines))
+    monkeypatch.setattr(run_extractors, 'import_pipeline', import_pipeline)
+    monkeypatch.setattr(climate_dash_tools.freshness, 'get_source_versions', get_source_versions)
+
+    assert run_extractors.run_all(changed_only=changed_only) == {'succeeds': 'ok'}
+    assert fetched == ['city:aaaa-1111']
+    assert climate_dash_tools.journal.RunJournal().failed_pipelines() == ['broken']
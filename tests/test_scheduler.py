@@ -0,0 +1,69 @@
+import textwrap
+import threading
+import time
+
+import climate_dash_tools.extract
+import climate_dash_tools.scheduler
+
+PIPELINE = '''
+import os
+import pathlib
+
+import climate_dash_tools.extract
+
+def run():
+    marker = pathlib.Path('crashed')
+    if not marker.exists():
+        marker.touch()
+        # the worker process dies, breaking the pool
+        os._exit(1)
+
+    pathlib.Path('worker_state.txt').write_text(
+        f'{climate_dash_tools.extract.HEDGE_REQUESTS} {len(climate_dash_tools.extract.transfer_stats)}'
+    )
+    climate_dash_tools.extract.transfer_stats.append(None)
+    return True
+'''
+
+
+def _wait_for(condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.1)
+
+
+def test_cron_schedule_next_after():
+    import datetime
+
+    schedule = climate_dash_tools.scheduler.CronSchedule('*/15 9-17 * * 1-5')
+    # a Saturday
+    moment = datetime.datetime(2024, 6, 1, 12, 0)
+    assert schedule.next_after(moment) == datetime.datetime(2024, 6, 3, 9, 0)
+    assert schedule.next_after(datetime.datetime(2024, 6, 3, 9, 0)) == datetime.datetime(2024, 6, 3, 9, 15)
+
+
+def test_broken_pool_is_restarted_and_run_rescheduled(working_directory, monkeypatch):
+    (working_directory / 'crash_pipeline.py').write_text(textwrap.dedent(PIPELINE))
+    monkeypatch.syspath_prepend(str(working_directory))
+    monkeypatch.setattr(climate_dash_tools.extract, 'HEDGE_REQUESTS', True)
+
+    # a schedule that won't come due during the test
+    scheduler = climate_dash_tools.scheduler.Scheduler({'crash_pipeline': '0 0 29 2 *'}, max_workers=1)
+    scheduler.start_workers()
+    thread = threading.Thread(target=scheduler.run_forever, daemon=True)
+    thread.start()
+
+    try:
+        scheduler.submit('crash_pipeline')
+        _wait_for(lambda: scheduler.get_status()['crash_pipeline']['last_status'] == 'ok')
+        # the same worker runs again, and starts with no transfer stats
+        scheduler.submit('crash_pipeline').result(timeout=60)
+    finally:
+        scheduler.stop()
+        thread.join(timeout=10)
+
+    status = scheduler.get_status()['crash_pipeline']
+    assert status['runs'] == 3
+    assert status['failures'] == 1
+    assert (working_directory / 'worker_state.txt').read_text() == 'True 0'
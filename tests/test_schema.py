@@ -0,0 +1,66 @@
+import types
+
+import pytest
+
+import climate_dash_tools.extract
+import climate_dash_tools.schema
+
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture
+def portal(working_directory, monkeypatch):
+    """A table's view and metadata, counting the requests for each, at a settable time"""
+    state = {
+        'now': 1_700_000_000.0,
+        'columns': ['sectors_sector', 'cy_2022_tco2e'],
+        'metadata_updated_at': '2024-01-01T00:00:00.000Z',
+        'requests': [],
+    }
+
+    def get_view(table_id, open_data_collection='city'):
+        state['requests'].append('view')
+        return {'columns': [{'fieldName': column, 'name': column.title(), 'dataTypeName': 'text'} for column in state['columns']]}
+
+    def get_metadata(table_id, open_data_collection='city'):
+        state['requests'].append('metadata')
+        return {'metadataUpdatedAt': state['metadata_updated_at']}
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'get_view', get_view)
+    monkeypatch.setattr(climate_dash_tools.extract, 'get_metadata', get_metadata)
+    monkeypatch.setattr(climate_dash_tools.schema, 'time', types.SimpleNamespace(time=lambda: state['now']))
+    return state
+
+
+def test_cached_schema_is_used_without_requests_within_ttl(portal):
+    assert climate_dash_tools.schema.get_columns('wq7q-htne') == ['sectors_sector', 'cy_2022_tco2e']
+    assert portal['requests'] == ['view', 'metadata']
+
+    portal['requests'].clear()
+    portal['columns'].append('cy_2023_tco2e')
+    portal['now'] += DAY - 1
+
+    # stale for up to the TTL, even though the table changed
+    assert climate_dash_tools.schema.get_columns('wq7q-htne') == ['sectors_sector', 'cy_2022_tco2e']
+    assert portal['requests'] == []
+
+
+def test_expired_schema_is_revalidated(portal):
+    climate_dash_tools.schema.get_schema('wq7q-htne')
+    portal['requests'].clear()
+
+    # metadata unchanged: one metadata request, and the schema is good for another day
+    portal['now'] += DAY + 1
+    climate_dash_tools.schema.get_schema('wq7q-htne')
+    portal['now'] += DAY - 2
+    climate_dash_tools.schema.get_schema('wq7q-htne')
+    assert portal['requests'] == ['metadata']
+
+    # metadata changed: refetched, without asking for the metadata again
+    portal['requests'].clear()
+    portal['columns'].append('cy_2023_tco2e')
+    portal['metadata_updated_at'] = '2024-06-01T00:00:00.000Z'
+    portal['now'] += DAY
+
+    assert climate_dash_tools.schema.get_columns('wq7q-htne') == ['sectors_sector', 'cy_2022_tco2e', 'cy_2023_tco2e']
+    assert portal['requests'] == ['metadata', 'view']
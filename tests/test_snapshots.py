@@ -0,0 +1,50 @@
+import pytest
+
+import climate_dash_tools.extract
+import climate_dash_tools.snapshots
+
+pa = pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def open_data(working_directory, monkeypatch):
+    state = {'data_updated_at': '2024-01-01T00:00:00.000Z', 'requests': 0}
+
+    def from_open_data(table_id, query, open_data_collection='city', backend='pandas'):
+        state['requests'] += 1
+        return pa.table({'borough': ['Bronx', 'Queens'], 'chargers': [2.0, 3.0]})
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'from_open_data', from_open_data)
+    monkeypatch.setattr(
+        climate_dash_tools.extract,
+        'get_metadata',
+        lambda table_id, open_data_collection='city': {'dataUpdatedAt': state['data_updated_at']}
+    )
+    return state
+
+
+def test_snapshot_is_reused_until_the_table_changes(open_data):
+    data = climate_dash_tools.snapshots.from_open_data_snapshot('abcd-1234', backend='pandas')
+    assert data.to_dict('list') == {'borough': ['Bronx', 'Queens'], 'chargers': [2.0, 3.0]}
+
+    climate_dash_tools.snapshots.from_open_data_snapshot('abcd-1234')
+    assert open_data['requests'] == 1
+
+    open_data['data_updated_at'] = '2024-02-01T00:00:00.000Z'
+    climate_dash_tools.snapshots.from_open_data_snapshot('abcd-1234')
+    assert open_data['requests'] == 2
+
+
+def test_snapshot_info_is_in_the_arrow_file(open_data):
+    climate_dash_tools.snapshots.from_open_data_snapshot('abcd-1234', 'SELECT * LIMIT 10')
+
+    [path] = climate_dash_tools.snapshots._snapshot_path('abcd-1234', 'city', 'SELECT * LIMIT 10').parent.iterdir()
+
+    assert path.suffix == '.arrow'
+    assert climate_dash_tools.snapshots._read_info(path) == {
+        'table_id': 'abcd-1234',
+        'open_data_collection': 'city',
+        'query': 'SELECT * LIMIT 10',
+        'data_updated_at': '2024-01-01T00:00:00.000Z',
+        'rows': 2,
+    }
@@ -0,0 +1,64 @@
+import pytest
+
+import climate_dash_tools.soql
+from climate_dash_tools.soql import Query
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('select  `fiscalyear`, sum(`acceptedvalue`)  where id == 2851', 'SELECT fiscalyear, sum(acceptedvalue) WHERE id = 2851'),
+    ('SELECT * WHERE name = "O\'Brien"', "SELECT * WHERE name = 'O''Brien'"),
+    ('SELECT a WHERE b <> 1 AND c IN (1, 2)', 'SELECT a WHERE b != 1 AND c IN (1, 2)'),
+    ('SELECT :@computed_region_efsh_h5xi, :id', 'SELECT :@computed_region_efsh_h5xi, :id'),
+    ('SELECT a |> SELECT count(*)', 'SELECT a |> SELECT count(*)'),
+    ('SELECT `count`, `select`', 'SELECT `count`, `select`'),
+])
+def test_normalize(query, expected):
+    assert climate_dash_tools.soql.normalize(query) == expected
+
+
+def test_fingerprint_ignores_style():
+    assert (
+        climate_dash_tools.soql.fingerprint('select `a` where b == "x"', 'abcd-1234')
+        == climate_dash_tools.soql.fingerprint('SELECT a   WHERE b = \'x\'', 'abcd-1234')
+    )
+
+
+def test_fingerprint_depends_on_table():
+    assert climate_dash_tools.soql.fingerprint('SELECT a', 'abcd-1234') != climate_dash_tools.soql.fingerprint('SELECT a', 'efgh-5678')
+
+
+def test_fingerprint_of_unparseable_query():
+    with pytest.raises(ValueError):
+        climate_dash_tools.soql.normalize('SELECT a WHERE b = $1')
+
+    assert climate_dash_tools.soql.fingerprint('SELECT a WHERE b = $1') == climate_dash_tools.soql.fingerprint('SELECT a\n  WHERE b = $1')
+
+
+def test_query_builder():
+    query = (
+        Query()
+        .select('`fiscalyear`', 'SUM(`acceptedvalue`) AS `total`')
+        .where('`id` == 2851', 'fiscalyear > 2010')
+        .group_by('`fiscalyear`')
+    )
+
+    assert str(query) == 'SELECT fiscalyear, SUM(acceptedvalue) AS total WHERE (id = 2851) AND (fiscalyear > 2010) GROUP BY fiscalyear'
+    assert query == Query(select=['fiscalyear', 'SUM(acceptedvalue) AS total'], where=['id = 2851', 'fiscalyear > 2010'], group_by=['fiscalyear'])
+
+
+def test_count_alias_is_quoted():
+    assert str(Query().where('a = 1').count()) == 'SELECT COUNT(*) AS `count` WHERE a = 1'
+
+
+def test_paged_orders_by_row_id():
+    assert str(Query().select('a').paged(100, 200)) == 'SELECT a ORDER BY :id LIMIT 100 OFFSET 200'
+
+
+def test_split_clauses():
+    tokens = climate_dash_tools.soql.tokenize('SELECT borough, COUNT(*) WHERE ports > 2 GROUP BY borough ORDER BY borough')
+    assert climate_dash_tools.soql.split_clauses(tokens) == {
+        'SELECT': ['borough', ',', 'COUNT', '(', '*', ')'],
+        'WHERE': ['ports', '>', '2'],
+        'GROUP': ['borough'],
+        'ORDER': ['borough'],
+    }
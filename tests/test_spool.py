@@ -0,0 +1,55 @@
+import pytest
+import requests
+
+import climate_dash_tools.emulator
+import climate_dash_tools.extract
+import climate_dash_tools.spool
+from climate_dash_tools.soql import Query
+
+FIXTURE = 'station_name,ports\n' + ''.join(f'Station {i},{i}\n' for i in range(5))
+
+
+@pytest.fixture
+def emulator(working_directory):
+    fixtures = working_directory / 'fixtures'
+    fixtures.mkdir()
+    (fixtures / 'abcd-1234.csv').write_text(FIXTURE)
+
+    with climate_dash_tools.emulator.SodaEmulator(fixtures) as emulator:
+        with climate_dash_tools.emulator.point_extractor_at(emulator.base_url):
+            yield emulator
+
+
+def test_fetch_page(emulator):
+    page = climate_dash_tools.extract.fetch_page('abcd-1234', Query().order_by('ports').paged(2, 2))
+
+    assert page.records == [{'station_name': 'Station 2', 'ports': '2'}, {'station_name': 'Station 3', 'ports': '3'}]
+    assert page.column_types == {'station_name': 'text', 'ports': 'number'}
+
+
+def test_interrupted_download_resumes(emulator, monkeypatch):
+    fetch_page = climate_dash_tools.extract.fetch_page
+    fetched = []
+    interrupted = []
+
+    def interrupted_fetch_page(table_id, query, open_data_collection='city'):
+        if len(fetched) == 1 and not interrupted:
+            interrupted.append(query)
+            raise requests.ConnectionError('connection reset')
+        fetched.append(str(query))
+        return fetch_page(table_id, query, open_data_collection)
+
+    monkeypatch.setattr(climate_dash_tools.extract, 'fetch_page', interrupted_fetch_page)
+
+    query = Query().select('station_name', 'ports').order_by('ports')
+    with pytest.raises(requests.ConnectionError):
+        climate_dash_tools.spool.from_open_data_resumable('abcd-1234', query, page_size=2)
+
+    data = climate_dash_tools.spool.from_open_data_resumable('abcd-1234', query, page_size=2)
+
+    # the first page isn't fetched again
+    assert fetched == [
+        f'SELECT station_name, ports ORDER BY ports LIMIT 2 OFFSET {offset}'
+        for offset in (0, 2, 4)
+    ]
+    assert data['ports'].tolist() == [0, 1, 2, 3, 4]